@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""Benchmark the raw throughput of `classify_yes_no` and of batched scoring with the default spaCy pipeline.
+
+The lexicon and the classification cache are disabled so every text is run through the model. The results are
+printed as JSON.
+"""
+
+import argparse
+import itertools
+import time
+from typing import Any, Dict, List
+
+import chattermouth.nlp
+from chattermouth.nlp.inference import score_texts
+from chattermouth.nlp.training import TRAINING_DATA
+from common import emit
+
+
+def _corpus(size: int) -> List[str]:
+    texts = [text for text, _ in TRAINING_DATA]
+    # Vary the texts slightly so the benchmark doesn't only measure a handful of distinct inputs.
+    return [f"{text} {index}" if index % 2 else text for index, text in zip(range(size), itertools.cycle(texts))]
+
+
+def measure_classify_yes_no(texts: List[str]) -> Dict[str, Any]:
+    """Classify each text with its own `classify_yes_no` call."""
+    unclassified = 0
+    started = time.perf_counter()
+    for text in texts:
+        try:
+            chattermouth.nlp.classify_yes_no(text, threshold=0.75)
+        except chattermouth.nlp.NoClassificationError:
+            unclassified += 1
+    elapsed = time.perf_counter() - started
+    return {
+        "texts": len(texts),
+        "unclassified": unclassified,
+        "seconds": elapsed,
+        "texts_per_second": len(texts) / elapsed,
+    }
+
+
+def measure_batched(texts: List[str], batch_size: int) -> Dict[str, Any]:
+    """Score every text in batches of `batch_size`."""
+    started = time.perf_counter()
+    for _ in score_texts(chattermouth.nlp.spacy_pipeline(), texts, batch_size=batch_size):
+        pass
+    elapsed = time.perf_counter() - started
+    return {"texts": len(texts), "batch_size": batch_size, "seconds": elapsed, "texts_per_second": len(texts) / elapsed}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--texts", type=int, default=2000, help="the number of texts to classify")
+    parser.add_argument("--batch-size", type=int, default=128, help="the batch size of the batched measurement")
+    parser.add_argument("--full", action="store_true", help="load every component of the pipeline")
+    parser.add_argument("--output", help="write the results to this file instead of stdout")
+    args = parser.parse_args()
+
+    load_started = time.perf_counter()
+    nlp = chattermouth.nlp.get_default_spacy_pipeline(classification_only=not args.full)
+    load_seconds = time.perf_counter() - load_started
+
+    texts = _corpus(args.texts)
+    with chattermouth.nlp.enter_spacy_pipeline(nlp):
+        with chattermouth.nlp.enter_lexicon(None), chattermouth.nlp.enter_classification_cache(None):
+            results = {
+                "pipeline": nlp.pipe_names,
+                "load_seconds": load_seconds,
+                "classify_yes_no": measure_classify_yes_no(texts),
+                "batched": measure_batched(texts, args.batch_size),
+            }
+    emit("classify", results, args.output)
+
+
+if __name__ == "__main__":
+    main()
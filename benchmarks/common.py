@@ -0,0 +1,56 @@
+"""Helpers shared by the benchmarks."""
+
+import json
+import math
+import platform
+import sys
+import time
+from typing import Any, Dict, Optional, Sequence
+
+
+def percentile(values: Sequence[float], fraction: float) -> float:
+    """Get a percentile of some values using the nearest-rank method.
+
+    >>> percentile([1.0, 2.0, 3.0, 4.0], 0.5)
+    2.0
+    >>> percentile([1.0, 2.0, 3.0, 4.0], 0.99)
+    4.0
+    """
+    if not values:
+        return math.nan
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+def _get_version(distribution: str) -> Optional[str]:
+    try:
+        from importlib.metadata import version
+
+        return version(distribution)
+    except Exception:
+        return None
+
+
+def environment() -> Dict[str, Any]:
+    """Describe the environment the benchmark ran in, so results from different releases can be compared."""
+    versions = {"chattermouth": _get_version("chattermouth")}
+    for module in ("spacy", "slack"):
+        if module in sys.modules:
+            versions[module] = getattr(sys.modules[module], "__version__", None)
+    return {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "versions": versions,
+        "timestamp": time.time(),
+    }
+
+
+def emit(benchmark: str, results: Dict[str, Any], output: Optional[str] = None) -> None:
+    """Write the results of a benchmark as JSON to `output`, or to stdout."""
+    document = json.dumps({"benchmark": benchmark, "environment": environment(), "results": results}, indent=2)
+    if output is None:
+        print(document)
+    else:
+        with open(output, "w") as output_file:
+            output_file.write(document + "\n")
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""Benchmark end-to-end Slack conversations against an in-process fake Slack backend.
+
+Each conversation starts a thread, is asked a yes or no question with `ask_yes_or_no` and gets a reply from a
+simulated user. The benchmark reports conversations per second, the latency of the `ask_yes_or_no` round trips and
+the memory used by each live interaction, as JSON.
+
+By default every simulated answer is in the default lexicon so no spaCy model is needed. Pass `--model` to load the
+default pipeline and `--no-lexicon` to send every answer through it.
+"""
+
+import argparse
+import asyncio
+import gc
+import itertools
+import time
+import tracemalloc
+from typing import Any, Dict, List
+
+import chattermouth
+import chattermouth.nlp
+from chattermouth.slack import SlackInteractionFactory, SlackSendScheduler
+from common import emit, percentile
+from fake_slack import FakeRTMClient, FakeWebClient
+
+QUESTION = "Do you like apple pie?"
+ANSWERS = ["yes", "nope", "yeah", "no thanks", "👍", "y", "nah", "sure"]
+
+
+def _unlimited_scheduler() -> SlackSendScheduler:
+    # The benchmark measures chattermouth itself, not Slack's rate limits.
+    return SlackSendScheduler(channel_rate=1e9, channel_burst=1e9, method_rate=1e9, method_burst=1e9)
+
+
+async def run_conversations(count: int, concurrency: int, channels: int) -> Dict[str, Any]:
+    """Run `count` conversations, at most `concurrency` of them at a time."""
+    latencies: List[float] = []
+    unclassified = 0
+    answers = itertools.cycle(ANSWERS)
+    users: Dict[str, str] = {}
+    slots = asyncio.Semaphore(concurrency)
+    finished = asyncio.Event()
+    completed = 0
+
+    def on_post(post: Dict[str, Any]) -> None:
+        nonlocal completed
+        if post["text"] == QUESTION:
+            reply = rtm.message_event(users[post["thread_ts"]], post["channel"], next(answers), post["thread_ts"])
+            asyncio.ensure_future(rtm.send(reply))
+        else:
+            completed += 1
+            slots.release()
+            if completed == count:
+                finished.set()
+
+    async def on_message() -> None:
+        nonlocal unclassified
+        await chattermouth.listen()
+        started = time.perf_counter()
+        try:
+            liked = await chattermouth.nlp.ask_yes_or_no(QUESTION)
+        except chattermouth.nlp.NoClassificationError:
+            liked = None
+            unclassified += 1
+        latencies.append(time.perf_counter() - started)
+        await chattermouth.tell({True: "apple", False: "peach", None: "huh"}[liked])
+
+    web_client = FakeWebClient(on_post=on_post)
+    rtm = FakeRTMClient(web_client)
+    factory = SlackInteractionFactory(rtm, callback=on_message, send_scheduler=_unlimited_scheduler())  # type: ignore
+
+    started = time.perf_counter()
+    for index in range(count):
+        await slots.acquire()
+        data = rtm.message_event(f"U{index % 1000:04d}", f"C{index % channels:04d}", "hello")
+        users[data["ts"]] = data["user"]
+        await rtm.send(data)
+    await finished.wait()
+    elapsed = time.perf_counter() - started
+    await factory.drain()
+
+    return {
+        "conversations": count,
+        "concurrency": concurrency,
+        "seconds": elapsed,
+        "conversations_per_second": count / elapsed,
+        "unclassified": unclassified,
+        "ask_yes_or_no_latency_ms": {
+            "p50": percentile(latencies, 0.5) * 1000.0,
+            "p99": percentile(latencies, 0.99) * 1000.0,
+            "max": max(latencies) * 1000.0,
+        },
+    }
+
+
+async def measure_interaction_memory(count: int) -> Dict[str, Any]:
+    """Measure the memory used by `count` live interactions which are waiting for a reply."""
+
+    async def on_message() -> None:
+        await chattermouth.listen()
+        await chattermouth.listen()
+
+    web_client = FakeWebClient()
+    rtm = FakeRTMClient(web_client)
+    factory = SlackInteractionFactory(rtm, callback=on_message, send_scheduler=_unlimited_scheduler())  # type: ignore
+    events = [rtm.message_event(f"U{index:06d}", "C0000", "hello") for index in range(count)]
+
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    for data in events:
+        await rtm.send(data)
+    await asyncio.sleep(0)
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    live = factory.live_interactions
+    await factory.drain(timeout=0)
+    return {"interactions": live, "bytes_per_interaction": (after - before) / max(live, 1)}
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    results: Dict[str, Any] = {}
+    results["conversations"] = await run_conversations(args.conversations, args.concurrency, args.channels)
+    results["memory"] = await measure_interaction_memory(args.interactions)
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--conversations", type=int, default=2000, help="the number of conversations to run")
+    parser.add_argument("--concurrency", type=int, default=200, help="the number of simultaneous conversations")
+    parser.add_argument("--channels", type=int, default=50, help="the number of channels to spread threads over")
+    parser.add_argument("--interactions", type=int, default=1000, help="the live interactions to measure memory of")
+    parser.add_argument("--model", action="store_true", help="load the default spaCy pipeline")
+    parser.add_argument("--no-lexicon", action="store_true", help="disable the lexical fast path")
+    parser.add_argument("--output", help="write the results to this file instead of stdout")
+    args = parser.parse_args()
+
+    if not args.no_lexicon:
+        chattermouth.nlp.set_lexicon(chattermouth.nlp.create_default_lexicon())
+    if args.model or args.no_lexicon:
+        chattermouth.nlp.set_spacy_pipeline(chattermouth.nlp.get_default_spacy_pipeline(classification_only=True))
+
+    results = asyncio.run(run(args))
+    results["lexicon_hit_rate"] = getattr(chattermouth.nlp.get_lexicon(), "hit_rate", None)
+    emit("conversations", results, args.output)
+
+
+if __name__ == "__main__":
+    main()
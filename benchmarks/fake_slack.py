@@ -0,0 +1,69 @@
+"""An in-process stand-in for the Slack RTM and Web APIs used by the benchmarks."""
+
+import asyncio
+import itertools
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+
+class FakeWebClient:
+    """A stand-in for `slack.WebClient` which records posts instead of sending them.
+
+    Args:
+        latency: The number of seconds each Web API call takes.
+        on_post: Called with the arguments of every `chat_postMessage` call, eg. to simulate a user replying.
+    """
+
+    def __init__(self, latency: float = 0.0, on_post: Optional[Callable[[Dict[str, Any]], None]] = None) -> None:
+        self.latency = latency
+        self.on_post = on_post
+        self.posts: List[Dict[str, Any]] = []
+        self._ts = itertools.count(1)
+
+    def next_ts(self) -> str:
+        """Get a new, unique message `ts`."""
+        return f"{time.time():.0f}.{next(self._ts):06d}"
+
+    async def chat_postMessage(self, **kwargs: Any) -> Dict[str, Any]:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        ts = self.next_ts()
+        self.posts.append(dict(kwargs, ts=ts, posted_at=time.perf_counter()))
+        if self.on_post is not None:
+            self.on_post(kwargs)
+        return {"ok": True, "channel": kwargs.get("channel"), "ts": ts, "message": {"ts": ts, "text": kwargs["text"]}}
+
+    async def users_info(self, user: str) -> Dict[str, Any]:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        profile = {"real_name": f"User {user}", "first_name": "User", "last_name": user, "email": f"{user}@example.com"}
+        return {"ok": True, "user": {"id": user, "profile": profile}}
+
+
+class FakeRTMClient:
+    """A stand-in for `slack.RTMClient` which replays synthetic message events into a handler.
+
+    Args:
+        web_client: The client passed to the handler along with each event.
+    """
+
+    def __init__(self, web_client: FakeWebClient) -> None:
+        self.web_client = web_client
+        self.handlers: List[Callable[..., Any]] = []
+
+    def on(self, *, event: str, callback: Callable[..., Any]) -> None:
+        """Register an event handler like `slack.RTMClient.on`, which `SlackInteractionFactory` calls itself."""
+        assert event == "message", "only message events are simulated"
+        self.handlers.append(callback)
+
+    def message_event(self, user: str, channel: str, text: str, thread_ts: Optional[str] = None) -> Dict[str, Any]:
+        """Create a `message` event."""
+        data = {"type": "message", "user": user, "channel": channel, "text": text, "ts": self.web_client.next_ts()}
+        if thread_ts is not None:
+            data["thread_ts"] = thread_ts
+        return data
+
+    async def send(self, data: Dict[str, Any]) -> None:
+        """Deliver an event to every handler."""
+        for handler in self.handlers:
+            await handler(web_client=self.web_client, data=data)
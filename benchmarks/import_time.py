@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""Measure how long `import chattermouth` takes and check that it doesn't import spaCy.
+
+Run from the repository root with `python benchmarks/import_time.py`. The results are printed as JSON and the exit
+status is non-zero if a heavy module was imported or the import took longer than `--budget` milliseconds.
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from typing import Dict, List
+
+_PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import chattermouth
+elapsed = time.perf_counter() - started
+print(json.dumps({"seconds": elapsed, "modules": sorted(sys.modules)}))
+"""
+
+HEAVY_MODULES = ["spacy", "thinc", "numpy", "slack"]
+"""Modules which `import chattermouth` must not import."""
+
+
+def measure(repeat: int) -> Dict[str, object]:
+    """Import `chattermouth` in `repeat` fresh interpreters and summarize the results."""
+    timings: List[float] = []
+    modules: List[str] = []
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, "-c", _PROBE], check=True, stdout=subprocess.PIPE).stdout
+        result = json.loads(output)
+        timings.append(result["seconds"] * 1000.0)
+        modules = result["modules"]
+
+    return {
+        "benchmark": "import_time",
+        "repeat": repeat,
+        "median_ms": statistics.median(timings),
+        "min_ms": min(timings),
+        "max_ms": max(timings),
+        "module_count": len(modules),
+        "heavy_modules": [module for module in HEAVY_MODULES if module in modules],
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=10, help="the number of fresh interpreters to import in")
+    parser.add_argument("--budget", type=float, default=None, help="the maximum median import time in milliseconds")
+    args = parser.parse_args()
+
+    result = measure(args.repeat)
+    print(json.dumps(result, indent=2))
+
+    if result["heavy_modules"]:
+        print(f"import chattermouth imported {result['heavy_modules']}", file=sys.stderr)
+        return 1
+    if args.budget is not None and result["median_ms"] > args.budget:  # type: ignore
+        print(f"import chattermouth took {result['median_ms']:.1f}ms, over {args.budget}ms", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
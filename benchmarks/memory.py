@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""Measure the memory used by messages and by live interactions, in bytes per object.
+
+Messages and contexts are created without an event loop running other work, and a whole Slack conversation is held
+open through `SlackInteractionFactory` against the fake Slack backend. The results are printed as JSON, so running
+the benchmark before and after a change shows its effect on the footprint of each live interaction.
+"""
+
+import argparse
+import asyncio
+import gc
+import tracemalloc
+from typing import Any, Callable, Dict, List
+
+from chattermouth.cli import CliMessage
+from chattermouth.slack import SlackInteractionContext, SlackMessage, SlackUserInfo
+from common import emit
+from conversations import measure_interaction_memory
+from fake_slack import FakeRTMClient, FakeWebClient
+
+
+def bytes_per_object(create: Callable[[int], Any], count: int) -> float:
+    """Measure the memory retained by each of `count` objects made by `create`."""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    objects = [create(index) for index in range(count)]
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    # Exclude the list holding the objects.
+    return (after - before - objects.__sizeof__()) / count
+
+
+async def measure_objects(count: int) -> Dict[str, float]:
+    web_client = FakeWebClient()
+    rtm = FakeRTMClient(web_client)
+    # Create the inputs up front so only the objects themselves are measured.
+    texts = [f"message {index}" for index in range(count)]
+    events: List[Dict[str, Any]] = [rtm.message_event(f"U{index:06d}", "C0000", texts[index]) for index in range(count)]
+    user = SlackUserInfo(web_client, "U000000")  # type: ignore
+
+    return {
+        "cli_message": bytes_per_object(lambda index: CliMessage(texts[index]), count),
+        "slack_message": bytes_per_object(lambda index: SlackMessage(user, texts[index]), count),
+        "slack_interaction_context": bytes_per_object(
+            lambda index: SlackInteractionContext(web_client, events[index]), count  # type: ignore
+        ),
+    }
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    results: Dict[str, Any] = {"bytes_per_object": await measure_objects(args.objects)}
+    results["live_interactions"] = await measure_interaction_memory(args.interactions)
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--objects", type=int, default=10000, help="the number of each object to create")
+    parser.add_argument("--interactions", type=int, default=1000, help="the live interactions to measure")
+    parser.add_argument("--output", help="write the results to this file instead of stdout")
+    args = parser.parse_args()
+    emit("memory", asyncio.run(run(args)), args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,46 @@
 """A library for text based bot interactions."""
 
-from .core import ask, enter_interaction_context, interaction_context, listen, tell
+import importlib.util
+from typing import Any
 
-__all__ = ["ask", "enter_interaction_context", "interaction_context", "listen", "tell"]
+from .core import (
+    HistogramObserver,
+    InteractionTimeoutError,
+    Observer,
+    TimingEvent,
+    ask,
+    enter_interaction_context,
+    enter_observer,
+    instrumented,
+    interaction_context,
+    listen,
+    tell,
+)
 
-try:
-    from .nlp import ask_yes_or_no, enter_spacy_pipeline, enter_default_spacy_pipeline
+__all__ = [
+    "HistogramObserver",
+    "InteractionTimeoutError",
+    "Observer",
+    "TimingEvent",
+    "ask",
+    "enter_interaction_context",
+    "enter_observer",
+    "interaction_context",
+    "listen",
+    "tell",
+]
 
-    __all__ += ["ask_yes_or_no", "enter_spacy_pipeline", "enter_default_spacy_pipeline"]
-except ImportError:
-    pass
+# The NLP utilities are imported on first access since importing spaCy is slow and uses a lot of memory.
+_nlp_exports = ["ask_and_classify", "ask_yes_or_no", "enter_spacy_pipeline", "enter_default_spacy_pipeline"]
+
+if importlib.util.find_spec("spacy") is not None:
+    __all__ += _nlp_exports
+
+
+def __getattr__(name: str) -> Any:
+    if name in _nlp_exports:
+        from . import nlp
+
+        value = globals()[name] = getattr(nlp, name)
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,14 +1,21 @@
 """An interaction context for the command line."""
 
+import asyncio
 import getpass
 import os
 import pwd
-from typing import Optional
+import stat
+import sys
+import threading
+from functools import lru_cache
+from typing import Optional, TextIO
 
-from .core import AbstractInteractionContext, Message, UserInfo
+from .core import AbstractInteractionContext, Message, UserInfo, instrumented, wait_for_response
 
 
 class CliUserInfo(UserInfo):
+    __slots__ = ("user", "user_id")
+
     def __init__(self):
         self.user: str = getpass.getuser()
         """The username of the user."""
@@ -21,11 +28,19 @@ class CliUserInfo(UserInfo):
         return pwd.getpwnam(self.user).pw_gecos.split(",")[0]
 
 
+@lru_cache(1)
+def get_current_user() -> CliUserInfo:
+    """Get the `CliUserInfo` of the user running the process, which every `CliMessage` shares."""
+    return CliUserInfo()
+
+
 class CliMessage(Message):
     """A message from the CLI."""
 
-    def __init__(self, content: str) -> None:
-        self.user: UserInfo = CliUserInfo()
+    __slots__ = ("user", "content")
+
+    def __init__(self, content: str, user: Optional[UserInfo] = None) -> None:
+        self.user: UserInfo = user or get_current_user()
         """The user associated with this `Message`."""
         self.content: str = content
         """The content of the message."""
@@ -34,19 +49,122 @@ class CliMessage(Message):
         return self.content
 
 
+def _is_pipe(stream: TextIO) -> bool:
+    try:
+        mode = os.fstat(stream.fileno()).st_mode
+    except (AttributeError, OSError, ValueError):
+        return False
+    return stat.S_ISFIFO(mode) or stat.S_ISSOCK(mode)
+
+
+def _resolve_read(future: "asyncio.Future[str]", line: str, error: Optional[Exception]) -> None:
+    if future.done():
+        return
+    if error is not None:
+        future.set_exception(error)
+    else:
+        future.set_result(line)
+
+
 class CliInteractionContext(AbstractInteractionContext):
-    """An interaction context for the CLI."""
+    """An interaction context for the CLI.
 
-    def __init__(self) -> None:
-        pass
+    Reading and writing never blocks the event loop. Input is read in a daemon thread, and output to pipes, which can
+    fill up when a script driving the bot reads slowly, is written in the event loop's default executor. The streams
+    are left in blocking mode, so the rest of the process can keep using them.
 
-    async def tell(self, message: str) -> None:
-        """Send a message to the user."""
-        print(message)
+    A read can't be interrupted, so one abandoned by a timeout keeps waiting for input. A line which arrives while
+    nothing is listening is discarded, it answers a prompt which already timed out. The thread doesn't keep the
+    process from exiting.
+
+    Args:
+        stdin: The stream messages are read from, by default `sys.stdin`.
+        stdout: The stream messages are written to, by default `sys.stdout`.
+    """
+
+    __slots__ = ("default_timeout", "_stdin", "_stdout", "_stdout_is_pipe", "_pending_read")
 
-    async def listen(self) -> CliMessage:
-        """Listen for a message from the user."""
-        return CliMessage(input())
+    def __init__(self, stdin: Optional[TextIO] = None, stdout: Optional[TextIO] = None) -> None:
+        self.default_timeout: Optional[float] = None
+        self._stdin: TextIO = stdin or sys.stdin
+        self._stdout: TextIO = stdout or sys.stdout
+        self._stdout_is_pipe = _is_pipe(self._stdout)
+        self._pending_read: Optional[asyncio.Future] = None
 
-    async def ask(self, message: str) -> CliMessage:
-        return CliMessage(input(message))
+    @property
+    def backend(self) -> str:
+        return "cli"
+
+    @instrumented("tell")
+    async def tell(self, message: str) -> None:
+        """Send a message to the user."""
+        await self._write(message + "\n")
+
+    @instrumented("listen")
+    async def listen(self, timeout: Optional[float] = None) -> CliMessage:
+        """Listen for a message from the user.
+
+        Input which arrives after a timeout, while nothing is listening, is discarded rather than taken as the answer to
+        the next prompt.
+
+        Raises:
+            EOFError: If the input has been closed.
+            InteractionTimeoutError: If the user didn't respond in time.
+        """
+        return CliMessage(await wait_for_response(self, self._readline(), timeout))
+
+    @instrumented("ask")
+    async def ask(self, message: str, timeout: Optional[float] = None) -> CliMessage:
+        """Prompt the user with a message and listen for a response on the same line.
+
+        Raises:
+            EOFError: If the input has been closed.
+            InteractionTimeoutError: If the user didn't respond in time.
+        """
+        await self._write(message)
+        return await self.listen(timeout)
+
+    async def _readline(self) -> str:
+        # A read can't be interrupted, so a read abandoned by a timeout is picked up by the next. If it already
+        # finished, its line was typed in response to an earlier prompt and is discarded.
+        if self._pending_read is not None and self._pending_read.done():
+            if not self._pending_read.cancelled():
+                self._pending_read.exception()
+            self._pending_read = None
+        if self._pending_read is None:
+            self._pending_read = self._start_read()
+        line = await asyncio.shield(self._pending_read)
+        self._pending_read = None
+
+        if not line:
+            raise EOFError("No more input")
+        return line.rstrip("\r\n")
+
+    def _start_read(self) -> "asyncio.Future[str]":
+        # Not the default executor, `asyncio.run` waits for its threads on exit, so a read abandoned by a timeout would
+        # keep the process running until a line or EOF arrives.
+        loop = asyncio.get_running_loop()
+        future: asyncio.Future[str] = loop.create_future()
+
+        def read() -> None:
+            try:
+                line, error = self._stdin.readline(), None
+            except Exception as e:
+                line, error = "", e
+            try:
+                loop.call_soon_threadsafe(_resolve_read, future, line, error)
+            except RuntimeError:
+                pass  # The event loop was closed while reading.
+
+        threading.Thread(target=read, name="chattermouth-cli-reader", daemon=True).start()
+        return future
+
+    async def _write(self, text: str) -> None:
+        if self._stdout_is_pipe:
+            await asyncio.get_running_loop().run_in_executor(None, self._write_now, text)
+        else:
+            self._write_now(text)
+
+    def _write_now(self, text: str) -> None:
+        self._stdout.write(text)
+        self._stdout.flush()
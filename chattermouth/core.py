@@ -1,12 +1,31 @@
 import abc
+import asyncio
+import bisect
+import functools
+import time
 from contextlib import contextmanager
 from contextvars import ContextVar
-from typing import Generator, Optional
+from typing import Any, Awaitable, Callable, Dict, Generator, List, Optional, Sequence, Tuple, TypeVar, cast
+
+_T = TypeVar("_T")
+_F = TypeVar("_F", bound=Callable[..., Awaitable[Any]])
+
+
+class InteractionTimeoutError(asyncio.TimeoutError):
+    """The user didn't respond in time."""
+
+    def __init__(self, timeout: float) -> None:
+        self.timeout: float = timeout
+        """The number of seconds waited."""
+
+        super().__init__(f"No response within {timeout} seconds")
 
 
 class UserInfo(abc.ABC):
     """Information about the user."""
 
+    __slots__ = ()
+
     @abc.abstractmethod
     async def get_full_name(self) -> Optional[str]:
         """Get the full name of the user."""
@@ -32,6 +51,8 @@ class UserInfo(abc.ABC):
 
 
 class Message:
+    __slots__ = ()
+
     user: UserInfo
     content: str
 
@@ -42,8 +63,56 @@ class Message:
         return len(self.content)
 
 
+def instrumented(name: str) -> Callable[[_F], _F]:
+    """Decorate a coroutine method of an `AbstractInteractionContext` so each call is measured.
+
+    A `TimingEvent` named `name` and tagged with the interaction is sent to the current `Observer`, if there is one,
+    whether the method is called directly or through eg. `tell`.
+
+    Args:
+        name: The name of the `TimingEvent`, eg. `"tell"`.
+    """
+
+    def decorator(method: _F) -> _F:
+        @functools.wraps(method)
+        async def measured(self: "AbstractInteractionContext", *args: Any, **kwargs: Any) -> Any:
+            observer = _observer.get()
+            if observer is None:
+                return await method(self, *args, **kwargs)
+
+            started = time.perf_counter()
+            try:
+                return await method(self, *args, **kwargs)
+            finally:
+                observer.observe(TimingEvent(name, time.perf_counter() - started, self.backend, self.interaction_id))
+
+        return cast(_F, measured)
+
+    return decorator
+
+
 class AbstractInteractionContext(abc.ABC):
-    """The abstract super type of the context used for interacting with the user."""
+    """The abstract super type of the context used for interacting with the user.
+
+    Subclasses which define `__slots__` need a `default_timeout` slot, set in their constructor. Implementations of
+    `listen` apply its timeout with `wait_for_response`, and `tell`, `listen` and `ask` are decorated with
+    `instrumented` so they're measured.
+    """
+
+    __slots__ = ()
+
+    default_timeout: Optional[float] = None
+    """The number of seconds to wait for a response when no timeout is given, `None` waits forever."""
+
+    @property
+    def backend(self) -> str:
+        """The name of the backend, used to tag `TimingEvent`s."""
+        return type(self).__name__
+
+    @property
+    def interaction_id(self) -> str:
+        """An identifier of this interaction, used to tag `TimingEvent`s."""
+        return f"{id(self):x}"
 
     @abc.abstractmethod
     async def tell(self, message: str) -> None:
@@ -55,25 +124,60 @@ class AbstractInteractionContext(abc.ABC):
         ...
 
     @abc.abstractmethod
-    async def listen(self) -> Message:
+    async def listen(self, timeout: Optional[float] = None) -> Message:
         """Listen for a message from the user.
 
+        Args:
+            timeout: The number of seconds to wait for a message, by default `default_timeout`.
+
+        Raises:
+            InteractionTimeoutError: If the user didn't respond in time.
+
         Returns:
             The first message the user reponds with.
         """
         ...
 
-    async def ask(self, message: str) -> Message:
+    @instrumented("ask")
+    async def ask(self, message: str, timeout: Optional[float] = None) -> Message:
         """Send a message to the user and listen for a response.
 
         Args:
             message: The message to send to the user.
+            timeout: The number of seconds to wait for a response, by default `default_timeout`.
+
+        Raises:
+            InteractionTimeoutError: If the user didn't respond in time.
 
         Returns:
             The first message the user responds with.
         """
         await self.tell(message)
-        return await self.listen()
+        return await self.listen(timeout)
+
+
+async def wait_for_response(
+    context: AbstractInteractionContext, response: Awaitable[_T], timeout: Optional[float] = None
+) -> _T:
+    """Wait for a response from the user, giving up after a timeout.
+
+    Args:
+        context: The context the response is expected in.
+        response: The awaitable which resolves to the response, it's cancelled if the user doesn't respond in time.
+        timeout: The number of seconds to wait, by default `context.default_timeout`.
+
+    Raises:
+        InteractionTimeoutError: If the user didn't respond in time.
+    """
+    if timeout is None:
+        timeout = context.default_timeout
+    if timeout is None:
+        return await response
+
+    try:
+        return await asyncio.wait_for(response, timeout)
+    except asyncio.TimeoutError:
+        raise InteractionTimeoutError(timeout) from None
 
 
 _context: ContextVar[Optional[AbstractInteractionContext]] = ContextVar("context", default=None)
@@ -115,31 +219,189 @@ def enter_interaction_context(context: Optional[AbstractInteractionContext] = No
     _context.reset(token)
 
 
+class TimingEvent:
+    """A measurement of how long part of an interaction took.
+
+    Args:
+        name: What was measured, eg. `"tell"`, `"listen"`, `"ask"` or `"classify"`.
+        duration: The number of seconds it took.
+        backend: The backend of the interaction, see `AbstractInteractionContext.backend`.
+        interaction: The interaction, see `AbstractInteractionContext.interaction_id`.
+        tags: Extra information about the measurement, eg. whether a classification was cached.
+    """
+
+    def __init__(
+        self, name: str, duration: float, backend: str, interaction: str, tags: Optional[Dict[str, str]] = None
+    ) -> None:
+        self.name: str = name
+        """What was measured."""
+
+        self.duration: float = duration
+        """The number of seconds it took."""
+
+        self.backend: str = backend
+        """The backend of the interaction."""
+
+        self.interaction: str = interaction
+        """The interaction the measurement belongs to."""
+
+        self.tags: Dict[str, str] = tags or {}
+        """Extra information about the measurement."""
+
+    def __repr__(self) -> str:
+        return f"TimingEvent({self.name!r}, {self.duration!r}, {self.backend!r}, {self.interaction!r}, {self.tags!r})"
+
+
+class Observer(abc.ABC):
+    """Receives `TimingEvent`s, eg. to export them as metrics.
+
+    Observers are called on the event loop, so they should return quickly.
+    """
+
+    @abc.abstractmethod
+    def observe(self, event: TimingEvent) -> None:
+        """Handle a `TimingEvent`."""
+        ...
+
+
+DEFAULT_BUCKETS: Sequence[float] = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+"""The default upper bounds of `HistogramObserver` buckets, in seconds."""
+
+
+class HistogramObserver(Observer):
+    """Aggregate `TimingEvent`s into in-memory histograms which can be exported in the Prometheus text format.
+
+    Events are grouped by name, backend and tags. The interaction isn't used since it would create a histogram per
+    conversation.
+
+    >>> observer = HistogramObserver(buckets=[0.1, 1.0])
+    >>> observer.observe(TimingEvent("tell", 0.05, "cli", "1"))
+    >>> print(observer.to_prometheus())
+    # TYPE chattermouth_duration_seconds histogram
+    chattermouth_duration_seconds_bucket{event="tell",backend="cli",le="0.1"} 1
+    chattermouth_duration_seconds_bucket{event="tell",backend="cli",le="1.0"} 1
+    chattermouth_duration_seconds_bucket{event="tell",backend="cli",le="+Inf"} 1
+    chattermouth_duration_seconds_sum{event="tell",backend="cli"} 0.05
+    chattermouth_duration_seconds_count{event="tell",backend="cli"} 1
+
+    Args:
+        buckets: The upper bounds of the histogram buckets, in seconds.
+        metric: The name of the exported metric.
+    """
+
+    def __init__(
+        self, buckets: Sequence[float] = DEFAULT_BUCKETS, metric: str = "chattermouth_duration_seconds"
+    ) -> None:
+        self.buckets: List[float] = sorted(buckets)
+        """The upper bounds of the histogram buckets."""
+
+        self.metric: str = metric
+        """The name of the exported metric."""
+
+        # Label sets mapped to the bucket counts (with a final +Inf bucket) and the sum of the durations.
+        self._histograms: Dict[Tuple[Tuple[str, str], ...], Tuple[List[int], List[float]]] = {}
+
+    def observe(self, event: TimingEvent) -> None:
+        """Add an event to its histogram."""
+        labels = (("event", event.name), ("backend", event.backend)) + tuple(sorted(event.tags.items()))
+        histogram = self._histograms.get(labels)
+        if histogram is None:
+            histogram = self._histograms[labels] = ([0] * (len(self.buckets) + 1), [0.0])
+        counts, total = histogram
+        counts[bisect.bisect_left(self.buckets, event.duration)] += 1
+        total[0] += event.duration
+
+    def to_prometheus(self) -> str:
+        """Export the histograms in the Prometheus text exposition format."""
+        lines = [f"# TYPE {self.metric} histogram"]
+        for labels, (counts, total) in self._histograms.items():
+            label_text = ",".join(f'{key}="{_escape_label(value)}"' for key, value in labels)
+            cumulative = 0
+            for bound, count in zip([*map(str, self.buckets), "+Inf"], counts):
+                cumulative += count
+                lines.append(f'{self.metric}_bucket{{{label_text},le="{bound}"}} {cumulative}')
+            lines.append(f"{self.metric}_sum{{{label_text}}} {total[0]}")
+            lines.append(f"{self.metric}_count{{{label_text}}} {cumulative}")
+        return "\n".join(lines)
+
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+_observer: ContextVar[Optional[Observer]] = ContextVar("observer", default=None)
+
+
+def get_observer() -> Optional[Observer]:
+    """Get the current `Observer`, `None` if nothing is being measured."""
+    return _observer.get()
+
+
+def set_observer(observer: Optional[Observer] = None) -> None:
+    """Set the current `Observer`."""
+    _observer.set(observer)
+
+
+@contextmanager
+def enter_observer(observer: Optional[Observer] = None) -> Generator[None, None, None]:
+    """Set the `Observer` which receives `TimingEvent`s for a scope."""
+    token = _observer.set(observer)
+    yield
+    _observer.reset(token)
+
+
+def record_timing(name: str, duration: float, **tags: str) -> None:
+    """Send a `TimingEvent` to the current `Observer`, tagged with the current interaction if there is one.
+
+    This does nothing if there is no observer, so callers which have to do work to measure something should check
+    `get_observer` first.
+    """
+    observer = _observer.get()
+    if observer is None:
+        return
+
+    context = get_interaction_context()
+    if context is None:
+        observer.observe(TimingEvent(name, duration, "none", "none", tags))
+    else:
+        observer.observe(TimingEvent(name, duration, context.backend, context.interaction_id, tags))
+
+
 async def tell(message: str) -> None:
     """Send a message to the user.
 
     Args:
         message: The message to send to the user.
     """
-    return await interaction_context().tell(message)
+    await interaction_context().tell(message)
 
 
-async def listen() -> Message:
+async def listen(timeout: Optional[float] = None) -> Message:
     """Listen for a message from the user.
 
+    Args:
+        timeout: The number of seconds to wait, by default the context's `default_timeout`.
+
+    Raises:
+        InteractionTimeoutError: If the user didn't respond in time.
+
     Returns:
         The first message the user reponds with.
     """
-    return await interaction_context().listen()
+    return await interaction_context().listen(timeout)
 
 
-async def ask(message: str) -> Message:
+async def ask(message: str, timeout: Optional[float] = None) -> Message:
     """Send a message to the user and listen for a response.
 
     Args:
         message: The message to send to the user.
+        timeout: The number of seconds to wait for a response, by default the context's `default_timeout`.
+
+    Raises:
+        InteractionTimeoutError: If the user didn't respond in time.
 
     Returns:
         The first message the user responds with.
     """
-    return await interaction_context().ask(message)
+    return await interaction_context().ask(message, timeout=timeout)
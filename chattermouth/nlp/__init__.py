@@ -1,18 +1,46 @@
 """General NLP based utilities based on [spaCy](https://spacy.io/)."""
 
+import asyncio
+import contextvars
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor
 from contextlib import contextmanager
 from contextvars import ContextVar
 from functools import lru_cache
-from typing import Any, ContextManager, Dict, Generator, Optional, Sequence
+from pathlib import Path
+from typing import Any, Callable, ContextManager, Dict, Generator, Iterable, List, Optional, Sequence, Tuple, TypeVar
 
 import spacy
 from spacy.util import compounding, minibatch
 
-from ..core import Message, ask
+from ..core import Message, ask, get_observer, record_timing
 from .categories import Category
-from .training import train_pipeline
+from .classification import Classification
+from .feedback import FeedbackStore, OnlineTrainer
+from .inference import score_text, score_texts, trim_pipeline
+from .lexicon import Lexicon, create_default_lexicon
+from .model_cache import load_cached_pipeline, save_cached_pipeline
+from .result_cache import ClassificationCache
+from .service import BatchingClassifier, BatchingMetrics, ClassifierClosedError, ClassifierService
+from .sharing import memory_map_vectors, prepare_for_fork, unfreeze_after_fork
+from .similarity import SimilarityClassifier, add_similarity_classifier, create_similarity_pipeline
+from .training import CLASSIFICATION_PIPES, TrainingReport, train_pipeline
+from .workers import (
+    WorkerPoolClassifier,
+    _create_worker_executor,
+    _get_worker_pipeline,
+    _load_default_pipeline,
+    enter_worker_pool,
+)
 
 _spacy_pipeline: ContextVar[Optional[spacy.language.Language]] = ContextVar("spacy_pipeline", default=None)
+_nlp_executor: ContextVar[Optional[Executor]] = ContextVar("nlp_executor", default=None)
+_classifier_service: ContextVar[Optional[ClassifierService]] = ContextVar("classifier_service", default=None)
+_lexicon: ContextVar[Optional[Lexicon]] = ContextVar("lexicon", default=None)
+_classification_cache: ContextVar[Optional[ClassificationCache]] = ContextVar("classification_cache", default=None)
+_feedback_store: ContextVar[Optional[FeedbackStore]] = ContextVar("feedback_store", default=None)
+
+_T = TypeVar("_T")
 
 
 class NoClassificationError(Exception):
@@ -25,7 +53,7 @@ class NoClassificationError(Exception):
         super().__init__(f"Could not classify {text} as any of {classifications}")
 
 
-async def ask_yes_or_no(question: str, threshold: float = 0.75) -> bool:
+async def ask_yes_or_no(question: str, threshold: float = 0.75, timeout: Optional[float] = None) -> bool:
     """Ask a yes or no question.
 
     ## Example
@@ -45,15 +73,17 @@ async def ask_yes_or_no(question: str, threshold: float = 0.75) -> bool:
     Args:
         question: The question to ask the user.
         threshold: The confidence threshold for the classification.
+        timeout: The number of seconds to wait for a response, by default the context's `default_timeout`.
 
     Raises:
         NoClassificationError: If the response cannot be classifed as a "yes" or a "no".
+        InteractionTimeoutError: If the user didn't respond in time.
 
     Returns:
         `True` if the response was similiar to yes, eg. "Yep, it does." or `False` if if the statement is similiar to
         a no, eg. "No, I don't.".
     """
-    return classify_yes_no(str(await ask(question)), threshold=threshold)
+    return await classify_yes_no_async(str(await ask(question, timeout=timeout)), threshold=threshold)
 
 
 def classify_yes_no(text: str, threshold: float) -> bool:
@@ -75,20 +105,297 @@ def classify_yes_no(text: str, threshold: float) -> bool:
         a no, eg. "No, I don't.".
     """
     assert 0.0 < threshold < 1.0
-    doc = spacy_pipeline()(text)
-    if doc.cats[Category.YES.value] >= threshold and doc.cats[Category.YES.value] >= doc.cats[Category.NO.value]:
+    return _check_yes_no(text, get_category_scores(text), threshold)
+
+
+async def classify_yes_no_async(text: str, threshold: float) -> bool:
+    """Classify a piece of text as either a "yes" response or a "no" response without blocking the event loop.
+
+    Inference is done by the service set with `enter_classifier_service`, or otherwise runs in the executor set with
+    `enter_nlp_executor` or the event loop's default executor.
+
+    Args:
+        text: The text to classify.
+        threshold: The confidence threshold for the classification.
+
+    Raises:
+        NoClassificationError: If the text cannot be classifed as a "yes" or a "no".
+
+    Returns:
+        `True` if the response was similiar to yes, eg. "Yep, it does." or `False` if the statement is similiar to
+        a no, eg. "No, I don't.".
+    """
+    assert 0.0 < threshold < 1.0
+    return _check_yes_no(text, await get_category_scores_async(text), threshold)
+
+
+def classify(text: str, categories: Iterable[Category] = Category, threshold: float = 0.75) -> Classification:
+    """Score a piece of text for several categories at once.
+
+    The pipeline is run at most once, however many categories are of interest.
+
+    ## Example
+    ```python
+    classification = classify(text, [Category.YES, Category.NO, Category.QUESTION])
+    if Category.QUESTION in classification:
+        await tell("Good question!")
+    elif classification.best is Category.YES:
+        apply_change(change_id)
+    ```
+
+    Args:
+        text: The text to classify.
+        categories: The categories of interest, by default every `Category`.
+        threshold: The score a category needs to match.
+    """
+    return Classification(text, get_category_scores(text), categories, threshold)
+
+
+async def classify_async(
+    text: str, categories: Iterable[Category] = Category, threshold: float = 0.75
+) -> Classification:
+    """Score a piece of text for several categories at once without blocking the event loop.
+
+    See `classify` and `classify_yes_no_async`.
+    """
+    return Classification(text, await get_category_scores_async(text), categories, threshold)
+
+
+def classify_many(
+    texts: Iterable[str], categories: Iterable[Category] = Category, threshold: float = 0.75, batch_size: int = 128
+) -> List[Classification]:
+    """Score many pieces of text for several categories, running the pipeline over them in batches.
+
+    Args:
+        texts: The texts to classify.
+        categories: The categories of interest, by default every `Category`.
+        threshold: The score a category needs to match.
+        batch_size: The number of texts the pipeline scores at a time.
+
+    Returns:
+        A `Classification` of each text, in order.
+    """
+    texts = list(texts)
+    categories = list(categories)
+    nlp = spacy_pipeline()
+    scores, missing = _lookup_many_scores(nlp, texts)
+    if missing:
+        _store_many_scores(nlp, texts, scores, missing, score_texts(nlp, [texts[i] for i in missing], batch_size))
+    return [Classification(text, cats, categories, threshold) for text, cats in zip(texts, scores)]
+
+
+async def classify_many_async(
+    texts: Iterable[str], categories: Iterable[Category] = Category, threshold: float = 0.75, batch_size: int = 128
+) -> List[Classification]:
+    """Score many pieces of text for several categories without blocking the event loop.
+
+    Texts are scored concurrently by the current `ClassifierService`, which batches them, or otherwise as batches in
+    the current NLP executor. See `classify_many`.
+    """
+    texts = list(texts)
+    categories = list(categories)
+    service = get_classifier_service()
+    model = _get_scoring_model()
+    scores, missing = _lookup_many_scores(model, texts)
+    if missing:
+        if service is not None:
+            results = await asyncio.gather(*(service.score(texts[i]) for i in missing))
+        else:
+            results = await run_in_nlp_executor(_score_many_with_pipeline, [texts[i] for i in missing], batch_size)
+        _store_many_scores(model, texts, scores, missing, results)
+    return [Classification(text, cats, categories, threshold) for text, cats in zip(texts, scores)]
+
+
+async def ask_and_classify(
+    question: str, categories: Iterable[Category] = Category, threshold: float = 0.75, timeout: Optional[float] = None
+) -> Classification:
+    """Ask a question and score the response for several categories at once.
+
+    ## Example
+    ```python
+    answer = await ask_and_classify("Do you want to apply that change now?")
+    if Category.QUESTION in answer:
+        await tell("It updates the load balancer configuration.")
+    elif answer.best is Category.YES:
+        apply_change(change_id)
+    elif answer.best is Category.NO:
+        await tell(f"Okay, if you want to apply it later run 'corp-apply-change {change_id}'.")
+    else:
+        await tell("Sorry, I didn't understand that")
+    ```
+
+    Args:
+        question: The question to ask the user.
+        categories: The categories of interest, by default every `Category`.
+        threshold: The score a category needs to match.
+        timeout: The number of seconds to wait for a response, by default the context's `default_timeout`.
+
+    Raises:
+        InteractionTimeoutError: If the user didn't respond in time.
+    """
+    return await classify_async(str(await ask(question, timeout=timeout)), categories, threshold)
+
+
+def get_category_scores(text: str) -> Dict[str, float]:
+    """Get the score of every `Category` for a piece of text.
+
+    Answers in the current `Lexicon` are resolved without running the pipeline, and other results are cached in the
+    current `ClassificationCache`, both of which are disabled by default. If there is an `Observer`, a `"classify"`
+    `TimingEvent` is recorded with a `source` tag of `"lexicon"`, `"cache"` or `"model"`.
+
+    Returns:
+        A mapping from `Category` values to their scores.
+    """
+    if get_observer() is None:
+        return _get_category_scores(text)[0]
+
+    started = time.perf_counter()
+    scores, source = _get_category_scores(text)
+    record_timing("classify", time.perf_counter() - started, source=source)
+    return scores
+
+
+async def get_category_scores_async(text: str) -> Dict[str, float]:
+    """Get the score of every `Category` for a piece of text without blocking the event loop.
+
+    See `get_category_scores` and `classify_yes_no_async`.
+    """
+    if get_observer() is None:
+        return (await _get_category_scores_async(text))[0]
+
+    started = time.perf_counter()
+    scores, source = await _get_category_scores_async(text)
+    record_timing("classify", time.perf_counter() - started, source=source)
+    return scores
+
+
+def _get_category_scores(text: str) -> Tuple[Dict[str, float], str]:
+    # Returns the scores along with where they came from, "lexicon", "cache" or "model".
+    scores = _lookup_scores(text)
+    if scores is not None:
+        return scores, "lexicon"
+
+    nlp = spacy_pipeline()
+    cache = get_classification_cache()
+    if cache is not None:
+        scores = cache.get(nlp, text)
+        if scores is not None:
+            return scores, "cache"
+
+    model_scores = score_text(nlp, text)
+    if cache is not None:
+        cache.put(nlp, text, model_scores)
+    return model_scores, "model"
+
+
+async def _get_category_scores_async(text: str) -> Tuple[Dict[str, float], str]:
+    scores = _lookup_scores(text)
+    if scores is not None:
+        return scores, "lexicon"
+
+    service = get_classifier_service()
+    model = _get_scoring_model()
+    cache = get_classification_cache() if model is not None else None
+    if cache is not None:
+        scores = cache.get(model, text)
+        if scores is not None:
+            return scores, "cache"
+
+    if service is not None:
+        model_scores = await service.score(text)
+    else:
+        model_scores = await run_in_nlp_executor(_score_with_pipeline, text)
+
+    if cache is not None:
+        cache.put(model, text, model_scores)
+    return model_scores, "model"
+
+
+def _get_scoring_model() -> Optional[object]:
+    # The object which scores text for the asynchronous functions, whose generation keys their cached results. Process
+    # executors score with their workers' own pipelines, so results are cached per executor.
+    service = get_classifier_service()
+    if service is not None:
+        return service.model
+    executor = get_nlp_executor()
+    if isinstance(executor, ProcessPoolExecutor):
+        return executor
+    return get_spacy_pipeline()
+
+
+def _lookup_scores(text: str) -> Optional[Dict[str, float]]:
+    lexicon = get_lexicon()
+    return lexicon.lookup(text) if lexicon is not None else None
+
+
+def _score_with_pipeline(text: str) -> Dict[str, float]:
+    return score_text(spacy_pipeline(), text)
+
+
+def _score_many_with_pipeline(texts: List[str], batch_size: int) -> List[Dict[str, float]]:
+    return list(score_texts(spacy_pipeline(), texts, batch_size))
+
+
+def _lookup_many_scores(model: Any, texts: List[str]) -> Tuple[List[Dict[str, float]], List[int]]:
+    # Returns the scores known without running the pipeline, and the indices of the texts which still need scoring.
+    cache = get_classification_cache() if model is not None else None
+    scores: List[Dict[str, float]] = []
+    missing: List[int] = []
+    for index, text in enumerate(texts):
+        cats = _lookup_scores(text)
+        if cats is None and cache is not None:
+            cats = cache.get(model, text)
+        if cats is None:
+            missing.append(index)
+        scores.append(cats or {})
+    return scores, missing
+
+
+def _store_many_scores(
+    model: Any,
+    texts: List[str],
+    scores: List[Dict[str, float]],
+    missing: List[int],
+    results: Iterable[Dict[str, float]],
+) -> None:
+    cache = get_classification_cache() if model is not None else None
+    for index, cats in zip(missing, results):
+        scores[index] = cats
+        if cache is not None:
+            cache.put(model, texts[index], cats)
+
+
+def _check_yes_no(text: str, cats: Dict[str, float], threshold: float) -> bool:
+    if cats[Category.YES.value] >= threshold and cats[Category.YES.value] >= cats[Category.NO.value]:
         return True
-    elif doc.cats[Category.NO.value] >= threshold:
+    elif cats[Category.NO.value] >= threshold:
         return False
 
     raise NoClassificationError(str(text), [Category.YES, Category.NO])
 
 
 def process_message(message: Message) -> spacy.tokens.doc.Doc:
-    """Run a `Message` through the spaCy pipeline."""
+    """Run a `Message` through the spaCy pipeline.
+
+    Pipelines entered with `enter_default_spacy_pipeline` only classify text by default, so the returned
+    `spacy.tokens.doc.Doc` has no tags, parse or entities unless the pipeline was entered with
+    `classification_only=False`.
+    """
     return spacy_pipeline()(str(message))
 
 
+async def process_message_async(message: Message) -> spacy.tokens.doc.Doc:
+    """Run a `Message` through the spaCy pipeline without blocking the event loop.
+
+    The message is processed by the service set with `enter_classifier_service`, or otherwise in the executor set with
+    `enter_nlp_executor` or the event loop's default executor.
+    """
+    service = get_classifier_service()
+    if service is not None:
+        return await service.process(str(message))
+    return await run_in_nlp_executor(process_message, message)
+
+
 def get_spacy_pipeline() -> Optional[spacy.language.Language]:
     """Get the current `spacy.language.Language`."""
     return _spacy_pipeline.get()
@@ -118,30 +425,250 @@ def enter_spacy_pipeline(context: Optional[spacy.language.Language] = None) -> G
     _spacy_pipeline.reset(token)
 
 
-def enter_default_spacy_pipeline() -> ContextManager:
-    """Set the current spaCy pipeline for a scope to a default."""
-    return enter_spacy_pipeline(get_default_spacy_pipeline())
+def get_nlp_executor() -> Optional[Executor]:
+    """Get the current executor used to run inference, `None` means the event loop's default executor."""
+    return _nlp_executor.get()
+
+
+def set_nlp_executor(executor: Optional[Executor] = None) -> None:
+    """Set the current executor used to run inference."""
+    _nlp_executor.set(executor)
+
+
+@contextmanager
+def enter_nlp_executor(executor: Optional[Executor] = None) -> Generator[None, None, None]:
+    """Set the executor used to run inference for a scope.
+
+    Thread executors see the caller's spaCy pipeline. Process executors can't share the caller's pipeline, so each
+    worker uses its own, see `create_nlp_process_executor`.
+    """
+    token = _nlp_executor.set(executor)
+    yield
+    _nlp_executor.reset(token)
+
+
+def create_nlp_process_executor(
+    max_workers: Optional[int] = None,
+    load_pipeline: Callable[[], spacy.language.Language] = _load_default_pipeline,
+    mmap_vectors: bool = False,
+) -> ProcessPoolExecutor:
+    """Create a process pool whose workers each load a pipeline once on startup.
+
+    The workers are started like those of a `WorkerPoolClassifier`, and use the same pipeline.
+
+    Args:
+        max_workers: The number of worker processes, defaults to the number of CPUs.
+        load_pipeline: A picklable function called once in each worker to load its pipeline, by default the cached
+            classification-only pipeline.
+        mmap_vectors: Whether to memory-map the pipeline's word vectors, see `memory_map_vectors`.
+    """
+    return _create_worker_executor(max_workers, load_pipeline, mmap_vectors)
+
+
+def _call_in_worker(func: Callable[..., _T], *args: Any) -> _T:
+    with enter_spacy_pipeline(_get_worker_pipeline()):
+        return func(*args)
+
+
+async def run_in_nlp_executor(func: Callable[..., _T], *args: Any) -> _T:
+    """Call `func(*args)` in the current NLP executor.
+
+    For thread executors the call runs in a copy of the current `contextvars.Context`, so `spacy_pipeline()` returns
+    the same pipeline as it does for the caller. For process executors `func` and its arguments must be picklable.
+    """
+    loop = asyncio.get_running_loop()
+    executor = get_nlp_executor()
+    if isinstance(executor, ProcessPoolExecutor):
+        return await loop.run_in_executor(executor, _call_in_worker, func, *args)
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(executor, context.run, func, *args)
+
+
+def get_classifier_service() -> Optional[ClassifierService]:
+    """Get the current `ClassifierService`."""
+    return _classifier_service.get()
+
+
+def set_classifier_service(service: Optional[ClassifierService] = None) -> None:
+    """Set the current `ClassifierService`."""
+    _classifier_service.set(service)
+
+
+@contextmanager
+def enter_classifier_service(service: Optional[ClassifierService] = None) -> Generator[None, None, None]:
+    """Set the `ClassifierService` used by the asynchronous classification functions for a scope."""
+    token = _classifier_service.set(service)
+    yield
+    _classifier_service.reset(token)
+
+
+def get_lexicon() -> Optional[Lexicon]:
+    """Get the `Lexicon` consulted before running the spaCy pipeline, `None` if the fast path is disabled.
+
+    The fast path is disabled by default, enable it with eg. `set_lexicon(create_default_lexicon())`.
+    """
+    return _lexicon.get()
+
+
+def set_lexicon(lexicon: Optional[Lexicon] = None) -> None:
+    """Set the `Lexicon` consulted before running the spaCy pipeline."""
+    _lexicon.set(lexicon)
+
+
+@contextmanager
+def enter_lexicon(lexicon: Optional[Lexicon] = None) -> Generator[None, None, None]:
+    """Set the `Lexicon` consulted before running the spaCy pipeline for a scope, `None` disables the fast path."""
+    token = _lexicon.set(lexicon)
+    yield
+    _lexicon.reset(token)
+
+
+def get_classification_cache() -> Optional[ClassificationCache]:
+    """Get the current `ClassificationCache`, `None` if results aren't cached.
+
+    Results aren't cached by default, enable caching with eg. `set_classification_cache(ClassificationCache())`.
+    """
+    return _classification_cache.get()
+
+
+def set_classification_cache(cache: Optional[ClassificationCache] = None) -> None:
+    """Set the current `ClassificationCache`."""
+    _classification_cache.set(cache)
+
+
+@contextmanager
+def enter_classification_cache(cache: Optional[ClassificationCache] = None) -> Generator[None, None, None]:
+    """Set the `ClassificationCache` for a scope, `None` disables caching."""
+    token = _classification_cache.set(cache)
+    yield
+    _classification_cache.reset(token)
+
+
+def record_feedback(text: str, categories: Iterable[Category]) -> None:
+    """Record the correct categories of a piece of text in the current `FeedbackStore`, if there is one.
+
+    An `OnlineTrainer` watching the store fine-tunes the pipeline on the recorded examples. This writes to the store
+    directly, so asynchronous callers should use `record_feedback_async`.
+    """
+    store = get_feedback_store()
+    if store is not None:
+        store.record(text, categories)
+
+
+async def record_feedback_async(text: str, categories: Iterable[Category]) -> None:
+    """Record the correct categories of a piece of text without blocking the event loop.
+
+    The store is written to in the event loop's default executor, see `record_feedback`.
+
+    ## Example
+    ```python
+    try:
+        liked = await ask_yes_or_no("Do you like apple pie?")
+    except NoClassificationError as e:
+        liked = await ask_yes_or_no("Sorry, was that a yes?")
+        await record_feedback_async(e.text, {Category.YES} if liked else {Category.NO})
+    ```
+    """
+    store = get_feedback_store()
+    if store is not None:
+        await store.record_async(text, categories)
+
+
+def get_feedback_store() -> Optional[FeedbackStore]:
+    """Get the current `FeedbackStore`."""
+    return _feedback_store.get()
+
+
+def set_feedback_store(store: Optional[FeedbackStore] = None) -> None:
+    """Set the current `FeedbackStore`."""
+    _feedback_store.set(store)
+
+
+@contextmanager
+def enter_feedback_store(store: Optional[FeedbackStore] = None) -> Generator[None, None, None]:
+    """Set the `FeedbackStore` used by `record_feedback` and `record_feedback_async` for a scope."""
+    token = _feedback_store.set(store)
+    yield
+    _feedback_store.reset(token)
+
+
+def enter_default_spacy_pipeline(classification_only: bool = True) -> ContextManager:
+    """Set the current spaCy pipeline for a scope to a default.
+
+    Args:
+        classification_only: If `True` only the components needed for text classification are loaded, which saves
+            time and memory. Pass `False` to use `process_message` with the full pipeline.
+    """
+    return enter_spacy_pipeline(get_default_spacy_pipeline(classification_only))
+
+
+def preload_default_spacy_pipeline(mmap_vectors: bool = False) -> spacy.language.Language:
+    """Load the default classification-only pipeline so it can be shared with forked worker processes.
+
+    Call this in the parent process before creating workers with the `fork` start method, eg. with
+    `create_nlp_process_executor` or `WorkerPoolClassifier`. The workers find the pipeline already loaded by
+    `get_default_spacy_pipeline` and share its memory copy-on-write, see `chattermouth.nlp.sharing`. Do this before
+    the event loop or any other threads start, and call `unfreeze_after_fork` once the workers are running.
+
+    Args:
+        mmap_vectors: Whether to memory-map the pipeline's word vectors from disk, see `memory_map_vectors`.
+
+    Returns:
+        The pipeline, which is also the one returned by `get_default_spacy_pipeline(classification_only=True)`.
+    """
+    nlp = get_default_spacy_pipeline(classification_only=True)
+    if mmap_vectors:
+        memory_map_vectors(nlp)
+    prepare_for_fork(nlp)
+    return nlp
 
 
 _spacy_model_sizes = ["lg", "md", "sm"]
 _spacy_languages = ["en"]
 
 
-@lru_cache(1)
-def get_default_spacy_pipeline() -> spacy.language.Language:
-    """Get a default spaCy pipeline."""
-    nlp = None
+def _is_model_installed(name: str) -> bool:
+    if spacy.util.is_package(name):
+        return True
+    # Models can also be shortcut links in spaCy's data directory or paths, which `spacy.load` resolves as well.
+    data_path = spacy.util.get_data_path()
+    return (data_path is not None and (data_path / name).exists()) or Path(name).exists()
+
 
+def _find_default_model_name() -> Optional[str]:
     for language in _spacy_languages:
         for size in _spacy_model_sizes:
-            try:
-                nlp = spacy.load(f"{language}_core_web_{size}")
-                break
-            except OSError:
-                pass
+            name = f"{language}_core_web_{size}"
+            if _is_model_installed(name):
+                return name
+    return None
 
-    if nlp is None:
+
+def get_default_spacy_pipeline(classification_only: bool = True) -> spacy.language.Language:
+    """Get a default spaCy pipeline.
+
+    The trained pipeline is cached on disk (see `chattermouth.nlp.model_cache`) so only the first start after the
+    spaCy version, base model or training data changes pays for training. Each variant is loaded once per process, and
+    forked processes inherit the variants their parent loaded. Asking for both variants keeps both in memory.
+
+    Args:
+        classification_only: If `True` the pipeline only contains the components needed for text classification,
+            pass `False` for the full pipeline with tags, parse and entities.
+    """
+    return _load_default_spacy_pipeline(bool(classification_only))
+
+
+@lru_cache(2)
+def _load_default_spacy_pipeline(classification_only: bool) -> spacy.language.Language:
+    model_name = _find_default_model_name()
+    if model_name is None:
         raise Exception("Failed to find any models")
 
-    train_pipeline(nlp)
+    nlp = load_cached_pipeline(model_name, pipes=CLASSIFICATION_PIPES if classification_only else None)
+    if nlp is None:
+        nlp = spacy.load(model_name)
+        train_pipeline(nlp)
+        save_cached_pipeline(nlp, model_name)
+        if classification_only:
+            trim_pipeline(nlp)
     return nlp
@@ -0,0 +1,192 @@
+"""Classify a stream of texts, eg. exported transcripts, from the command line.
+
+Each input line is either plain text or, with `--format jsonl`, a JSON object with the text in the field given by
+`--field`. One JSON object is written per input line, in order, with the score of every `Category` and the yes or no
+decision `ask_yes_or_no` would make at the given threshold. Input is read as it's classified, so memory use doesn't
+grow with the size of the input. A summary including the throughput is printed to stderr at the end.
+
+```sh
+python -m chattermouth.nlp.batch transcripts.jsonl --format jsonl --field text --n-process 4 > scores.jsonl
+```
+"""
+
+import argparse
+import json
+import sys
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Iterable, Iterator, Optional, TextIO, Tuple
+
+import spacy
+
+from . import NoClassificationError, _check_yes_no, get_default_spacy_pipeline
+from .lexicon import Lexicon, create_default_lexicon
+
+# An input record, the text to classify and the scores if they're already known.
+_Record = Tuple[Dict[str, Any], str, Optional[Dict[str, float]]]
+
+
+def _read_records(lines: Iterable[str], jsonl: bool, field: str, stats: Dict[str, int]) -> Iterator[Tuple[dict, str]]:
+    for number, line in enumerate(lines, 1):
+        line = line.rstrip("\r\n")
+        if not line.strip():
+            continue
+        if not jsonl:
+            yield {"text": line}, line
+            continue
+
+        try:
+            record = json.loads(line)
+            text = record[field]
+        except (KeyError, TypeError, ValueError):
+            stats["skipped"] += 1
+            print(f"Skipping line {number}, it isn't a JSON object with a {field!r} field", file=sys.stderr)
+            continue
+        if isinstance(text, str):
+            yield record, text
+        else:
+            stats["skipped"] += 1
+            print(f"Skipping line {number}, its {field!r} field isn't a string", file=sys.stderr)
+
+
+def classify_stream(
+    nlp: spacy.language.Language,
+    records: Iterable[Tuple[dict, str]],
+    lexicon: Optional[Lexicon] = None,
+    batch_size: int = 256,
+    n_process: int = 1,
+) -> Iterator[Tuple[dict, str, Dict[str, float]]]:
+    """Score a stream of records in order, running the texts which aren't in the lexicon through `nlp.pipe`.
+
+    Args:
+        nlp: The pipeline, usually a classification-only pipeline.
+        records: Pairs of a record and the text to classify.
+        lexicon: The lexicon which answers are first looked up in, if any.
+        batch_size: The number of texts `nlp.pipe` processes at a time.
+        n_process: The number of processes `nlp.pipe` uses.
+
+    Returns:
+        Triples of the record, its text and its category scores.
+    """
+    # Records wait here until every earlier record has been scored. Texts `nlp.pipe` has read and not yet returned
+    # keep the queue around `batch_size * n_process` long. Lexicon hits read ahead with them are bounded by ending the
+    # `nlp.pipe` call once the queue reaches `limit`, after which hits are emitted straight away until the next text
+    # which needs the model.
+    records = iter(records)
+    waiting: Deque[_Record] = deque()
+    limit = 4 * batch_size * max(n_process, 1)
+
+    def lookup(text: str) -> Optional[Dict[str, float]]:
+        return lexicon.lookup(text) if lexicon is not None else None
+
+    def unknown_texts(record: dict, text: str) -> Iterator[str]:
+        waiting.append((record, text, None))
+        yield text
+        for record, text in records:
+            cats = lookup(text)
+            waiting.append((record, text, cats))
+            if cats is None:
+                yield text
+            elif len(waiting) >= limit:
+                return
+
+    for record, text in records:
+        cats = lookup(text)
+        if cats is not None:
+            yield record, text, cats
+            continue
+
+        for doc in nlp.pipe(unknown_texts(record, text), batch_size=batch_size, n_process=n_process):
+            while True:
+                record, text, cats = waiting.popleft()
+                if cats is None:
+                    yield record, text, doc.cats
+                    break
+                yield record, text, cats
+        while waiting:
+            record, text, cats = waiting.popleft()
+            assert cats is not None
+            yield record, text, cats
+
+
+def _decide(text: str, cats: Dict[str, float], threshold: float) -> Optional[str]:
+    try:
+        return "YES" if _check_yes_no(text, cats, threshold) else "NO"
+    except NoClassificationError:
+        return None
+
+
+def run(
+    nlp: spacy.language.Language,
+    input_file: TextIO,
+    output_file: TextIO,
+    jsonl: bool = False,
+    field: str = "text",
+    threshold: float = 0.75,
+    lexicon: Optional[Lexicon] = None,
+    batch_size: int = 256,
+    n_process: int = 1,
+) -> Dict[str, Any]:
+    """Classify every line of `input_file` and write the results to `output_file`, see the module documentation.
+
+    Returns:
+        Counts of the lines classified, skipped and of each decision, and the throughput.
+    """
+    stats = {"classified": 0, "skipped": 0, "YES": 0, "NO": 0, "none": 0}
+    started = time.perf_counter()
+    records = _read_records(input_file, jsonl, field, stats)
+    for record, text, cats in classify_stream(nlp, records, lexicon, batch_size, n_process):
+        decision = _decide(text, cats, threshold)
+        stats["classified"] += 1
+        stats[decision or "none"] += 1
+        output_file.write(json.dumps(dict(record, scores=cats, decision=decision), ensure_ascii=False) + "\n")
+
+    seconds = time.perf_counter() - started
+    return dict(stats, seconds=seconds, texts_per_second=stats["classified"] / seconds if seconds else 0.0)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("input", nargs="?", default="-", help="the file to classify, stdin by default")
+    parser.add_argument("--output", default="-", help="the file to write the results to, stdout by default")
+    parser.add_argument("--format", choices=["text", "jsonl"], default="text", help="the format of the input")
+    parser.add_argument("--field", default="text", help="the field of each JSON object holding the text")
+    parser.add_argument("--threshold", type=float, default=0.75, help="the confidence threshold of the decision")
+    parser.add_argument("--batch-size", type=int, default=256, help="the number of texts processed at a time")
+    parser.add_argument("--n-process", type=int, default=1, help="the number of processes used by nlp.pipe")
+    parser.add_argument("--lexicon", action="store_true", help="look common answers up in the default lexicon first")
+    args = parser.parse_args()
+    if not 0.0 < args.threshold < 1.0:
+        parser.error("--threshold must be between 0 and 1")
+
+    nlp = get_default_spacy_pipeline(classification_only=True)
+    lexicon = create_default_lexicon() if args.lexicon else None
+    input_file = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8")
+    output_file = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    try:
+        stats = run(
+            nlp,
+            input_file,
+            output_file,
+            jsonl=args.format == "jsonl",
+            field=args.field,
+            threshold=args.threshold,
+            lexicon=lexicon,
+            batch_size=args.batch_size,
+            n_process=args.n_process,
+        )
+    finally:
+        if input_file is not sys.stdin:
+            input_file.close()
+        if output_file is not sys.stdout:
+            output_file.close()
+
+    print(
+        f"Classified {stats['classified']} texts in {stats['seconds']:.2f}s ({stats['texts_per_second']:.1f}/s): "
+        f"{stats['YES']} yes, {stats['NO']} no, {stats['none']} unclassified, {stats['skipped']} skipped",
+        file=sys.stderr,
+    )
+
+
+if __name__ == "__main__":
+    main()
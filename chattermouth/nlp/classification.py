@@ -0,0 +1,64 @@
+"""The result of classifying a piece of text into several categories at once."""
+
+from typing import AbstractSet, Dict, FrozenSet, Iterable, Optional
+
+from .categories import Category
+
+
+class Classification:
+    """The scores of every category for a piece of text, and the categories which scored above a threshold.
+
+    >>> classification = Classification("yes?", {"YES": 0.9, "NO": 0.1, "QUESTION": 0.8}, threshold=0.75)
+    >>> Category.YES in classification, Category.NO in classification
+    (True, False)
+    >>> classification.best
+    <Category.YES: 'YES'>
+    >>> sorted(category.value for category in classification.matches)
+    ['QUESTION', 'YES']
+
+    Args:
+        text: The text which was classified.
+        scores: A mapping from `Category` values to their scores.
+        categories: The categories of interest, by default every `Category`.
+        threshold: The score a category needs to match.
+    """
+
+    def __init__(
+        self, text: str, scores: Dict[str, float], categories: Iterable[Category] = Category, threshold: float = 0.5
+    ) -> None:
+        assert 0.0 < threshold < 1.0
+
+        self.text: str = text
+        """The text which was classified."""
+
+        self.scores: Dict[Category, float] = {category: scores.get(category.value, 0.0) for category in categories}
+        """The scores of the categories of interest."""
+
+        self.threshold: float = threshold
+        """The score a category needs to match."""
+
+        self.matches: FrozenSet[Category] = frozenset(
+            category for category, score in self.scores.items() if score >= threshold
+        )
+        """The categories which scored at least `threshold`."""
+
+    @property
+    def best(self) -> Optional[Category]:
+        """The highest scoring matching category, `None` if nothing matched."""
+        if not self.matches:
+            return None
+        return max(self.matches, key=self.scores.__getitem__)
+
+    def matches_any(self, categories: AbstractSet[Category]) -> bool:
+        """Check whether any of `categories` matched."""
+        return not self.matches.isdisjoint(categories)
+
+    def __contains__(self, category: object) -> bool:
+        return category in self.matches
+
+    def __bool__(self) -> bool:
+        return bool(self.matches)
+
+    def __repr__(self) -> str:
+        scores = ", ".join(f"{category.value}={score:.3f}" for category, score in self.scores.items())
+        return f"Classification({self.text!r}, {scores})"
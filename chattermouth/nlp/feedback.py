@@ -0,0 +1,243 @@
+"""Learning from corrected classifications while the bot is running."""
+
+import asyncio
+import json
+import logging
+import random
+import threading
+from concurrent.futures import Executor
+from pathlib import Path
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Tuple, Union
+
+import spacy
+from spacy.gold import GoldParse
+from spacy.util import compounding, minibatch
+
+from .categories import Category
+from .inference import get_classification_pipes
+from .training import BATCH_SIZE, DROPOUT, TEXTCAT, TRAINING_DATA, _create_training_entry, invalidate_model_generation
+
+_logger = logging.getLogger(__name__)
+
+Example = Tuple[str, FrozenSet[Category]]
+
+
+class FeedbackStore:
+    """An append-only file of labelled examples, one JSON object per line.
+
+    ## Example
+    ```python
+    store = FeedbackStore("feedback.jsonl")
+    try:
+        liked = await ask_yes_or_no("Do you like apple pie?")
+    except NoClassificationError as e:
+        liked = await ask_yes_or_no("Sorry, was that a yes?")
+        await store.record_async(e.text, {Category.YES} if liked else {Category.NO})
+    ```
+
+    Args:
+        path: The file examples are appended to, which is created if needed.
+    """
+
+    def __init__(self, path: Union[str, Path]) -> None:
+        self.path: Path = Path(path)
+        """The file examples are appended to."""
+
+        self._lock = threading.Lock()
+
+    def record(self, text: str, categories: Iterable[Category]) -> None:
+        """Append a labelled example.
+
+        Args:
+            text: The text of the example.
+            categories: Every category the text belongs to, which may be none.
+        """
+        line = json.dumps({"text": text, "categories": sorted(category.value for category in categories)})
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as store:
+                store.write(line + "\n")
+
+    async def record_async(self, text: str, categories: Iterable[Category]) -> None:
+        """Append a labelled example without blocking the event loop, see `record`."""
+        await asyncio.get_running_loop().run_in_executor(None, self.record, text, frozenset(categories))
+
+    def read(self, offset: int = 0) -> Tuple[List[Example], int]:
+        """Read the examples recorded after `offset`.
+
+        Args:
+            offset: The offset returned by a previous call, 0 reads every example.
+
+        Returns:
+            The examples, and the offset to pass to the next call to only read newer examples.
+        """
+        try:
+            with open(self.path, "rb") as store:
+                store.seek(offset)
+                data = store.read()
+        except FileNotFoundError:
+            return [], offset
+
+        # Leave a partially written last line for the next call.
+        complete = data[: data.rfind(b"\n") + 1]
+        examples: List[Example] = []
+        for line in complete.splitlines():
+            try:
+                entry = json.loads(line)
+                examples.append((entry["text"], frozenset(Category(value) for value in entry["categories"])))
+            except (KeyError, TypeError, ValueError):
+                _logger.warning("Skipping malformed feedback entry %r", line)
+        return examples, offset + len(complete)
+
+
+class OnlineTrainer:
+    """Fine-tune a pipeline's `textcat` component on the examples in a `FeedbackStore` in the background.
+
+    Each update fine-tunes a copy of the component in an executor, so classifications continue with the current
+    component meanwhile. The copy then replaces it in the pipeline in one step, and the pipeline gets a new model
+    generation so results cached for the old component aren't used. Every example in the store is learnt from when
+    the trainer starts, so corrections survive restarts.
+
+    To avoid forgetting what it already knows, each update also rehearses a random sample of `TRAINING_DATA`.
+
+    ## Example
+    ```python
+    nlp = get_default_spacy_pipeline(classification_only=True)
+    trainer = OnlineTrainer(nlp, FeedbackStore("feedback.jsonl"))
+    trainer.start()
+    with enter_spacy_pipeline(nlp):
+        ...
+    await trainer.stop()
+    ```
+
+    Args:
+        nlp: The pipeline whose `textcat` component is fine-tuned.
+        store: The store of labelled examples.
+        interval: The number of seconds between checks for new examples.
+        min_examples: The number of new examples needed for an update.
+        epochs: The number of passes made over the examples in each update.
+        rehearsal: The number of `TRAINING_DATA` examples rehearsed per new example.
+        executor: The executor fine-tuning runs in, `None` means the event loop's default executor.
+    """
+
+    def __init__(
+        self,
+        nlp: spacy.language.Language,
+        store: FeedbackStore,
+        interval: float = 60.0,
+        min_examples: int = 1,
+        epochs: int = 5,
+        rehearsal: float = 1.0,
+        executor: Optional[Executor] = None,
+    ) -> None:
+        assert min_examples > 0 and epochs > 0 and rehearsal >= 0.0
+
+        self.nlp: spacy.language.Language = nlp
+        """The pipeline whose `textcat` component is fine-tuned."""
+
+        self.store: FeedbackStore = store
+        """The store of labelled examples."""
+
+        self.interval: float = interval
+        """The number of seconds between checks for new examples."""
+
+        self.min_examples: int = min_examples
+        """The number of new examples needed for an update."""
+
+        self.epochs: int = epochs
+        """The number of passes made over the examples in each update."""
+
+        self.rehearsal: float = rehearsal
+        """The number of `TRAINING_DATA` examples rehearsed per new example."""
+
+        self.updates: int = 0
+        """The number of times the component has been replaced."""
+
+        self.examples_learnt: int = 0
+        """The number of examples from the store which have been learnt from."""
+
+        self._executor = executor
+        self._offset = 0
+        self._pending: List[Example] = []
+        self._lock: Optional[asyncio.Lock] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        """Start checking for new examples every `interval` seconds."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop checking for new examples, waiting for a running update to finish."""
+        if self._task is None:
+            return
+        task, self._task = self._task, None
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        # Updates run holding the lock, so the task can only be cancelled between them.
+        async with self._lock:
+            task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+    async def update(self) -> bool:
+        """Fine-tune on any new examples now.
+
+        Returns:
+            `True` if the component was replaced, `False` if there weren't enough new examples.
+        """
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            loop = asyncio.get_running_loop()
+            examples, self._offset = await loop.run_in_executor(None, self.store.read, self._offset)
+            self._pending.extend(examples)
+            if len(self._pending) < self.min_examples:
+                return False
+
+            examples = list(self._pending)
+            textcat = await loop.run_in_executor(self._executor, self._fine_tune, examples)
+            self._pending.clear()
+            # Replacing the component is a single assignment, batches already running keep the old one.
+            self.nlp.replace_pipe(TEXTCAT, textcat)
+            invalidate_model_generation(self.nlp)
+            self.updates += 1
+            self.examples_learnt += len(examples)
+            return True
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.update()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                _logger.exception("Failed to fine-tune the pipeline")
+            await asyncio.sleep(self.interval)
+
+    def _fine_tune(self, examples: List[Example]) -> Any:
+        current = self.nlp.get_pipe(TEXTCAT)
+        textcat = self.nlp.create_pipe(TEXTCAT, config=current.cfg)
+        textcat.from_bytes(current.to_bytes())
+        # Components the text classifier depends on, eg. a shared `tok2vec`, are run but not updated.
+        preceding = [proc for name, proc in get_classification_pipes(self.nlp) if name != TEXTCAT]
+
+        rehearsed = random.sample(TRAINING_DATA, min(len(TRAINING_DATA), round(len(examples) * self.rehearsal)))
+        data = [_create_training_entry(text, list(categories)) for text, categories in [*examples, *rehearsed]]
+
+        optimizer = textcat.create_optimizer()
+        for _ in range(self.epochs):
+            losses: Dict[str, Any] = {}
+            random.shuffle(data)
+            for batch in minibatch(data, size=compounding(*BATCH_SIZE)):
+                docs = []
+                for text, _ in batch:
+                    doc = self.nlp.make_doc(text)
+                    for proc in preceding:
+                        doc = proc(doc)
+                    docs.append(doc)
+                golds = [GoldParse(doc, cats=annotations["cats"]) for doc, (_, annotations) in zip(docs, batch)]
+                textcat.update(docs, golds, sgd=optimizer, drop=DROPOUT, losses=losses)
+        return textcat
@@ -0,0 +1,40 @@
+"""Helpers for running only the parts of a spaCy pipeline needed for text classification."""
+
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
+
+import spacy
+
+from .training import CLASSIFICATION_PIPES
+
+
+def get_classification_pipes(nlp: spacy.language.Language) -> List[Tuple[str, Any]]:
+    """Get the `(name, component)` pairs of `nlp` which are needed for text classification."""
+    return [(name, proc) for name, proc in nlp.pipeline if name in CLASSIFICATION_PIPES]
+
+
+def trim_pipeline(nlp: spacy.language.Language) -> None:
+    """Remove every component of `nlp` which isn't needed for text classification."""
+    for name in nlp.pipe_names:
+        if name not in CLASSIFICATION_PIPES:
+            nlp.remove_pipe(name)
+
+
+def score_text(nlp: spacy.language.Language, text: str) -> Dict[str, float]:
+    """Get the category scores of a piece of text, running only the tokenizer and the classification components."""
+    doc = nlp.make_doc(text)
+    for _, proc in get_classification_pipes(nlp):
+        doc = proc(doc)
+    return doc.cats
+
+
+def score_texts(
+    nlp: spacy.language.Language, texts: Iterable[str], batch_size: int = 128
+) -> Iterator[Dict[str, float]]:
+    """Get the category scores of many texts, running only the tokenizer and the classification components."""
+    docs = nlp.tokenizer.pipe(texts, batch_size=batch_size)
+    for _, proc in get_classification_pipes(nlp):
+        if hasattr(proc, "pipe"):
+            docs = proc.pipe(docs, batch_size=batch_size)
+        else:
+            docs = (proc(doc) for doc in docs)
+    return (doc.cats for doc in docs)
@@ -0,0 +1,161 @@
+"""A lexical fast path which classifies common short answers without running a spaCy pipeline."""
+
+import re
+import threading
+from typing import Dict, FrozenSet, Iterable, Optional, Tuple
+
+from .categories import CATEGORIES, Category
+from .training import TRAINING_DATA
+
+_WHITESPACE = re.compile(r"\s+")
+_STRIPPED = " \t\r\n.,!;~\"'`*_"
+
+EXTRA_ENTRIES: Iterable[Tuple[str, FrozenSet[Category]]] = [
+    # Yes
+    ("y", frozenset({Category.YES})),
+    ("ya", frozenset({Category.YES})),
+    ("yas", frozenset({Category.YES})),
+    ("ye", frozenset({Category.YES})),
+    ("yeh", frozenset({Category.YES})),
+    ("yess", frozenset({Category.YES})),
+    ("yesss", frozenset({Category.YES})),
+    ("yes please", frozenset({Category.YES})),
+    ("yep yep", frozenset({Category.YES})),
+    ("of course", frozenset({Category.YES})),
+    ("definitely", frozenset({Category.YES})),
+    ("correct", frozenset({Category.YES})),
+    ("sure thing", frozenset({Category.YES})),
+    ("👌", frozenset({Category.YES})),
+    ("✅", frozenset({Category.YES})),
+    (":+1:", frozenset({Category.YES})),
+    (":thumbsup:", frozenset({Category.YES})),
+    (":ok_hand:", frozenset({Category.YES})),
+    (":white_check_mark:", frozenset({Category.YES})),
+    # No
+    ("n", frozenset({Category.NO})),
+    ("nay", frozenset({Category.NO})),
+    ("nop", frozenset({Category.NO})),
+    ("nope nope", frozenset({Category.NO})),
+    ("no way", frozenset({Category.NO})),
+    ("no thank you", frozenset({Category.NO})),
+    ("definitely not", frozenset({Category.NO})),
+    ("❌", frozenset({Category.NO})),
+    (":-1:", frozenset({Category.NO})),
+    (":thumbsdown:", frozenset({Category.NO})),
+    (":x:", frozenset({Category.NO})),
+    # Questions
+    ("?", frozenset({Category.QUESTION})),
+    ("huh?", frozenset({Category.QUESTION})),
+    ("what do you mean?", frozenset({Category.QUESTION})),
+]
+"""Common answers which aren't part of the training data."""
+
+
+def normalize(text: str) -> str:
+    """Normalize a piece of text for a lexicon lookup.
+
+    >>> normalize("  Yes, it  DOES! ")
+    'yes, it does'
+    """
+    return _WHITESPACE.sub(" ", text.strip(_STRIPPED).casefold())
+
+
+class Lexicon:
+    """A mapping of normalized answers to the categories they belong to.
+
+    Lookups are thread-safe, so a lexicon can be shared by the threads of an executor.
+
+    ## Example
+    ```python
+    lexicon = create_default_lexicon()
+    lexicon.add("aye", {Category.YES})
+    with enter_lexicon(lexicon):
+        await ask_yes_or_no("Shall we set sail?")
+    ```
+
+    Args:
+        entries: Pairs of text and the categories that text belongs to.
+    """
+
+    def __init__(self, entries: Iterable[Tuple[str, Iterable[Category]]] = ()) -> None:
+        self._entries: Dict[str, Dict[str, float]] = {}
+        self._stats_lock = threading.Lock()
+
+        self.hits: int = 0
+        """The number of lookups which found an entry."""
+
+        self.misses: int = 0
+        """The number of lookups which didn't find an entry."""
+
+        for text, categories in entries:
+            self.add(text, categories)
+
+    def add(self, text: str, categories: Iterable[Category]) -> None:
+        """Add an entry, replacing any existing entry with the same normalized text."""
+        categories = frozenset(categories)
+        assert categories <= CATEGORIES
+        self._entries[normalize(text)] = {cat.value: 1.0 if cat in categories else 0.0 for cat in CATEGORIES}
+
+    def remove(self, text: str) -> None:
+        """Remove an entry if it exists."""
+        self._entries.pop(normalize(text), None)
+
+    def lookup(self, text: str) -> Optional[Dict[str, float]]:
+        """Look up the category scores of a piece of text.
+
+        >>> lexicon = Lexicon([("yes", {Category.YES})])
+        >>> lexicon.lookup("Yes!")["YES"]
+        1.0
+        >>> lexicon.lookup("yes, but how?") is None
+        True
+
+        Returns:
+            A mapping from `Category` values to their scores, or `None` if the text isn't in the lexicon.
+        """
+        scores = self._entries.get(normalize(text))
+        with self._stats_lock:
+            if scores is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return dict(scores) if scores is not None else None
+
+    @property
+    def hit_rate(self) -> float:
+        """The fraction of lookups which found an entry."""
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def reset_stats(self) -> None:
+        """Reset the hit and miss counters."""
+        with self._stats_lock:
+            self.hits = 0
+            self.misses = 0
+
+    def __contains__(self, text: object) -> bool:
+        return isinstance(text, str) and normalize(text) in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def create_default_lexicon() -> Lexicon:
+    """Create a `Lexicon` seeded from `TRAINING_DATA` and `EXTRA_ENTRIES`.
+
+    Training examples which don't belong to any category, eg. "maybe", and those whose normalized text is labeled
+    inconsistently, eg. "it doesn't", are left to the model.
+    """
+    seeds: Dict[str, FrozenSet[Category]] = {}
+    conflicting = set()
+    for text, categories in TRAINING_DATA:
+        if not categories:
+            continue
+        key = normalize(text)
+        if key in seeds and seeds[key] != frozenset(categories):
+            conflicting.add(key)
+        seeds[key] = frozenset(categories)
+
+    lexicon = Lexicon((text, categories) for text, categories in seeds.items() if text not in conflicting)
+    for text, extra_categories in EXTRA_ENTRIES:
+        lexicon.add(text, extra_categories)
+    return lexicon
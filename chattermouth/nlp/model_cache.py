@@ -0,0 +1,133 @@
+"""An on-disk cache of trained spaCy pipelines.
+
+Training the default pipeline takes several seconds, so the trained `spacy.language.Language` is serialized to disk
+once and loaded on later starts. Each entry is keyed by the spaCy version, the base model and its version, and the
+fingerprint of the training data and hyperparameters, so a change to any of them causes the pipeline to be rebuilt.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from typing import Any, Collection, Optional
+
+import spacy
+
+from .training import get_training_fingerprint
+
+CACHE_FORMAT_VERSION = 1
+"""The version of the cache layout, bumped whenever the on-disk format changes."""
+
+_KEY_FILE = "chattermouth.json"
+
+_logger = logging.getLogger(__name__)
+
+
+def get_model_cache_dir() -> Optional[Path]:
+    """Get the directory trained pipelines are cached in.
+
+    The directory can be set with the `CHATTERMOUTH_CACHE_DIR` environment variable, setting it to an empty string
+    disables the cache. Otherwise `$XDG_CACHE_HOME/chattermouth` or `~/.cache/chattermouth` is used.
+    """
+    configured = os.environ.get("CHATTERMOUTH_CACHE_DIR")
+    if configured is not None:
+        return Path(configured).expanduser() if configured else None
+    return Path(os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache") / "chattermouth"
+
+
+def _get_model_version(model_name: str) -> Optional[str]:
+    try:
+        return spacy.util.get_package_version(model_name)
+    except Exception:
+        return None
+
+
+def get_pipeline_cache_key(model_name: str) -> str:
+    """Get the cache key of the pipeline trained on top of `model_name`."""
+    payload = {
+        "format": CACHE_FORMAT_VERSION,
+        "spacy": spacy.__version__,
+        "model": model_name,
+        "model_version": _get_model_version(model_name),
+        "training": get_training_fingerprint(),
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def _get_entry_path(cache_dir: Path, model_name: str, key: str) -> Path:
+    return cache_dir / f"{model_name}-{key[:16]}"
+
+
+def load_cached_pipeline(
+    model_name: str, pipes: Optional[Collection[str]] = None, **kwargs: Any
+) -> Optional[spacy.language.Language]:
+    """Load a trained pipeline from the cache.
+
+    Args:
+        model_name: The name of the base model the pipeline was trained on top of.
+        pipes: If set, only the components with these names are loaded.
+        kwargs: Extra arguments passed to `spacy.load`.
+
+    Returns:
+        The cached pipeline, or `None` if the cache is disabled or has no up to date entry. An entry which can't be
+        loaded is removed, so the pipeline is rebuilt and cached again.
+    """
+    cache_dir = get_model_cache_dir()
+    if cache_dir is None:
+        return None
+
+    key = get_pipeline_cache_key(model_name)
+    path = _get_entry_path(cache_dir, model_name, key)
+    try:
+        with open(path / _KEY_FILE) as key_file:
+            if json.load(key_file).get("key") != key:
+                return None
+        if pipes is not None:
+            pipeline = spacy.util.get_model_meta(path).get("pipeline", [])
+            kwargs["disable"] = [name for name in pipeline if name not in pipes]
+        return spacy.load(path, **kwargs)
+    except FileNotFoundError:
+        return None
+    except Exception:
+        # The entry may be corrupt or written by an incompatible version of a component, either way it's rebuilt.
+        _logger.warning("Removing the cached pipeline in %s since it can't be loaded", path, exc_info=True)
+        shutil.rmtree(path, ignore_errors=True)
+        return None
+
+
+def save_cached_pipeline(nlp: spacy.language.Language, model_name: str) -> None:
+    """Save a trained pipeline to the cache, replacing any stale entries for the same base model.
+
+    Failures to write the cache are ignored since the cache is only an optimization.
+
+    Args:
+        nlp: The trained pipeline.
+        model_name: The name of the base model the pipeline was trained on top of.
+    """
+    cache_dir = get_model_cache_dir()
+    if cache_dir is None:
+        return
+
+    key = get_pipeline_cache_key(model_name)
+    path = _get_entry_path(cache_dir, model_name, key)
+    try:
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        for stale in cache_dir.glob(f"{model_name}-*"):
+            if stale != path:
+                shutil.rmtree(stale, ignore_errors=True)
+
+        # Write into a temporary directory and rename it into place so other processes never see a partial entry.
+        staging = Path(tempfile.mkdtemp(prefix=".staging-", dir=cache_dir))
+        try:
+            nlp.to_disk(staging)
+            with open(staging / _KEY_FILE, "w") as key_file:
+                json.dump({"key": key}, key_file)
+            os.rename(staging, path)
+        except OSError:
+            # Another process may have won the race to create the entry.
+            shutil.rmtree(staging, ignore_errors=True)
+    except OSError:
+        pass
@@ -0,0 +1,104 @@
+"""A bounded cache of classification results."""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Tuple
+
+from .lexicon import normalize
+from .training import get_model_generation
+
+_Key = Tuple[int, str]
+
+
+class ClassificationCache:
+    """A least recently used cache of category scores keyed by normalized text and model.
+
+    Entries are keyed by the generation of the model which produced them (see `get_model_generation`), so swapping or
+    retraining a pipeline makes its old entries unreachable and they age out of the cache.
+
+    >>> class Model:
+    ...     pass
+    >>> model = Model()
+    >>> cache = ClassificationCache(maxsize=1)
+    >>> cache.put(model, "Yes!", {"YES": 0.9})
+    >>> cache.get(model, "yes")
+    {'YES': 0.9}
+    >>> cache.put(model, "no", {"NO": 0.9})
+    >>> cache.get(model, "yes") is None
+    True
+    >>> cache.hits, cache.misses, cache.evictions
+    (1, 1, 1)
+
+    Args:
+        maxsize: The maximum number of entries.
+        ttl: If set, the number of seconds after which an entry expires.
+        clock: The clock used to expire entries.
+    """
+
+    def __init__(
+        self, maxsize: int = 4096, ttl: Optional[float] = None, clock: Callable[[], float] = time.monotonic
+    ) -> None:
+        assert maxsize > 0
+        assert ttl is None or ttl > 0.0
+
+        self.maxsize: int = maxsize
+        """The maximum number of entries."""
+
+        self.ttl: Optional[float] = ttl
+        """The number of seconds after which an entry expires."""
+
+        self.hits: int = 0
+        """The number of lookups which found an entry."""
+
+        self.misses: int = 0
+        """The number of lookups which didn't find an entry."""
+
+        self.evictions: int = 0
+        """The number of entries removed to make space or because they expired."""
+
+        self._clock = clock
+        self._entries: "OrderedDict[_Key, Tuple[float, Dict[str, float]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, model: object, text: str) -> Optional[Dict[str, float]]:
+        """Get the cached scores `model` gave a piece of text, or `None` if there aren't any."""
+        key = (get_model_generation(model), normalize(text))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.ttl is not None and self._clock() - entry[0] > self.ttl:
+                del self._entries[key]
+                self.evictions += 1
+                entry = None
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return dict(entry[1])
+
+    def put(self, model: object, text: str, scores: Dict[str, float]) -> None:
+        """Cache the scores `model` gave a piece of text."""
+        key = (get_model_generation(model), normalize(text))
+        with self._lock:
+            self._entries[key] = (self._clock(), dict(scores))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        """Remove every entry."""
+        with self._lock:
+            self._entries.clear()
+
+    @property
+    def hit_rate(self) -> float:
+        """The fraction of lookups which found an entry."""
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -0,0 +1,309 @@
+"""Services which score text on behalf of many concurrent conversations."""
+
+import abc
+import asyncio
+import time
+from concurrent.futures import Executor
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import spacy
+
+from .inference import score_texts
+
+
+class ClassifierClosedError(Exception):
+    """A request was waiting when its `ClassifierService` was closed."""
+
+    def __init__(self) -> None:
+        super().__init__("The classifier service was closed before the request was run")
+
+
+class ClassifierService(abc.ABC):
+    """A service which scores text on behalf of many concurrent callers."""
+
+    @abc.abstractmethod
+    async def score(self, text: str) -> Dict[str, float]:
+        """Get the category scores of a piece of text.
+
+        Args:
+            text: The text to score.
+
+        Returns:
+            A mapping from `Category` values to their scores.
+        """
+        ...
+
+    @property
+    def model(self) -> object:
+        """The object which scores text for the service, whose generation keys cached results.
+
+        See `chattermouth.nlp.training.get_model_generation`. Defaults to the service itself.
+        """
+        return self
+
+    async def process(self, text: str) -> spacy.tokens.doc.Doc:
+        """Run a piece of text through the service's spaCy pipeline.
+
+        Services which only score text run the current spaCy pipeline in the current NLP executor instead, like
+        `process_message_async` does without a service.
+        """
+        from . import process_message, run_in_nlp_executor
+
+        return await run_in_nlp_executor(process_message, text)
+
+    async def close(self) -> None:
+        """Stop the service and release its resources."""
+        pass
+
+
+class BatchingMetrics:
+    """Counters describing the work done by a `BatchingClassifier`."""
+
+    def __init__(self) -> None:
+        self.requests: int = 0
+        """The number of texts submitted."""
+
+        self.batches: int = 0
+        """The number of batches run."""
+
+        self.batched: int = 0
+        """The number of texts run in batches, which excludes texts whose callers gave up waiting."""
+
+        self.largest_batch: int = 0
+        """The size of the largest batch run."""
+
+        self.errors: int = 0
+        """The number of batches which raised an exception."""
+
+        self.queue_time: float = 0.0
+        """The total number of seconds texts spent waiting to be batched."""
+
+        self.inference_time: float = 0.0
+        """The total number of seconds spent running batches."""
+
+    @property
+    def mean_batch_size(self) -> float:
+        """The average number of texts per batch."""
+        return self.batched / self.batches if self.batches else 0.0
+
+    def as_dict(self) -> Dict[str, float]:
+        """Get the metrics as a dictionary, eg. for logging or exporting."""
+        return {
+            "requests": self.requests,
+            "batches": self.batches,
+            "batched": self.batched,
+            "largest_batch": self.largest_batch,
+            "errors": self.errors,
+            "mean_batch_size": self.mean_batch_size,
+            "queue_time": self.queue_time,
+            "inference_time": self.inference_time,
+        }
+
+
+# The text, whether the full pipeline should be run, the caller's future and the time the request was queued.
+_Request = Tuple[str, bool, "asyncio.Future[Any]", float]
+
+
+def _fail_closed(future: "asyncio.Future[Any]") -> None:
+    if not future.done():
+        future.set_exception(ClassifierClosedError())
+
+
+class BatchingClassifier(ClassifierService):
+    """Collect concurrent requests into batches which are run through `nlp.pipe` in one pass.
+
+    A batch is run as soon as `max_batch_size` texts are waiting or `max_wait` seconds after its first text arrived,
+    whichever comes first. Texts which are only scored skip the components which aren't needed for classification.
+
+    ## Example
+    ```python
+    service = BatchingClassifier(get_default_spacy_pipeline(), max_batch_size=64, max_wait=0.01)
+    with enter_classifier_service(service):
+        await ask_yes_or_no("Do you like apple pie?")
+    ```
+
+    Args:
+        nlp: The pipeline used to process the batches.
+        max_batch_size: The maximum number of texts in a batch.
+        max_wait: The maximum number of seconds to wait for a batch to fill.
+        max_queue_size: The maximum number of waiting texts, callers block when the queue is full.
+        max_concurrent_batches: The maximum number of batches run at the same time.
+        executor: The executor batches are run in, `None` means the event loop's default executor.
+    """
+
+    def __init__(
+        self,
+        nlp: Optional[spacy.language.Language],
+        max_batch_size: int = 32,
+        max_wait: float = 0.005,
+        max_queue_size: int = 1024,
+        max_concurrent_batches: int = 1,
+        executor: Optional[Executor] = None,
+    ) -> None:
+        assert max_batch_size > 0
+        assert max_wait >= 0.0
+        assert max_concurrent_batches > 0
+
+        self.nlp: Optional[spacy.language.Language] = nlp
+        """The pipeline used to process the batches."""
+
+        self.max_batch_size: int = max_batch_size
+        """The maximum number of texts in a batch."""
+
+        self.max_wait: float = max_wait
+        """The maximum number of seconds to wait for a batch to fill."""
+
+        self.max_queue_size: int = max_queue_size
+        """The maximum number of waiting texts."""
+
+        self.max_concurrent_batches: int = max_concurrent_batches
+        """The maximum number of batches run at the same time."""
+
+        self.metrics: BatchingMetrics = BatchingMetrics()
+        """Counters describing the work done by the service."""
+
+        self._executor: Optional[Executor] = executor
+        self._queue: Optional[asyncio.Queue[_Request]] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._batch_slots: Optional[asyncio.Semaphore] = None
+        self._dispatches: Set[asyncio.Task] = set()
+
+    @property
+    def queue_depth(self) -> int:
+        """The number of texts waiting to be batched."""
+        return self._queue.qsize() if self._queue is not None else 0
+
+    @property
+    def model(self) -> object:
+        """The pipeline which scores text, so retraining it invalidates cached results."""
+        return self.nlp if self.nlp is not None else self
+
+    async def process(self, text: str) -> spacy.tokens.doc.Doc:
+        """Run a piece of text through the pipeline as part of a batch."""
+        return await self._submit(text, full=True)
+
+    async def score(self, text: str) -> Dict[str, float]:
+        """Get the category scores of a piece of text, computed as part of a batch."""
+        return await self._submit(text, full=False)
+
+    async def close(self) -> None:
+        """Stop batching, failing any requests which are still waiting, and wait for running batches to finish.
+
+        Waiting callers get a `ClassifierClosedError`.
+        """
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+
+        self._fail_waiting()
+        if self._dispatches:
+            await asyncio.wait(list(self._dispatches))
+
+    def _fail_waiting(self) -> None:
+        if self._queue is not None:
+            while not self._queue.empty():
+                _, _, future, _ = self._queue.get_nowait()
+                _fail_closed(future)
+            self._queue = None
+
+    def _run_batch(self, batch: List[Tuple[str, bool]]) -> List[Any]:
+        """Process a batch of `(text, full)` pairs, called from the executor.
+
+        Returns:
+            A `spacy.tokens.doc.Doc` for each pair where `full` is set and a dictionary of category scores otherwise.
+        """
+        assert self.nlp is not None
+        full = [text for text, is_full in batch if is_full]
+        scored = [text for text, is_full in batch if not is_full]
+        docs = iter(self.nlp.pipe(full, batch_size=len(full))) if full else iter(())
+        scores = score_texts(self.nlp, scored, batch_size=len(scored)) if scored else iter(())
+        return [next(docs) if is_full else next(scores) for _, is_full in batch]
+
+    async def _execute(self, batch: List[Tuple[str, bool]]) -> List[Any]:
+        """Run `_run_batch` in the executor."""
+        return await asyncio.get_running_loop().run_in_executor(self._executor, self._run_batch, batch)
+
+    async def _submit(self, text: str, full: bool) -> Any:
+        if self._worker is None:
+            self._queue = asyncio.Queue(self.max_queue_size)
+            self._batch_slots = asyncio.Semaphore(self.max_concurrent_batches)
+            self._worker = asyncio.create_task(self._collect())
+
+        queue = self._queue
+        assert queue is not None
+        loop = asyncio.get_running_loop()
+        future: asyncio.Future[Any] = loop.create_future()
+        self.metrics.requests += 1
+        await queue.put((text, full, future, loop.time()))
+        if queue is not self._queue:
+            # The service was closed while this caller waited for space in the queue.
+            _fail_closed(future)
+        return await future
+
+    async def _collect(self) -> None:
+        assert self._queue is not None and self._batch_slots is not None
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            try:
+                deadline = loop.time() + self.max_wait
+                while len(batch) < self.max_batch_size:
+                    if not self._queue.empty():
+                        batch.append(self._queue.get_nowait())
+                        continue
+
+                    remaining = deadline - loop.time()
+                    if remaining <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                    except asyncio.TimeoutError:
+                        break
+
+                await self._batch_slots.acquire()
+            except asyncio.CancelledError:
+                # The batch was already taken off the queue, so `close` can't fail its requests.
+                for _, _, future, _ in batch:
+                    _fail_closed(future)
+                raise
+
+            dispatch = asyncio.create_task(self._dispatch(batch))
+            self._dispatches.add(dispatch)
+            dispatch.add_done_callback(self._dispatches.discard)
+
+    async def _dispatch(self, batch: List[_Request]) -> None:
+        assert self._batch_slots is not None
+        loop = asyncio.get_running_loop()
+        try:
+            # Callers which gave up waiting don't need to be scored.
+            batch = [request for request in batch if not request[2].done()]
+            if not batch:
+                return
+
+            started = loop.time()
+            self.metrics.batches += 1
+            self.metrics.batched += len(batch)
+            self.metrics.largest_batch = max(self.metrics.largest_batch, len(batch))
+            self.metrics.queue_time += sum(started - enqueued for _, _, _, enqueued in batch)
+
+            inference_started = time.perf_counter()
+            try:
+                results = await self._execute([(text, full) for text, full, _, _ in batch])
+            except Exception as e:
+                self.metrics.errors += 1
+                for _, _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                return
+            finally:
+                self.metrics.inference_time += time.perf_counter() - inference_started
+
+            for (_, _, future, _), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+        finally:
+            self._batch_slots.release()
@@ -0,0 +1,117 @@
+"""Helpers for sharing one loaded pipeline between forked worker processes.
+
+A forked worker shares its parent's memory until either process writes to a page. Loading the pipeline once in the
+parent therefore saves a copy per worker, as long as the pages holding the model aren't written afterwards. The
+garbage collector writes to every object it examines, so the loaded pipeline is moved out of its reach with
+`gc.freeze`. Word vectors, usually the largest part of a model, can also be memory-mapped from disk, which lets the
+operating system share them between every process using the same file.
+"""
+
+import gc
+import os
+from pathlib import Path
+from typing import Callable, Iterable, Optional
+
+import numpy
+import spacy
+
+from .inference import score_texts
+from .model_cache import get_model_cache_dir
+
+_WARM_UP_TEXTS = ["yes", "no thanks", "how do I do that?"]
+
+# `gc.freeze` and `gc.unfreeze` don't exist on PyPy, whose collector doesn't need them, nor in older type stubs.
+_gc_freeze: Callable[[], None] = getattr(gc, "freeze", lambda: None)
+_gc_unfreeze: Callable[[], None] = getattr(gc, "unfreeze", lambda: None)
+
+
+def memory_map_vectors(nlp: spacy.language.Language, path: Optional[Path] = None) -> bool:
+    """Replace the word vectors of a pipeline with a read-only memory map of the same vectors on disk.
+
+    By default the vectors file the pipeline was loaded from is mapped. Pipelines which weren't loaded from disk have
+    their vectors written to the model cache directory first.
+
+    Args:
+        nlp: The pipeline.
+        path: A file in NumPy's `.npy` format to write the vectors to if needed, and to map.
+
+    Returns:
+        `True` if the vectors are now memory-mapped, `False` if the pipeline has no vectors or there's nowhere to
+        store them.
+    """
+    vectors = nlp.vocab.vectors
+    if vectors.data.size == 0:
+        return False
+    if isinstance(vectors.data, numpy.memmap):
+        return True
+
+    if path is None:
+        path = _get_vectors_path(nlp)
+        if path is None:
+            return False
+    if not path.exists():
+        try:
+            _save_vectors(vectors.data, path)
+        except OSError:
+            return False
+
+    mapped = numpy.load(path, mmap_mode="r")
+    if mapped.shape != vectors.data.shape or mapped.dtype != vectors.data.dtype:
+        return False
+    vectors.data = mapped
+    return True
+
+
+def _get_vectors_path(nlp: spacy.language.Language) -> Optional[Path]:
+    # spaCy saves vectors in NumPy's format, so the file the pipeline was loaded from can be mapped directly.
+    loaded_from = getattr(nlp, "path", None)
+    if loaded_from is not None and (Path(loaded_from) / "vocab" / "vectors").exists():
+        return Path(loaded_from) / "vocab" / "vectors"
+
+    cache_dir = get_model_cache_dir()
+    if cache_dir is None:
+        return None
+    rows, width = nlp.vocab.vectors.data.shape
+    name = f"{nlp.meta.get('lang')}_{nlp.meta.get('name')}-{nlp.meta.get('version')}-{rows}x{width}.npy"
+    return cache_dir / "vectors" / name
+
+
+def _save_vectors(data: numpy.ndarray, path: Path) -> None:
+    # Write to a temporary file and rename it into place so other processes never map a partial file.
+    path.parent.mkdir(parents=True, exist_ok=True)
+    staging = path.with_name(f".{path.name}.{os.getpid()}")
+    try:
+        with open(staging, "wb") as staging_file:
+            numpy.save(staging_file, data, allow_pickle=False)
+        os.replace(staging, path)
+    finally:
+        if staging.exists():
+            staging.unlink()
+
+
+def prepare_for_fork(nlp: spacy.language.Language, texts: Optional[Iterable[str]] = None) -> None:
+    """Warm a pipeline up and stop the garbage collector from touching it, before forking workers which share it.
+
+    Running the pipeline once allocates anything its components create lazily, so workers inherit it instead of each
+    creating their own. Everything allocated so far is then frozen with `gc.freeze`, which keeps the collector from
+    writing to it and copying the pages it lives on into every worker.
+
+    Call `unfreeze_after_fork` once every worker has been forked.
+
+    Args:
+        nlp: The pipeline the workers will use.
+        texts: Texts to warm the pipeline up with, by default a few short answers.
+    """
+    for _ in score_texts(nlp, texts or _WARM_UP_TEXTS):
+        pass
+    gc.collect()
+    _gc_freeze()
+
+
+def unfreeze_after_fork() -> None:
+    """Let the garbage collector examine the objects `prepare_for_fork` froze again, once the workers are forked.
+
+    Workers keep their own copy of the frozen state, so only this process is affected. Without this everything
+    allocated before `prepare_for_fork` stays out of reach of the collector for the life of the process.
+    """
+    _gc_unfreeze()
@@ -0,0 +1,194 @@
+"""A text classifier which compares word vectors with labelled examples instead of training a model."""
+
+from typing import Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+
+import numpy
+import spacy
+
+from .categories import Category
+from .inference import trim_pipeline
+from .training import SIMILARITY_CLASSIFIER, TRAINING_DATA, invalidate_model_generation
+
+_CATEGORY_ORDER = [category.value for category in Category]
+
+
+class SimilarityClassifier:
+    """A pipeline component which sets `doc.cats` from the cosine similarity of the document's vector to examples.
+
+    The normalized vectors of every example are kept in one contiguous matrix, so a batch of documents is compared with
+    all of them in a single matrix multiplication. Each category is scored by weighing the similarity to examples in
+    the category against the similarity to examples outside of it, so scores are between 0 and 1 like `textcat`'s.
+
+    Examples can be added at any time without retraining. The component isn't saved by `nlp.to_disk`, so pipelines
+    using it can't be cached on disk, but building one only takes a pass of the tokenizer over the examples.
+
+    The pipeline needs word vectors, eg. `en_core_web_md` or `en_core_web_lg`.
+
+    Args:
+        nlp: The pipeline the component is added to, used to vectorize examples.
+        k: The number of nearest examples which vote on each category, or `None` to compare with the centroid of the
+            examples in and out of each category instead.
+    """
+
+    name = SIMILARITY_CLASSIFIER
+
+    def __init__(self, nlp: spacy.language.Language, k: Optional[int] = 5) -> None:
+        if nlp.vocab.vectors_length == 0:
+            raise ValueError(f"{SIMILARITY_CLASSIFIER} needs a pipeline with word vectors")
+        assert k is None or k > 0
+
+        self.k: Optional[int] = k
+        """The number of nearest examples which vote on each category, `None` uses centroids."""
+
+        self._nlp = nlp
+        self._vectors = numpy.zeros((64, nlp.vocab.vectors_length), dtype="float32")
+        self._labels = numpy.zeros((64, len(_CATEGORY_ORDER)), dtype="float32")
+        self._size = 0
+        self._centroids: Optional[Tuple[numpy.ndarray, numpy.ndarray]] = None
+
+    def __len__(self) -> int:
+        return self._size
+
+    def add_examples(self, examples: Iterable[Tuple[str, Set[Category]]], batch_size: int = 256) -> None:
+        """Add labelled examples.
+
+        Args:
+            examples: Pairs of texts and the categories they belong to.
+            batch_size: The number of texts tokenized at a time.
+        """
+        examples = list(examples)
+        if not examples:
+            return
+
+        vectors = _normalize(_vectorize(self._nlp.tokenizer.pipe((text for text, _ in examples), batch_size)))
+        self._reserve(self._size + len(examples))
+        end = self._size + len(examples)
+        self._vectors[self._size : end] = vectors
+        self._labels[self._size : end] = [
+            [float(Category(category) in categories) for category in _CATEGORY_ORDER] for _, categories in examples
+        ]
+        self._size = end
+        self._centroids = None
+        invalidate_model_generation(self._nlp)
+
+    def add_example(self, text: str, categories: Set[Category]) -> None:
+        """Add a labelled example, see `add_examples`."""
+        self.add_examples([(text, categories)])
+
+    def __call__(self, doc: spacy.tokens.doc.Doc) -> spacy.tokens.doc.Doc:
+        self._set_cats([doc])
+        return doc
+
+    def pipe(self, docs: Iterable[spacy.tokens.doc.Doc], batch_size: int = 128) -> Iterator[spacy.tokens.doc.Doc]:
+        batch: List[spacy.tokens.doc.Doc] = []
+        for doc in docs:
+            batch.append(doc)
+            if len(batch) >= batch_size:
+                self._set_cats(batch)
+                yield from batch
+                batch = []
+        if batch:
+            self._set_cats(batch)
+            yield from batch
+
+    def score_vectors(self, vectors: numpy.ndarray) -> numpy.ndarray:
+        """Score a matrix of document vectors, one row per document.
+
+        Returns:
+            A matrix with a row of scores per document and a column per `Category`, in definition order.
+        """
+        vectors = _normalize(vectors)
+        if self._size == 0:
+            return numpy.zeros((len(vectors), len(_CATEGORY_ORDER)), dtype="float32")
+
+        if self.k is None:
+            inside, outside = self._get_centroids()
+            return _vote(numpy.maximum(vectors @ inside.T, 0.0), numpy.maximum(vectors @ outside.T, 0.0))
+
+        similarities = vectors @ self._vectors[: self._size].T
+        k = min(self.k, self._size)
+        nearest = numpy.argpartition(-similarities, k - 1, axis=1)[:, :k]
+        weights = numpy.maximum(numpy.take_along_axis(similarities, nearest, axis=1), 0.0)[:, :, None]
+        labels = self._labels[nearest]
+        return _vote((weights * labels).sum(axis=1), (weights * (1.0 - labels)).sum(axis=1))
+
+    def _set_cats(self, docs: Sequence[spacy.tokens.doc.Doc]) -> None:
+        scores = self.score_vectors(_vectorize(docs))
+        for doc, row in zip(docs, scores.tolist()):
+            doc.cats.update(zip(_CATEGORY_ORDER, row))
+
+    def _get_centroids(self) -> Tuple[numpy.ndarray, numpy.ndarray]:
+        if self._centroids is None:
+            vectors = self._vectors[: self._size]
+            labels = self._labels[: self._size]
+            self._centroids = (_normalize(labels.T @ vectors), _normalize((1.0 - labels).T @ vectors))
+        return self._centroids
+
+    def _reserve(self, size: int) -> None:
+        capacity = len(self._vectors)
+        if size <= capacity:
+            return
+        while capacity < size:
+            capacity *= 2
+        self._vectors = numpy.resize(self._vectors, (capacity, self._vectors.shape[1]))
+        self._labels = numpy.resize(self._labels, (capacity, self._labels.shape[1]))
+
+
+def _vectorize(docs: Iterable[spacy.tokens.doc.Doc]) -> numpy.ndarray:
+    return numpy.array([doc.vector for doc in docs], dtype="float32")
+
+
+def _normalize(vectors: numpy.ndarray) -> numpy.ndarray:
+    norms = numpy.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / numpy.where(norms > 0.0, norms, 1.0)
+
+
+def _vote(inside: numpy.ndarray, outside: numpy.ndarray) -> numpy.ndarray:
+    # The share of the evidence in favour of each category, 0 where there's no evidence either way.
+    total = inside + outside
+    return numpy.divide(inside, total, out=numpy.zeros_like(total), where=total > 0.0)
+
+
+def add_similarity_classifier(
+    nlp: spacy.language.Language, k: Optional[int] = 5, examples: Iterable[Tuple[str, Set[Category]]] = TRAINING_DATA
+) -> SimilarityClassifier:
+    """Add a `SimilarityClassifier` to a pipeline, replacing any existing one.
+
+    Args:
+        nlp: The pipeline, which needs word vectors.
+        k: The number of nearest examples which vote on each category, `None` compares with centroids.
+        examples: The initial examples, by default the `textcat` training data.
+    """
+    classifier = SimilarityClassifier(nlp, k=k)
+    classifier.add_examples(examples)
+    if SIMILARITY_CLASSIFIER in nlp.pipe_names:
+        nlp.replace_pipe(SIMILARITY_CLASSIFIER, classifier)
+    else:
+        nlp.add_pipe(classifier, last=True)
+    return classifier
+
+
+def create_similarity_pipeline(model_name: Optional[str] = None, k: Optional[int] = 5) -> spacy.language.Language:
+    """Create a classification-only pipeline which uses a `SimilarityClassifier` instead of a trained `textcat`.
+
+    ## Example
+    ```python
+    with enter_spacy_pipeline(create_similarity_pipeline("en_core_web_md")):
+        await ask_yes_or_no("Do you like apple pie?")
+    ```
+
+    Args:
+        model_name: The base model, which needs word vectors. By default the largest installed English model.
+        k: The number of nearest examples which vote on each category, `None` compares with centroids.
+    """
+    if model_name is None:
+        from . import _find_default_model_name
+
+        model_name = _find_default_model_name()
+        if model_name is None:
+            raise Exception("Failed to find any models")
+
+    nlp = spacy.load(model_name)
+    trim_pipeline(nlp)
+    add_similarity_classifier(nlp, k=k)
+    return nlp
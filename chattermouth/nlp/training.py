@@ -1,8 +1,15 @@
+import hashlib
+import itertools
+import json
 import random
-from typing import Any, Dict, Iterable, Sequence, Set, Tuple
+import time
+import weakref
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
 
+import numpy
 import spacy
-from spacy.util import compounding, minibatch
+from spacy.util import compounding, fix_random_seed, minibatch
 
 from .categories import CATEGORIES, Category
 
@@ -81,9 +88,239 @@ def get_classification_training_data() -> Iterable[Tuple[str, Dict[str, Any]]]:
 
 TEXTCAT = "textcat"
 
+SIMILARITY_CLASSIFIER = "similarity_classifier"
+"""The name of the `chattermouth.nlp.similarity.SimilarityClassifier` component."""
 
-def train_pipeline(nlp: spacy.language.Language) -> None:
-    """Train a `spacy.language.Language` instance."""
+CLASSIFICATION_PIPES = frozenset({TEXTCAT, SIMILARITY_CLASSIFIER, "tok2vec", "trf_wordpiecer", "trf_tok2vec"})
+"""The names of the pipeline components needed for text classification."""
+
+EPOCHS = 20
+"""The maximum number of passes made over the training data."""
+
+PATIENCE = 3
+"""The number of epochs without an improvement in validation loss after which training stops."""
+
+VALIDATION_SIZE = 0.1
+"""The fraction of the training data held out to decide when to stop training."""
+
+MIN_VALIDATION_EXAMPLES = len(CATEGORIES)
+"""The fewest held out examples worth stopping early on, one for each category. With fewer the data isn't split."""
+
+SEED = 0
+"""The random seed used for training, which makes the trained pipeline reproducible."""
+
+DROPOUT = 0.2
+"""The dropout rate used while training."""
+
+BATCH_SIZE = (4.0, 32.0, 1.001)
+"""The `start`, `stop` and `compound` arguments of the compounding batch size."""
+
+
+def get_training_fingerprint(
+    seed: Optional[int] = SEED,
+    max_epochs: int = EPOCHS,
+    patience: Optional[int] = PATIENCE,
+    validation_size: float = VALIDATION_SIZE,
+) -> str:
+    """Get a hash of the training data and hyperparameters used by `train_pipeline`.
+
+    The fingerprint changes whenever the result of `train_pipeline` could change, which makes it suitable as part of a
+    cache key for trained pipelines. The arguments are those passed to `train_pipeline`.
+    """
+    payload = {
+        "data": sorted([text, sorted(cat.value for cat in categories)] for text, categories in TRAINING_DATA),
+        "epochs": max_epochs,
+        "patience": patience,
+        "validation_size": validation_size,
+        "min_validation_examples": MIN_VALIDATION_EXAMPLES,
+        "retrained": True,
+        "seed": seed,
+        "dropout": DROPOUT,
+        "batch_size": BATCH_SIZE,
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class TrainingReport:
+    """A description of a `train_pipeline` run."""
+
+    def __init__(self, seed: Optional[int]) -> None:
+        self.seed: Optional[int] = seed
+        """The random seed used, `None` if training wasn't seeded."""
+
+        self.epoch_times: List[float] = []
+        """The number of seconds each epoch took."""
+
+        self.losses: List[float] = []
+        """The training loss of each epoch."""
+
+        self.retraining_times: List[float] = []
+        """The number of seconds each epoch of retraining on all the data took, empty if no data was held out."""
+
+        self.retraining_losses: List[float] = []
+        """The training loss of each epoch of retraining on all the data."""
+
+        self.validation_losses: List[float] = []
+        """The validation loss after each epoch, empty if no data was held out."""
+
+        self.validation_accuracies: List[float] = []
+        """The fraction of held out categories predicted correctly after each epoch."""
+
+        self.best_epoch: Optional[int] = None
+        """The index of the epoch with the lowest validation loss, the pipeline is retrained for `best_epoch + 1`."""
+
+        self.stopped_early: bool = False
+        """Whether training stopped before the maximum number of epochs."""
+
+    @property
+    def epochs(self) -> int:
+        """The number of epochs run."""
+        return len(self.epoch_times)
+
+    @property
+    def seconds(self) -> float:
+        """The number of seconds spent training, including retraining."""
+        return sum(self.epoch_times) + sum(self.retraining_times)
+
+    @property
+    def validation_loss(self) -> Optional[float]:
+        """The validation loss after the best epoch, before retraining on the held out data too."""
+        return self.validation_losses[self.best_epoch] if self.best_epoch is not None else None
+
+    @property
+    def validation_accuracy(self) -> Optional[float]:
+        """The validation accuracy after the best epoch, before retraining on the held out data too."""
+        return self.validation_accuracies[self.best_epoch] if self.best_epoch is not None else None
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Get the report as a dictionary, eg. for logging."""
+        return {
+            "seed": self.seed,
+            "epochs": self.epochs,
+            "seconds": self.seconds,
+            "epoch_times": self.epoch_times,
+            "losses": self.losses,
+            "retraining_times": self.retraining_times,
+            "retraining_losses": self.retraining_losses,
+            "validation_losses": self.validation_losses,
+            "validation_accuracies": self.validation_accuracies,
+            "best_epoch": self.best_epoch,
+            "stopped_early": self.stopped_early,
+        }
+
+
+_generations: "weakref.WeakKeyDictionary[object, int]" = weakref.WeakKeyDictionary()
+_generation_counter = itertools.count()
+
+
+def get_model_generation(model: object) -> int:
+    """Get a number identifying the current state of a model, eg. a `spacy.language.Language`.
+
+    Different models never share a generation, and `train_pipeline` gives the pipeline it trains a new one, so the
+    generation is suitable as part of a cache key for the model's predictions.
+    """
+    generation = _generations.get(model)
+    if generation is None:
+        generation = _generations[model] = next(_generation_counter)
+    return generation
+
+
+def invalidate_model_generation(model: object) -> None:
+    """Give a model a new generation, eg. after its weights change."""
+    _generations[model] = next(_generation_counter)
+
+
+_Example = Tuple[str, Dict[str, Any]]
+
+
+@contextmanager
+def _seeded(seed: Optional[int]) -> Iterator[None]:
+    # `fix_random_seed` seeds the global `random` and `numpy.random` states, which the rest of the process owns.
+    if seed is None:
+        yield
+        return
+    states = random.getstate(), numpy.random.get_state()
+    fix_random_seed(seed)
+    try:
+        yield
+    finally:
+        random.setstate(states[0])
+        numpy.random.set_state(states[1])
+
+
+def _split_validation(data: List[_Example], validation_size: float) -> Tuple[List[_Example], List[_Example]]:
+    # Each combination of categories is held out in proportion, keeping at least one of each for training, so rare
+    # combinations aren't only in the held out data. Too few held out examples make the validation loss noise.
+    groups: Dict[Tuple[str, ...], List[_Example]] = {}
+    for example in data:
+        key = tuple(sorted(category for category, value in example[1]["cats"].items() if value))
+        groups.setdefault(key, []).append(example)
+
+    training_data: List[_Example] = []
+    validation_data: List[_Example] = []
+    for group in groups.values():
+        count = min(round(len(group) * validation_size), len(group) - 1)
+        validation_data.extend(group[:count])
+        training_data.extend(group[count:])
+
+    if len(validation_data) < MIN_VALIDATION_EXAMPLES:
+        return data, []
+    return training_data, validation_data
+
+
+def _train_epoch(
+    nlp: spacy.language.Language, optimizer: Any, data: List[_Example], shuffler: random.Random
+) -> Tuple[float, float]:
+    # Returns the number of seconds the epoch took and its training loss.
+    started = time.perf_counter()
+    losses: Dict[str, Any] = {}
+    shuffler.shuffle(data)
+    for batch in minibatch(data, size=compounding(*BATCH_SIZE)):
+        texts, annotations = zip(*batch)
+        nlp.update(texts, annotations, sgd=optimizer, drop=DROPOUT, losses=losses)
+    return time.perf_counter() - started, float(losses.get(TEXTCAT, 0.0))
+
+
+def _validate(nlp: spacy.language.Language, data: List[_Example]) -> Tuple[float, float]:
+    # Returns the mean squared error of the scores, like textcat's training loss, and the accuracy at 0.5.
+    loss = 0.0
+    correct = 0
+    total = 0
+    for doc, (_, annotations) in zip(nlp.pipe(text for text, _ in data), data):
+        for category, expected in annotations["cats"].items():
+            score = doc.cats.get(category, 0.0)
+            loss += (score - expected) ** 2
+            correct += (score >= 0.5) == (expected >= 0.5)
+            total += 1
+    return loss / len(data), correct / total
+
+
+def train_pipeline(
+    nlp: spacy.language.Language,
+    seed: Optional[int] = SEED,
+    max_epochs: int = EPOCHS,
+    patience: Optional[int] = PATIENCE,
+    validation_size: float = VALIDATION_SIZE,
+) -> TrainingReport:
+    """Train a `spacy.language.Language` instance.
+
+    A fraction of each combination of categories in the training data is held out, and training stops once the loss on
+    it hasn't improved for `patience` epochs. The pipeline is then trained again from the start on all the data for as
+    many epochs as the lowest validation loss took. When fewer than `MIN_VALIDATION_EXAMPLES` would be held out,
+    nothing is and the pipeline is trained on all the data for `max_epochs` epochs.
+
+    Args:
+        nlp: The pipeline, a `textcat` component is added if it doesn't have one.
+        seed: The random seed, `None` leaves the random state alone. The global `random` and `numpy.random` states are
+            seeded while training (see `spacy.util.fix_random_seed`) and restored afterwards.
+        max_epochs: The maximum number of passes over the training data.
+        patience: The number of epochs without improvement to stop after, `None` always runs `max_epochs` epochs.
+        validation_size: The fraction of the data held out, 0 trains on all of it without stopping early.
+
+    Returns:
+        A report of the time each epoch took and the validation scores.
+    """
+    assert max_epochs > 0 and 0.0 <= validation_size < 1.0
     if TEXTCAT not in nlp.pipe_names:
         textcat = nlp.create_pipe(TEXTCAT, config={"exclusive_classes": False})
         nlp.add_pipe(textcat, last=True)
@@ -93,21 +330,40 @@ def train_pipeline(nlp: spacy.language.Language) -> None:
     for category in CATEGORIES:
         textcat.add_label(category.value)
 
-    pipe_exceptions = {TEXTCAT, "trf_wordpiecer", "trf_tok2vec"}
-    other_pipes = [pipe for pipe in nlp.pipe_names if pipe not in pipe_exceptions]
-    with nlp.disable_pipes(*other_pipes):  # only train textcat
+    report = TrainingReport(seed)
+    other_pipes = [pipe for pipe in nlp.pipe_names if pipe not in CLASSIFICATION_PIPES]
+    with _seeded(seed), nlp.disable_pipes(*other_pipes):  # only train textcat
+        shuffler = random.Random(seed)
         all_data = list(get_classification_training_data())
-        random.shuffle(all_data)
-
-        training_data = all_data[: len(all_data) - 2]
-        validation_data = all_data[len(all_data) - 2 :]
+        shuffler.shuffle(all_data)
+        training_data, validation_data = _split_validation(all_data, validation_size)
 
         optimizer = nlp.begin_training()
-        for itn in range(20):
-            losses: Dict[str, Any] = {}
-            random.shuffle(training_data)
-            batches = minibatch(training_data, size=compounding(4.0, 32.0, 1.001))
-
-            for batch in batches:
-                texts, annotations = zip(*batch)
-                nlp.update(texts, annotations, sgd=optimizer, drop=0.2, losses=losses)
+        initial_weights = textcat.to_bytes() if validation_data else None
+        for epoch in range(max_epochs):
+            seconds, loss = _train_epoch(nlp, optimizer, training_data, shuffler)
+            report.losses.append(loss)
+
+            if validation_data:
+                validation_loss, validation_accuracy = _validate(nlp, validation_data)
+                report.validation_losses.append(validation_loss)
+                report.validation_accuracies.append(validation_accuracy)
+                if report.best_epoch is None or validation_loss < report.validation_losses[report.best_epoch]:
+                    report.best_epoch = epoch
+            report.epoch_times.append(seconds)
+
+            if patience is not None and report.best_epoch is not None and epoch - report.best_epoch >= patience:
+                report.stopped_early = epoch + 1 < max_epochs
+                break
+
+        if initial_weights is not None and report.best_epoch is not None:
+            # The held out examples are too few to leave out of the final pipeline.
+            textcat.from_bytes(initial_weights)
+            optimizer = nlp.resume_training()
+            for _ in range(report.best_epoch + 1):
+                seconds, loss = _train_epoch(nlp, optimizer, all_data, shuffler)
+                report.retraining_times.append(seconds)
+                report.retraining_losses.append(loss)
+
+    invalidate_model_generation(nlp)
+    return report
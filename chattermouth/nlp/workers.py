@@ -0,0 +1,213 @@
+"""A pool of worker processes which score text in parallel."""
+
+import array
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, wait
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Generator, List, Optional, Tuple
+
+import spacy
+
+from .categories import Category
+from .inference import score_texts
+from .service import BatchingClassifier, ClassifierService
+from .sharing import memory_map_vectors, prepare_for_fork, unfreeze_after_fork
+
+_CATEGORY_ORDER = [category.value for category in Category]
+
+_worker_nlp: Optional[spacy.language.Language] = None
+
+
+def _load_default_pipeline() -> spacy.language.Language:
+    from . import get_default_spacy_pipeline
+
+    return get_default_spacy_pipeline(classification_only=True)
+
+
+def _initialize_worker(
+    load_pipeline: Callable[[], spacy.language.Language] = _load_default_pipeline, mmap_vectors: bool = False
+) -> None:
+    # The initializer of every NLP worker process, both `WorkerPoolClassifier`s and `create_nlp_process_executor`.
+    global _worker_nlp
+    _worker_nlp = load_pipeline()
+    if mmap_vectors:
+        memory_map_vectors(_worker_nlp)
+
+
+def _get_worker_pipeline() -> spacy.language.Language:
+    # Workers forked from a preloading process inherit the pipeline, others load it on first use if needed.
+    if _worker_nlp is None:
+        _initialize_worker()
+    assert _worker_nlp is not None
+    return _worker_nlp
+
+
+def _create_worker_executor(
+    processes: Optional[int] = None,
+    load_pipeline: Callable[[], spacy.language.Language] = _load_default_pipeline,
+    mmap_vectors: bool = False,
+    mp_context: Optional[multiprocessing.context.BaseContext] = None,
+) -> ProcessPoolExecutor:
+    return ProcessPoolExecutor(
+        max_workers=processes,
+        mp_context=mp_context,
+        initializer=_initialize_worker,
+        initargs=(load_pipeline, mmap_vectors),
+    )
+
+
+def _is_loop_running() -> bool:
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
+def _score_batch(texts: List[str]) -> array.array:
+    # Scores are returned as one flat array of floats in `_CATEGORY_ORDER` to keep the IPC payload small.
+    scores = array.array("d")
+    for cats in score_texts(_get_worker_pipeline(), texts, batch_size=max(len(texts), 1)):
+        scores.extend(cats.get(category, 0.0) for category in _CATEGORY_ORDER)
+    return scores
+
+
+class WorkerPoolClassifier(BatchingClassifier):
+    """Score text in a pool of worker processes, each with its own copy of the pipeline.
+
+    Requests are batched like `BatchingClassifier` and each batch is sent to a worker which returns only the category
+    scores. Every worker loads its pipeline once when it starts, by default the cached classification-only pipeline
+    returned by `get_default_spacy_pipeline`.
+
+    With `preload=True` the pipeline is instead loaded once in this process, warmed up and frozen with
+    `chattermouth.nlp.sharing.prepare_for_fork`, and the workers are forked from this process so they share its memory
+    copy-on-write. This needs the `fork` start method, so it isn't available on Windows. Forking a process while other
+    threads run can deadlock the workers if one of the threads holds a lock, eg. a logging handler's, so create a
+    preloading pool before starting the event loop or any threads, and the workers are forked straight away. Pools
+    created while the event loop runs fork their workers when `warm_up` is awaited, or when the first batch is run.
+    Once every worker is forked the pipeline is unfrozen in this process again. Where threads can't be avoided, pass
+    a `forkserver` context instead of preloading, which starts the workers from a clean server process.
+
+    ## Example
+    ```python
+    with enter_worker_pool(processes=4):
+        await ask_yes_or_no("Do you like apple pie?")
+    ```
+
+    Args:
+        processes: The number of worker processes, defaults to the number of CPUs.
+        load_pipeline: A picklable function called once in each worker to load its pipeline.
+        max_batch_size: The maximum number of texts in a batch.
+        max_wait: The maximum number of seconds to wait for a batch to fill.
+        max_queue_size: The maximum number of waiting texts, callers block when the queue is full.
+        mp_context: The `multiprocessing` context used to start the workers, `fork` by default when preloading.
+        preload: Whether to load the pipeline in this process and share it with forked workers.
+        mmap_vectors: Whether to memory-map the pipeline's word vectors, see `memory_map_vectors`.
+    """
+
+    def __init__(
+        self,
+        processes: Optional[int] = None,
+        load_pipeline: Callable[[], spacy.language.Language] = _load_default_pipeline,
+        max_batch_size: int = 64,
+        max_wait: float = 0.005,
+        max_queue_size: int = 4096,
+        mp_context: Optional[multiprocessing.context.BaseContext] = None,
+        preload: bool = False,
+        mmap_vectors: bool = False,
+    ) -> None:
+        processes = processes or os.cpu_count() or 1
+        super().__init__(
+            None,
+            max_batch_size=max_batch_size,
+            max_wait=max_wait,
+            max_queue_size=max_queue_size,
+            max_concurrent_batches=processes,
+        )
+
+        self.processes: int = processes
+        """The number of worker processes."""
+
+        self._frozen = False
+        if preload:
+            _initialize_worker(load_pipeline, mmap_vectors)
+            assert _worker_nlp is not None
+            prepare_for_fork(_worker_nlp)
+            self._frozen = True
+            self._pool = ProcessPoolExecutor(
+                max_workers=processes, mp_context=mp_context or multiprocessing.get_context("fork")
+            )
+            if not _is_loop_running():
+                # Fork every worker now, before this process starts threads or allocates memory they would inherit.
+                wait([self._pool.submit(_score_batch, []) for _ in range(processes)])
+                self._unfreeze()
+        else:
+            self._pool = _create_worker_executor(processes, load_pipeline, mmap_vectors, mp_context)
+
+    async def process(self, text: str) -> spacy.tokens.doc.Doc:
+        """Workers only return scores, so text is run through the current spaCy pipeline in the current NLP executor."""
+        return await ClassifierService.process(self, text)
+
+    async def warm_up(self) -> None:
+        """Start every worker and wait for them to load their pipelines, or to be forked when preloading."""
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(loop.run_in_executor(self._pool, _score_batch, []) for _ in range(self.processes)))
+        self._unfreeze()
+
+    async def close(self) -> None:
+        """Stop batching and shut the worker processes down, waiting for them to exit without blocking the loop."""
+        await super().close()
+        await asyncio.get_running_loop().run_in_executor(None, self._pool.shutdown)
+
+    def shutdown(self) -> None:
+        """Stop batching and shut the worker processes down, blocking until they exit.
+
+        Requests which are still waiting fail with a `ClassifierClosedError` and running batches finish first. Inside
+        the event loop prefer `close`, which waits without blocking the loop.
+        """
+        if self._worker is not None:
+            self._worker.cancel()
+            self._worker = None
+        self._fail_waiting()
+        # Shutting down without waiting while a batch runs leaves the pool's management thread to fail on the closed
+        # queues, and the interpreter then hangs at exit.
+        self._pool.shutdown(wait=True)
+        self._unfreeze()
+
+    def _unfreeze(self) -> None:
+        if self._frozen:
+            unfreeze_after_fork()
+            self._frozen = False
+
+    async def _execute(self, batch: List[Tuple[str, bool]]) -> List[Any]:
+        if self._frozen:
+            await self.warm_up()
+        texts = [text for text, _ in batch]
+        scores = await asyncio.get_running_loop().run_in_executor(self._pool, _score_batch, texts)
+        width = len(_CATEGORY_ORDER)
+        results: List[Dict[str, float]] = []
+        for offset in range(0, len(scores), width):
+            results.append(dict(zip(_CATEGORY_ORDER, scores[offset : offset + width])))
+        return results
+
+
+@contextmanager
+def enter_worker_pool(processes: Optional[int] = None, **kwargs: Any) -> Generator[WorkerPoolClassifier, None, None]:
+    """Score text in a new `WorkerPoolClassifier` for a scope, shutting the workers down afterwards.
+
+    Leaving the scope waits for the workers to exit, see `WorkerPoolClassifier.shutdown`.
+
+    Args:
+        processes: The number of worker processes, defaults to the number of CPUs.
+        kwargs: Extra arguments passed to `WorkerPoolClassifier`.
+    """
+    from . import enter_classifier_service
+
+    pool = WorkerPoolClassifier(processes, **kwargs)
+    try:
+        with enter_classifier_service(pool):
+            yield pool
+    finally:
+        pool.shutdown()
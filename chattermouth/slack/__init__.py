@@ -1,16 +1,39 @@
 import asyncio
+import logging
+import time
 import traceback
-import weakref
-from typing import Any, Awaitable, Callable, Dict, Optional, Set
+from collections import OrderedDict, deque
+from functools import partial
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional
 
 import slack
 
-from ..core import AbstractInteractionContext, Message, UserInfo, enter_interaction_context
+from ..core import (
+    AbstractInteractionContext,
+    Message,
+    UserInfo,
+    enter_interaction_context,
+    instrumented,
+    wait_for_response,
+)
+from .directory import SlackUserDirectory
+from .sending import SlackSendScheduler, SlackWebClient
+from .sharding import ShardedSlackInteractionFactory
+
+_logger = logging.getLogger(__name__)
 
 
 class SlackInteractionFactory:
     """A `AbstractInteractionContext` producer using a `slack.RTMClient`.
 
+    An interaction lives until its callback returns. If `idle_timeout` is set, interactions which haven't sent or
+    received a message for that many seconds are also evicted and their callbacks cancelled.
+
+    The number of active interactions can be limited globally and per user. New threads which would exceed a limit
+    wait in a bounded admission queue until an interaction finishes, and once that queue is full they're sent
+    `rejection_message` and ignored. Follow up messages in a thread which was turned away are ignored too, for up to
+    ten minutes.
+
     ## Example
     ```python
     async def on_message():
@@ -24,23 +47,240 @@ class SlackInteractionFactory:
     Args:
         rtm_client: An RTM client constructed with `run_async` enabled.
         callback: The callback to call for each new message.
+        user_directory: The cache of user profiles shared by every interaction, by default a new
+            `SlackUserDirectory`.
+        idle_timeout: The number of seconds after which an idle interaction is evicted, `None` disables eviction.
+            Interactions waiting to be admitted are never evicted.
+        send_scheduler: The scheduler every interaction sends messages through, by default a new
+            `SlackSendScheduler`.
+        max_interactions: The maximum number of active interactions, `None` for no limit.
+        max_interactions_per_user: The maximum number of active interactions per user, `None` for no limit.
+        max_waiting: The maximum number of new interactions waiting to be admitted.
+        rejection_message: The reply to threads which are turned away, `None` ignores them silently.
+        listen_timeout: The `default_timeout` of every interaction, `None` waits for responses forever.
+        debounce: If set, `listen` merges messages sent less than this many seconds apart into one message, see
+            `SlackInteractionContext`.
+        debounce_max_wait: The maximum number of seconds `listen` waits for more messages to merge.
     """
 
-    def __init__(self, rtm_client: slack.RTMClient, callback: Callable[[], Any]) -> None:
-        slack.RTMClient.on(event="message", callback=self._on_message)
+    def __init__(
+        self,
+        rtm_client: slack.RTMClient,
+        callback: Callable[[], Any],
+        user_directory: Optional[SlackUserDirectory] = None,
+        idle_timeout: Optional[float] = None,
+        send_scheduler: Optional[SlackSendScheduler] = None,
+        max_interactions: Optional[int] = None,
+        max_interactions_per_user: Optional[int] = None,
+        max_waiting: int = 100,
+        rejection_message: Optional[str] = "Sorry, I'm busy right now. Please try again in a little while.",
+        listen_timeout: Optional[float] = None,
+        debounce: Optional[float] = None,
+        debounce_max_wait: float = 2.0,
+    ) -> None:
+        assert idle_timeout is None or idle_timeout > 0.0
+        assert debounce is None or (debounce > 0.0 and debounce_max_wait >= debounce)
+        assert max_interactions is None or max_interactions > 0
+        assert max_interactions_per_user is None or max_interactions_per_user > 0
+        assert max_waiting >= 0
+        rtm_client.on(event="message", callback=self._on_message)
         self.callback = callback
-        self._interactions: Dict[str, weakref.WeakValueDictionary[str, SlackInteractionContext]] = {}
+
+        self.user_directory: SlackUserDirectory = user_directory if user_directory is not None else SlackUserDirectory()
+        """The cache of user profiles shared by every interaction."""
+
+        self.idle_timeout: Optional[float] = idle_timeout
+        """The number of seconds after which an idle interaction is evicted."""
+
+        self.send_scheduler: SlackSendScheduler = send_scheduler if send_scheduler is not None else SlackSendScheduler()
+        """The scheduler every interaction sends messages through."""
+
+        self.max_interactions: Optional[int] = max_interactions
+        """The maximum number of active interactions."""
+
+        self.max_interactions_per_user: Optional[int] = max_interactions_per_user
+        """The maximum number of active interactions per user."""
+
+        self.max_waiting: int = max_waiting
+        """The maximum number of new interactions waiting to be admitted."""
+
+        self.rejection_message: Optional[str] = rejection_message
+        """The reply to threads which are turned away."""
+
+        self.listen_timeout: Optional[float] = listen_timeout
+        """The `default_timeout` of every interaction."""
+
+        self.debounce: Optional[float] = debounce
+        """The quiet period after which `listen` stops merging messages, `None` disables merging."""
+
+        self.debounce_max_wait: float = debounce_max_wait
+        """The maximum number of seconds `listen` waits for more messages to merge."""
+
+        self.completed_interactions: int = 0
+        """The number of interactions whose callback finished, not counting evicted interactions."""
+
+        self.rejected_interactions: int = 0
+        """The number of new threads turned away because the admission queue was full or the factory was draining."""
+
+        self.evicted_interactions: int = 0
+        """The number of interactions evicted for being idle."""
+
+        self._interactions: Dict[str, Dict[str, SlackInteractionContext]] = {}
+        self._tasks: Dict[SlackInteractionContext, asyncio.Task] = {}
+        self._active_per_user: Dict[str, int] = {}
+        self._waiting: Deque[SlackInteractionContext] = deque()
+        self._draining = False
+        self._sweeper: Optional[asyncio.Task] = None
+        self._rejected_threads = _RecentSet(maxsize=4096)
+
+    @property
+    def live_interactions(self) -> int:
+        """The number of interactions currently being tracked."""
+        return sum(len(interaction_map) for interaction_map in self._interactions.values())
+
+    @property
+    def tracked_users(self) -> int:
+        """The number of users with at least one live interaction."""
+        return len(self._interactions)
+
+    @property
+    def active_interactions(self) -> int:
+        """The number of interactions whose callback is running."""
+        return len(self._tasks)
+
+    @property
+    def waiting_interactions(self) -> int:
+        """The number of new interactions waiting to be admitted."""
+        return len(self._waiting)
+
+    async def drain(self, timeout: Optional[float] = None) -> None:
+        """Stop admitting interactions and wait for the active ones to finish.
+
+        Interactions still waiting to be admitted are turned away like new threads, and sent `rejection_message`.
+
+        Args:
+            timeout: The number of seconds to wait before cancelling the remaining interactions, `None` waits forever.
+        """
+        self._draining = True
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            self._sweeper = None
+        waiting = list(self._waiting)
+        for context in waiting:
+            self._remove_interaction(context)
+        await asyncio.gather(*(self._reject(context) for context in waiting))
+
+        tasks = list(self._tasks.values())
+        if not tasks:
+            return
+        _, pending = await asyncio.wait(tasks, timeout=timeout)
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.wait(pending)
 
     def _get_interaction(self, user: str, ts: str) -> Optional["SlackInteractionContext"]:
-        interaction_map: weakref.WeakValueDictionary[str, SlackInteractionContext]
-        if user in self._interactions:
-            interaction_map = self._interactions[user]
+        interaction_map = self._interactions.get(user)
+        return interaction_map.get(ts) if interaction_map is not None else None
+
+    def _add_interaction(self, user: str, ts: str, context: "SlackInteractionContext") -> None:
+        self._interactions.setdefault(user, {})[ts] = context
+
+    def _remove_interaction(self, context: "SlackInteractionContext") -> None:
+        user = context.user.id
+        interaction_map = self._interactions.get(user)
+        if interaction_map is not None and interaction_map.get(context.thread_ts) is context:
+            del interaction_map[context.thread_ts]
+            if not interaction_map:
+                del self._interactions[user]
+
+        if self._tasks.pop(context, None) is not None:
+            remaining = self._active_per_user[user] - 1
+            if remaining:
+                self._active_per_user[user] = remaining
+            else:
+                del self._active_per_user[user]
         else:
-            interaction_map = weakref.WeakValueDictionary()
-            self._interactions[user] = interaction_map
-        return interaction_map.get(ts)
+            try:
+                self._waiting.remove(context)
+            except ValueError:
+                pass
+
+    async def _reject(self, context: "SlackInteractionContext") -> None:
+        self.rejected_interactions += 1
+        self._rejected_threads.add(context.interaction_id)
+        if self.rejection_message is not None:
+            await context.tell(self.rejection_message)
+
+    def _can_admit(self, user: str) -> bool:
+        if self.max_interactions is not None and len(self._tasks) >= self.max_interactions:
+            return False
+        if self.max_interactions_per_user is not None:
+            return self._active_per_user.get(user, 0) < self.max_interactions_per_user
+        return True
+
+    def _admit_waiting(self) -> None:
+        for context in list(self._waiting):
+            if self.max_interactions is not None and len(self._tasks) >= self.max_interactions:
+                return
+            if self._can_admit(context.user.id):
+                self._waiting.remove(context)
+                # Time spent waiting to be admitted doesn't count towards the idle timeout.
+                context.touch()
+                self._start(context)
+
+    def _start(self, context: "SlackInteractionContext") -> None:
+        with enter_interaction_context(context):
+            callback_result = self.callback()
+            if asyncio.iscoroutine(callback_result):
+                user = context.user.id
+                self._add_interaction(user, context.thread_ts, context)
+                task = asyncio.create_task(callback_result)
+                self._tasks[context] = task
+                self._active_per_user[user] = self._active_per_user.get(user, 0) + 1
+                task.add_done_callback(partial(self._on_callback_done, context))
+            else:
+                self._remove_interaction(context)
+                self.completed_interactions += 1
+
+    def _on_callback_done(self, context: "SlackInteractionContext", task: asyncio.Task) -> None:
+        # Evicted interactions were already removed and counted when they were evicted.
+        if context in self._tasks:
+            self.completed_interactions += 1
+            self._remove_interaction(context)
+        self._admit_waiting()
+
+    async def _sweep_idle_interactions(self) -> None:
+        assert self.idle_timeout is not None
+        # Sweeping is linear in the number of interactions, so only do it a few times per timeout period.
+        while True:
+            await asyncio.sleep(self.idle_timeout / 4)
+            self._evict_idle_interactions()
+
+    def _evict_idle_interactions(self) -> None:
+        assert self.idle_timeout is not None
+        now = asyncio.get_running_loop().time()
+        # Interactions waiting to be admitted are idle because of the bot, not the user, so they're left waiting.
+        idle = [
+            context
+            for interaction_map in self._interactions.values()
+            for context in interaction_map.values()
+            if context in self._tasks and now - context.last_activity > self.idle_timeout
+        ]
+        for context in idle:
+            self.evicted_interactions += 1
+            task = self._tasks.get(context)
+            self._remove_interaction(context)
+            if task is not None:
+                task.cancel()
+        if idle:
+            self._admit_waiting()
+
+    async def _on_message(self, web_client: SlackWebClient, data: dict, **payload) -> None:
+        if self.idle_timeout is not None and self._sweeper is None and not self._draining:
+            # Sweep on a timer rather than on incoming messages, so interactions are evicted even when it's quiet.
+            self._sweeper = asyncio.create_task(self._sweep_idle_interactions())
 
-    async def _on_message(self, web_client: slack.WebClient, data: dict, **payload) -> None:
         subtype = data.get("subtype")
         if subtype == "message_deleted":
             interaction = self._get_interaction(
@@ -54,28 +294,139 @@ class SlackInteractionFactory:
             user = data["user"]
             interaction = self._get_interaction(user, thread)
             if interaction is not None:
+                interaction.touch()
                 await interaction.message_queue.put(data)
                 return
+            if f"{data['channel']}:{thread}" in self._rejected_threads:
+                return
+
+            context = SlackInteractionContext(
+                web_client=web_client,
+                data=data,
+                user_directory=self.user_directory,
+                send_scheduler=self.send_scheduler,
+                debounce=self.debounce,
+                debounce_max_wait=self.debounce_max_wait,
+            )
+            context.default_timeout = self.listen_timeout
+            if not self._draining and self._can_admit(user) and not self._waiting:
+                self._start(context)
+            elif not self._draining and len(self._waiting) < self.max_waiting:
+                # Route follow up messages to the waiting interaction so none are lost before it starts.
+                self._add_interaction(user, thread, context)
+                self._waiting.append(context)
+                self._admit_waiting()
+            else:
+                await self._reject(context)
+
+
+class _RecentSet:
+    """A set which only remembers its most recent entries, forgetting them after `ttl` seconds or once it's full."""
+
+    __slots__ = ("maxsize", "ttl", "_clock", "_entries")
+
+    def __init__(self, maxsize: int = 256, ttl: float = 600.0, clock: Callable[[], float] = time.monotonic) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._entries: "OrderedDict[str, float]" = OrderedDict()
+
+    def add(self, value: str) -> None:
+        self._entries[value] = self._clock()
+        self._entries.move_to_end(value)
+        self._prune()
 
-            context = SlackInteractionContext(web_client=web_client, data=data)
-            self._interactions[user][thread] = context
-            with enter_interaction_context(context):
-                callback_result = self.callback()
-                if asyncio.iscoroutine(callback_result):
-                    asyncio.create_task(callback_result)
+    def remove(self, value: str) -> None:
+        del self._entries[value]
+
+    def discard(self, value: str) -> None:
+        self._entries.pop(value, None)
+
+    def _prune(self) -> None:
+        expiry = self._clock() - self.ttl
+        while self._entries:
+            oldest, added = next(iter(self._entries.items()))
+            if len(self._entries) <= self.maxsize and added >= expiry:
+                break
+            del self._entries[oldest]
+
+    def __contains__(self, value: object) -> bool:
+        self._prune()
+        return value in self._entries
+
+    def __len__(self) -> int:
+        self._prune()
+        return len(self._entries)
+
+
+class _MessageQueue:
+    """An unbounded queue with a single consumer, which is much smaller than an `asyncio.Queue`."""
+
+    __slots__ = ("_items", "_waiter")
+
+    def __init__(self) -> None:
+        self._items: List[dict] = []
+        self._waiter: Optional[asyncio.Future] = None
+
+    def put_nowait(self, item: dict) -> None:
+        self._items.append(item)
+        self._wake()
+
+    def put_back(self, items: List[dict]) -> None:
+        """Return items which were taken to the front of the queue, in order."""
+        self._items[:0] = items
+        self._wake()
+
+    def _wake(self) -> None:
+        if self._items and self._waiter is not None and not self._waiter.done():
+            self._waiter.set_result(None)
+
+    async def put(self, item: dict) -> None:
+        self.put_nowait(item)
+
+    async def wait(self) -> None:
+        """Wait until the queue isn't empty."""
+        assert self._waiter is None, "only one coroutine can wait for a message at a time"
+        while not self._items:
+            self._waiter = asyncio.get_running_loop().create_future()
+            try:
+                await self._waiter
+            finally:
+                self._waiter = None
+
+    async def get(self) -> dict:
+        await self.wait()
+        # Conversations only queue a handful of messages, so popping from the front of a list is cheap.
+        return self._items.pop(0)
+
+    def get_nowait(self) -> dict:
+        if not self._items:
+            raise asyncio.QueueEmpty()
+        return self._items.pop(0)
+
+    def empty(self) -> bool:
+        return not self._items
+
+    def qsize(self) -> int:
+        return len(self._items)
 
 
 class SlackUserInfo(UserInfo):
-    def __init__(self, web_client: slack.WebClient, id: str):
+    __slots__ = ("id", "_web_client", "_directory", "_cached_info")
+
+    def __init__(self, web_client: SlackWebClient, id: str, directory: Optional[SlackUserDirectory] = None):
         self.id = id
         """The ID of the user."""
 
-        self._web_client: slack.WebClient = web_client
+        self._web_client: SlackWebClient = web_client
+        self._directory: Optional[SlackUserDirectory] = directory
         self._cached_info: Optional[dict] = None
 
     async def _user_info(self) -> dict:
+        if self._directory is not None:
+            return await self._directory.get(self._web_client, self.id)
         if self._cached_info is None:
-            self._cached_info = (await self._web_client.users_info(user=self.id))["user"]  # type: ignore
+            self._cached_info = (await self._web_client.users_info(user=self.id))["user"]
         return self._cached_info
 
     async def _get_profile(self) -> dict:
@@ -95,7 +446,9 @@ class SlackUserInfo(UserInfo):
 
 
 class SlackMessage(Message):
-    """A message from the CLI."""
+    """A message from Slack."""
+
+    __slots__ = ("user", "content")
 
     def __init__(self, user: SlackUserInfo, content: str) -> None:
         self.user: SlackUserInfo = user
@@ -109,10 +462,53 @@ class SlackMessage(Message):
 
 
 class SlackInteractionContext(AbstractInteractionContext):
-    """An interaction context for Slack."""
+    """An interaction context for Slack.
+
+    Args:
+        web_client: The web client used to access Slack.
+        data: The event of the message which started the interaction.
+        user_directory: The cache used to look up the user's profile, if any.
+        send_scheduler: The scheduler used to send messages, if `None` messages are posted directly.
+        debounce: If set, `listen` keeps waiting for more messages until none arrive for this many seconds, and
+            returns the messages joined by newlines. Users often answer in bursts, eg. "no" then "not right now", which
+            are then classified as one answer.
+        debounce_max_wait: The maximum number of seconds `listen` waits for more messages to merge.
+    """
 
-    def __init__(self, web_client: slack.WebClient, data: dict) -> None:
-        self.web_client: slack.WebClient = web_client
+    __slots__ = (
+        "debounce",
+        "debounce_max_wait",
+        "default_timeout",
+        "web_client",
+        "ts",
+        "thread_ts",
+        "channel",
+        "user",
+        "last_activity",
+        "send_scheduler",
+        "message_queue",
+        "_send_lock",
+        "_deleted_message",
+    )
+
+    def __init__(
+        self,
+        web_client: SlackWebClient,
+        data: dict,
+        user_directory: Optional[SlackUserDirectory] = None,
+        send_scheduler: Optional[SlackSendScheduler] = None,
+        debounce: Optional[float] = None,
+        debounce_max_wait: float = 2.0,
+    ) -> None:
+        self.default_timeout: Optional[float] = None
+
+        self.debounce: Optional[float] = debounce
+        """The quiet period after which `listen` stops merging messages, `None` disables merging."""
+
+        self.debounce_max_wait: float = debounce_max_wait
+        """The maximum number of seconds `listen` waits for more messages to merge."""
+
+        self.web_client: SlackWebClient = web_client
         """The web client used to access Slack."""
 
         self.ts = data["ts"]
@@ -124,31 +520,142 @@ class SlackInteractionContext(AbstractInteractionContext):
         self.channel = data["channel"]
         """The channel the original message was posted in."""
 
-        self.user = SlackUserInfo(web_client, data["user"])
+        self.user = SlackUserInfo(web_client, data["user"], user_directory)
         """The user who posted the message."""
 
-        self._send_lock = asyncio.Lock()
+        self.last_activity: float = asyncio.get_running_loop().time()
+        """The event loop time of the last message sent or received."""
 
-        self.message_queue: asyncio.Queue[dict] = asyncio.Queue()
+        self.send_scheduler: Optional[SlackSendScheduler] = send_scheduler
+        """The scheduler used to send messages."""
+
+        self.message_queue: _MessageQueue = _MessageQueue()
+        """The messages received in the interaction's thread which haven't been listened to yet."""
         self.message_queue.put_nowait(data)
-        self.deleted_message: Set[str] = set()
+
+        # Most interactions are short, so these are only created once they're needed.
+        self._send_lock: Optional[asyncio.Lock] = None
+        self._deleted_message: Optional[_RecentSet] = None
+
+    @property
+    def deleted_message(self) -> _RecentSet:
+        """The recent `ts`s of deleted messages and of messages sent by the bot, which `listen` skips."""
+        if self._deleted_message is None:
+            self._deleted_message = _RecentSet()
+        return self._deleted_message
+
+    @property
+    def backend(self) -> str:
+        return "slack"
+
+    @property
+    def interaction_id(self) -> str:
+        return f"{self.channel}:{self.thread_ts}"
+
+    def touch(self) -> None:
+        """Mark the interaction as active."""
+        self.last_activity = asyncio.get_running_loop().time()
 
     def _create_message(self, data: dict) -> SlackMessage:
         return SlackMessage(user=self.user, content=data["text"])
 
+    @instrumented("tell")
     async def tell(self, message: str) -> None:
-        async with self._send_lock:
-            result = await self.web_client.chat_postMessage(  # type: ignore
-                text=message, channel=self.channel, thread_ts=self.thread_ts
+        """Send a message to the user.
+
+        If the send scheduler coalesces messages this returns once the message is queued, so consecutive calls can be
+        sent as one post. It still waits while the scheduler's queue is full.
+        """
+        self.touch()
+        if self.send_scheduler is not None and self.send_scheduler.coalesce:
+            posted = await self.send_scheduler.queue_message(
+                self.channel, message, self.thread_ts, web_client=self.web_client
             )
+            posted.add_done_callback(self._on_posted)
+            return
+
+        if self._send_lock is None:
+            self._send_lock = asyncio.Lock()
+        async with self._send_lock:
+            if self.send_scheduler is not None:
+                result = await self.send_scheduler.post_message(
+                    self.channel, message, self.thread_ts, web_client=self.web_client
+                )
+            else:
+                result = await self.web_client.chat_postMessage(
+                    text=message, channel=self.channel, thread_ts=self.thread_ts
+                )
             self.deleted_message.add(result["message"]["ts"])
 
-    async def listen(self) -> SlackMessage:
+    def _on_posted(self, posted: "asyncio.Future[dict]") -> None:
+        if posted.cancelled():
+            return
+        error = posted.exception()
+        if error is not None:
+            _logger.error("Failed to send a message to %s", self.channel, exc_info=error)
+            return
+        self.deleted_message.add(posted.result()["message"]["ts"])
+
+    @instrumented("listen")
+    async def listen(self, timeout: Optional[float] = None) -> SlackMessage:
+        """Listen for a message from the user.
+
+        The timeout only applies to the first message, merging messages with it takes at most `debounce_max_wait`
+        seconds more. If `listen` is cancelled the messages it took are queued again.
+
+        Raises:
+            InteractionTimeoutError: If the user didn't respond in time.
+        """
+        data = await wait_for_response(self, self._next_message(), timeout)
+        if self.debounce is None:
+            return self._create_message(data)
+        return await self._debounce(data)
+
+    async def _debounce(self, data: dict) -> SlackMessage:
+        assert self.debounce is not None
+        collected = [data]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.debounce_max_wait
+        try:
+            while True:
+                wait = min(self.debounce, deadline - loop.time())
+                if wait <= 0.0:
+                    break
+                try:
+                    # Only wait for a message to arrive, so a message is never dropped by the timeout.
+                    await asyncio.wait_for(self.message_queue.wait(), wait)
+                except asyncio.TimeoutError:
+                    break
+                await self._wait_for_send()
+                next_data = self._take_message()
+                if next_data is not None:
+                    collected.append(next_data)
+        except asyncio.CancelledError:
+            self.message_queue.put_back(collected)
+            raise
+        return SlackMessage(user=self.user, content="\n".join(item["text"] for item in collected))
+
+    async def _next_message(self) -> dict:
         while True:
-            data = await self.message_queue.get()
-
+            await self.message_queue.wait()
+            await self._wait_for_send()
+            data = self._take_message()
+            if data is not None:
+                return data
+
+    async def _wait_for_send(self) -> None:
+        # Wait for a message being sent to be recorded, so the bot's own message isn't returned.
+        if self._send_lock is not None and self._send_lock.locked():
             async with self._send_lock:
-                if data["ts"] in self.deleted_message:
-                    self.deleted_message.remove(data["ts"])
-                    continue
-            return self._create_message(data)
+                pass
+
+    def _take_message(self) -> Optional[dict]:
+        # Take the next queued message which isn't deleted or from the bot. Nothing is awaited between taking a message
+        # and returning it, so a cancelled `listen` never loses one.
+        while not self.message_queue.empty():
+            data = self.message_queue.get_nowait()
+            if self._deleted_message is not None and data["ts"] in self._deleted_message:
+                self._deleted_message.remove(data["ts"])
+                continue
+            return data
+        return None
@@ -0,0 +1,126 @@
+"""A shared cache of Slack user profiles."""
+
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Tuple
+
+from .sending import SlackWebClient
+
+
+class SlackUserDirectory:
+    """A size and age bounded cache of `users.info` results shared by every interaction.
+
+    Concurrent lookups of the same user share a single request, and `prefetch` can fill the cache with a few
+    `users.list` calls when the bot starts.
+
+    ## Example
+    ```python
+    directory = SlackUserDirectory()
+    await directory.prefetch(web_client)
+    chattermouth.slack.SlackInteractionFactory(client, callback=on_message, user_directory=directory)
+    ```
+
+    Args:
+        maxsize: The maximum number of cached users.
+        ttl: The number of seconds a user is cached for, `None` caches users until they're evicted.
+        clock: The clock used to expire users.
+    """
+
+    def __init__(
+        self, maxsize: int = 10000, ttl: Optional[float] = 3600.0, clock: Callable[[], float] = time.monotonic
+    ) -> None:
+        assert maxsize > 0
+
+        self.maxsize: int = maxsize
+        """The maximum number of cached users."""
+
+        self.ttl: Optional[float] = ttl
+        """The number of seconds a user is cached for."""
+
+        self.hits: int = 0
+        """The number of lookups answered from the cache."""
+
+        self.misses: int = 0
+        """The number of lookups which weren't answered from the cache."""
+
+        self.requests: int = 0
+        """The number of requests made to the Web API."""
+
+        self._clock = clock
+        self._users: "OrderedDict[str, Tuple[float, dict]]" = OrderedDict()
+        self._pending: Dict[str, asyncio.Future] = {}
+
+    async def get(self, web_client: SlackWebClient, user_id: str) -> dict:
+        """Get the `users.info` object of a user.
+
+        Args:
+            web_client: The client used if the user has to be fetched.
+            user_id: The ID of the user.
+        """
+        user = self._get_cached(user_id)
+        if user is not None:
+            self.hits += 1
+            return user
+        self.misses += 1
+
+        pending = self._pending.get(user_id)
+        if pending is None:
+            pending = asyncio.ensure_future(self._fetch(web_client, user_id))
+            self._pending[user_id] = pending
+            pending.add_done_callback(lambda _: self._pending.pop(user_id, None))
+        # Shield the shared request so one caller being cancelled doesn't cancel it for the others.
+        return await asyncio.shield(pending)
+
+    def put(self, user: dict) -> None:
+        """Add or replace a user in the cache."""
+        self._users[user["id"]] = (self._clock(), user)
+        self._users.move_to_end(user["id"])
+        while len(self._users) > self.maxsize:
+            self._users.popitem(last=False)
+
+    def invalidate(self, user_id: str) -> None:
+        """Remove a user from the cache."""
+        self._users.pop(user_id, None)
+
+    async def prefetch(self, web_client: SlackWebClient, page_size: int = 200) -> int:
+        """Fill the cache using `users.list`.
+
+        Args:
+            web_client: The client used to list the users.
+            page_size: The number of users requested per page.
+
+        Returns:
+            The number of users added to the cache.
+        """
+        count = 0
+        cursor: Optional[str] = None
+        while True:
+            self.requests += 1
+            response = await web_client.users_list(limit=page_size, cursor=cursor)
+            for user in response["members"]:
+                self.put(user)
+                count += 1
+
+            cursor = (response.get("response_metadata") or {}).get("next_cursor")
+            if not cursor:
+                return count
+
+    def __len__(self) -> int:
+        return len(self._users)
+
+    def _get_cached(self, user_id: str) -> Optional[dict]:
+        entry = self._users.get(user_id)
+        if entry is None:
+            return None
+        if self.ttl is not None and self._clock() - entry[0] > self.ttl:
+            del self._users[user_id]
+            return None
+        self._users.move_to_end(user_id)
+        return entry[1]
+
+    async def _fetch(self, web_client: SlackWebClient, user_id: str) -> dict:
+        self.requests += 1
+        user = (await web_client.users_info(user=user_id))["user"]
+        self.put(user)
+        return user
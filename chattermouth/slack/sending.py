@@ -0,0 +1,334 @@
+"""Rate limit aware scheduling of outbound Slack messages."""
+
+import asyncio
+import contextvars
+import heapq
+import itertools
+import sys
+import time
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+import slack
+import slack.errors
+
+from ..core import get_observer, record_timing
+
+if sys.version_info >= (3, 8):
+    from typing import Protocol
+else:
+    from typing_extensions import Protocol
+
+POST_MESSAGE = "chat.postMessage"
+
+
+class SlackWebClient(Protocol):
+    """The `slack.WebClient` methods chattermouth calls, which stand-ins for the client have to provide."""
+
+    def chat_postMessage(self, *, channel: str, **kwargs: Any) -> Any:
+        ...
+
+    def users_info(self, *, user: str, **kwargs: Any) -> Any:
+        ...
+
+    def users_list(self, **kwargs: Any) -> Any:
+        ...
+
+
+class TokenBucket:
+    """A token bucket rate limiter.
+
+    >>> now = 0.0
+    >>> bucket = TokenBucket(rate=1.0, burst=2.0, clock=lambda: now)
+    >>> bucket.take(), bucket.take(), bucket.delay()
+    (None, None, 1.0)
+    >>> now = 0.5
+    >>> bucket.delay()
+    0.5
+
+    Args:
+        rate: The number of tokens added per second.
+        burst: The maximum number of tokens.
+        clock: The clock used to add tokens.
+    """
+
+    def __init__(self, rate: float, burst: float, clock: Callable[[], float] = time.monotonic) -> None:
+        assert rate > 0.0 and burst >= 1.0
+        self.rate: float = rate
+        self.burst: float = burst
+        self._clock = clock
+        self._tokens: float = burst
+        self._updated: float = clock()
+
+    def delay(self) -> float:
+        """Get the number of seconds until a token is available."""
+        self._refill()
+        return max(0.0, (1.0 - self._tokens) / self.rate)
+
+    def take(self) -> None:
+        """Take a token, which may leave the bucket in debt."""
+        self._refill()
+        self._tokens -= 1.0
+
+    def pause(self, seconds: float) -> None:
+        """Empty the bucket and don't add tokens for `seconds`, eg. to honor a `Retry-After` header."""
+        self._refill()
+        self._tokens = min(self._tokens, 0.0) - seconds * self.rate
+
+    def _refill(self) -> None:
+        now = self._clock()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+
+class _Request:
+    def __init__(self, priority: int, sequence: int, channel: str, thread_ts: Optional[str], text: str) -> None:
+        self.priority = priority
+        self.sequence = sequence
+        self.channel = channel
+        self.thread_ts = thread_ts
+        self.texts: List[str] = [text]
+        self.futures: List[asyncio.Future] = []
+        self.attempts = 0
+        self.queued_at = time.perf_counter()
+        # The context of the first caller, used to record timings against its interaction.
+        self.context: Optional[contextvars.Context] = contextvars.copy_context() if get_observer() else None
+
+    def __lt__(self, other: "_Request") -> bool:
+        return (self.priority, self.sequence) < (other.priority, other.sequence)
+
+
+class SlackSendScheduler:
+    """Send messages through one shared `slack.WebClient` while respecting Slack's rate limits.
+
+    Each channel and each Web API method has its own token bucket. A channel only has one message in flight at a
+    time, which keeps the messages in a thread in order. When Slack responds with HTTP 429, the channel and the method
+    are both paused for the `Retry-After` period and the message is retried.
+
+    Args:
+        web_client: The client used to send every message. If `None`, the client passed to the first `post_message`
+            call is used.
+        channel_rate: The number of messages per second allowed in a channel.
+        channel_burst: The number of messages which can be sent to a channel in a burst.
+        method_rate: The number of calls per second allowed for a Web API method, across every channel.
+        method_burst: The number of calls of a Web API method which can be made in a burst.
+        max_queue_size: The maximum number of queued messages, callers block when the queue is full.
+        max_retries: The number of times a rate limited message is retried.
+        coalesce: If `True`, messages queued for the same thread are joined with newlines and sent as one post.
+
+    If there is an `Observer` when a message is queued, `"send_queue"` and `"slack_api"` `TimingEvent`s are recorded
+    for the time it spent queued and the time the Web API call took.
+    """
+
+    def __init__(
+        self,
+        web_client: Optional[SlackWebClient] = None,
+        channel_rate: float = 1.0,
+        channel_burst: float = 3.0,
+        method_rate: float = 20.0,
+        method_burst: float = 40.0,
+        max_queue_size: int = 1000,
+        max_retries: int = 3,
+        coalesce: bool = False,
+    ) -> None:
+        self.web_client: Optional[SlackWebClient] = web_client
+        """The client used to send every message."""
+
+        self.channel_rate: float = channel_rate
+        self.channel_burst: float = channel_burst
+        self.method_rate: float = method_rate
+        self.method_burst: float = method_burst
+        self.max_retries: int = max_retries
+
+        self.coalesce: bool = coalesce
+        """Whether messages queued for the same thread are sent as one post."""
+
+        self.sent: int = 0
+        """The number of posts made."""
+
+        self.coalesced: int = 0
+        """The number of messages merged into an earlier queued message."""
+
+        self.rate_limited: int = 0
+        """The number of HTTP 429 responses received."""
+
+        self._channel_buckets: Dict[str, TokenBucket] = {}
+        self._method_buckets: Dict[str, TokenBucket] = {}
+        self._pending: List[_Request] = []
+        self._tails: Dict[Tuple[str, Optional[str]], _Request] = {}
+        self._busy_channels: Set[str] = set()
+        self._sequence = itertools.count()
+        self._max_queue_size = max_queue_size
+        self._queue_slots: Optional[asyncio.Semaphore] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._dispatcher: Optional[asyncio.Task] = None
+        self._sends: Set[asyncio.Task] = set()
+
+    @property
+    def queue_depth(self) -> int:
+        """The number of messages waiting to be sent."""
+        return len(self._pending)
+
+    def post_message(
+        self,
+        channel: str,
+        text: str,
+        thread_ts: Optional[str] = None,
+        priority: int = 0,
+        web_client: Optional[SlackWebClient] = None,
+    ) -> "asyncio.Future[dict]":
+        """Queue a `chat.postMessage` call.
+
+        Args:
+            channel: The channel to post in.
+            text: The text of the message.
+            thread_ts: The thread to post in, if any.
+            priority: Messages with a lower value are sent first.
+            web_client: The client to share if the scheduler doesn't have one yet.
+
+        Returns:
+            A future which resolves to the `chat.postMessage` response once the message has been sent.
+        """
+        return asyncio.ensure_future(self._post_message(channel, text, thread_ts, priority, web_client))
+
+    async def queue_message(
+        self,
+        channel: str,
+        text: str,
+        thread_ts: Optional[str] = None,
+        priority: int = 0,
+        web_client: Optional[SlackWebClient] = None,
+    ) -> "asyncio.Future[dict]":
+        """Queue a `chat.postMessage` call, waiting while the queue is full.
+
+        The arguments are those of `post_message`.
+
+        Returns:
+            A future which resolves to the `chat.postMessage` response once the message has been sent.
+        """
+        if self.web_client is None:
+            self.web_client = web_client
+        future: asyncio.Future[dict] = asyncio.get_running_loop().create_future()
+
+        tail = self._tails.get((channel, thread_ts))
+        if self.coalesce and tail is not None and tail.priority == priority:
+            tail.texts.append(text)
+            tail.futures.append(future)
+            self.coalesced += 1
+            return future
+
+        if self._queue_slots is None:
+            self._queue_slots = asyncio.Semaphore(self._max_queue_size)
+        await self._queue_slots.acquire()
+        request = _Request(priority, next(self._sequence), channel, thread_ts, text)
+        request.futures.append(future)
+        heapq.heappush(self._pending, request)
+        self._tails[(channel, thread_ts)] = request
+
+        if self._dispatcher is None:
+            self._wakeup = asyncio.Event()
+            self._dispatcher = asyncio.create_task(self._dispatch())
+        assert self._wakeup is not None
+        self._wakeup.set()
+        return future
+
+    async def close(self) -> None:
+        """Stop sending messages, cancelling any which are still queued, and wait for the ones being sent."""
+        if self._dispatcher is not None:
+            self._dispatcher.cancel()
+            self._dispatcher = None
+        for request in self._pending:
+            for future in request.futures:
+                future.cancel()
+        self._pending.clear()
+        self._tails.clear()
+        if self._sends:
+            await asyncio.wait(list(self._sends))
+
+    async def _post_message(
+        self, channel: str, text: str, thread_ts: Optional[str], priority: int, web_client: Optional[SlackWebClient]
+    ) -> dict:
+        return await (await self.queue_message(channel, text, thread_ts, priority, web_client))
+
+    def _get_bucket(self, buckets: Dict[str, TokenBucket], key: str, rate: float, burst: float) -> TokenBucket:
+        bucket = buckets.get(key)
+        if bucket is None:
+            bucket = buckets[key] = TokenBucket(rate, burst)
+        return bucket
+
+    def _channel_bucket(self, channel: str) -> TokenBucket:
+        return self._get_bucket(self._channel_buckets, channel, self.channel_rate, self.channel_burst)
+
+    def _method_bucket(self, method: str) -> TokenBucket:
+        return self._get_bucket(self._method_buckets, method, self.method_rate, self.method_burst)
+
+    async def _dispatch(self) -> None:
+        assert self._wakeup is not None
+        while True:
+            self._wakeup.clear()
+            wait: Optional[float] = None
+            method_delay = self._method_bucket(POST_MESSAGE).delay()
+            for request in sorted(self._pending):
+                if request.channel in self._busy_channels:
+                    continue
+                delay = max(method_delay, self._channel_bucket(request.channel).delay())
+                if delay > 0.0:
+                    wait = delay if wait is None else min(wait, delay)
+                    continue
+
+                self._pending.remove(request)
+                heapq.heapify(self._pending)
+                if self._tails.get((request.channel, request.thread_ts)) is request:
+                    del self._tails[(request.channel, request.thread_ts)]
+                self._busy_channels.add(request.channel)
+                self._channel_bucket(request.channel).take()
+                self._method_bucket(POST_MESSAGE).take()
+                send = asyncio.create_task(self._send(request))
+                self._sends.add(send)
+                send.add_done_callback(self._sends.discard)
+                break
+            else:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), wait)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def _send(self, request: _Request) -> None:
+        assert self.web_client is not None
+        retry = False
+        started = time.perf_counter()
+        if request.context is not None:
+            request.context.run(record_timing, "send_queue", started - request.queued_at)
+        try:
+            result = await self.web_client.chat_postMessage(
+                text="\n".join(request.texts), channel=request.channel, thread_ts=request.thread_ts
+            )
+            if request.context is not None:
+                request.context.run(record_timing, "slack_api", time.perf_counter() - started, method=POST_MESSAGE)
+            self.sent += 1
+            for future in request.futures:
+                if not future.done():
+                    future.set_result(result)
+        except slack.errors.SlackApiError as e:
+            if e.response.status_code != 429 or request.attempts >= self.max_retries:
+                self._fail(request, e)
+            else:
+                self.rate_limited += 1
+                request.attempts += 1
+                retry_after = float(e.response.headers.get("Retry-After", 1))
+                self._channel_bucket(request.channel).pause(retry_after)
+                self._method_bucket(POST_MESSAGE).pause(retry_after)
+                heapq.heappush(self._pending, request)
+                retry = True
+        except Exception as e:
+            self._fail(request, e)
+        finally:
+            self._busy_channels.discard(request.channel)
+            if not retry and self._queue_slots is not None:
+                self._queue_slots.release()
+            if self._wakeup is not None:
+                self._wakeup.set()
+
+    def _fail(self, request: _Request, error: Exception) -> None:
+        for future in request.futures:
+            if not future.done():
+                future.set_exception(error)
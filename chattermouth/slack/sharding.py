@@ -0,0 +1,371 @@
+"""Spreading Slack conversations over several worker processes.
+
+One ingest process receives the RTM events and forwards each one to the worker process which owns its conversation,
+chosen by hashing the user and thread. Every message of a conversation therefore reaches the same
+`SlackInteractionContext` in the same process, in the order it was received. Workers make their Web API calls through
+the ingest process, so every message is still sent through one shared `SlackSendScheduler` which sees every channel.
+"""
+
+import asyncio
+import atexit
+import itertools
+import logging
+import multiprocessing
+import os
+import pickle
+import threading
+import zlib
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import slack
+import slack.errors
+
+from .sending import SlackSendScheduler, SlackWebClient
+
+_logger = logging.getLogger(__name__)
+
+_POST_MESSAGE = "post_message"
+
+
+def get_shard(user: str, thread_ts: str, shards: int) -> int:
+    """Get the shard which owns a conversation.
+
+    >>> get_shard("U0123", "1593561600.000100", 4) == get_shard("U0123", "1593561600.000100", 4)
+    True
+
+    Args:
+        user: The ID of the user who started the conversation.
+        thread_ts: The `ts` of the conversation's thread.
+        shards: The number of shards.
+    """
+    # crc32 is stable across processes, unlike `hash` of a string.
+    return zlib.crc32(f"{user}:{thread_ts}".encode("utf-8")) % shards
+
+
+def _get_conversation(data: dict) -> Optional[Tuple[str, str]]:
+    subtype = data.get("subtype")
+    if subtype is None:
+        return data["user"], data.get("thread_ts", data["ts"])
+    if subtype == "message_deleted":
+        previous = data["previous_message"]
+        return previous["user"], previous.get("thread_ts", data["ts"])
+    return None
+
+
+class ShardedSlackInteractionFactory:
+    """A `SlackInteractionFactory` replacement which runs interactions in several worker processes.
+
+    Each worker runs its own `SlackInteractionFactory`, which is passed `factory_kwargs`. Limits such as
+    `max_interactions` therefore apply per worker.
+
+    Workers are started with the `spawn` method by default, so `callback` and `factory_kwargs` must be picklable, eg.
+    `callback` must be a module level function, and the main module must be importable without side effects. Workers
+    aren't daemons, so callbacks can start processes of their own. Call `close` to stop them, workers which are still
+    running when the interpreter exits are terminated.
+
+    Errors of Web API calls made by workers are raised in the worker with their original type where possible, and
+    `slack.errors.SlackApiError`s keep the status code, headers and data of their response.
+
+    ## Example
+    ```python
+    async def on_message():
+        print("Someone said", str(await chattermouth.listen()))
+
+    async def main():
+        client = slack.RTMClient(token = "xoxb-1234ABC...", run_async = True)
+        factory = chattermouth.slack.ShardedSlackInteractionFactory(client, callback = on_message, shards = 4)
+        try:
+            await client.start()
+        finally:
+            await factory.close()
+
+    if __name__ == "__main__":
+        asyncio.run(main())
+    ```
+
+    Args:
+        rtm_client: An RTM client constructed with `run_async` enabled.
+        callback: The callback each worker calls for each new message.
+        shards: The number of worker processes, defaults to the number of CPUs.
+        send_scheduler: The scheduler every worker sends messages through, by default a new `SlackSendScheduler`.
+        mp_context: The `multiprocessing` context used to start the workers.
+        drain_timeout: The number of seconds workers wait for interactions to finish when closing, see
+            `SlackInteractionFactory.drain`.
+        factory_kwargs: Extra arguments passed to each worker's `SlackInteractionFactory`.
+    """
+
+    def __init__(
+        self,
+        rtm_client: slack.RTMClient,
+        callback: Callable[[], Any],
+        shards: Optional[int] = None,
+        send_scheduler: Optional[SlackSendScheduler] = None,
+        mp_context: Optional[multiprocessing.context.BaseContext] = None,
+        drain_timeout: Optional[float] = None,
+        **factory_kwargs: Any,
+    ) -> None:
+        rtm_client.on(event="message", callback=self._on_message)
+        shards = shards or os.cpu_count() or 1
+        mp_context = mp_context or multiprocessing.get_context("spawn")
+
+        self.shards: int = shards
+        """The number of worker processes."""
+
+        self.send_scheduler: SlackSendScheduler = send_scheduler if send_scheduler is not None else SlackSendScheduler()
+        """The scheduler every worker sends messages through."""
+
+        self.web_client: Optional[SlackWebClient] = None
+        """The client worker requests are made with, the first one passed with an event."""
+
+        self.dispatched_events: int = 0
+        """The number of events forwarded to workers."""
+
+        self._inboxes: List[multiprocessing.Queue] = [mp_context.Queue() for _ in range(shards)]
+        self._outbox: multiprocessing.Queue = mp_context.Queue()
+        self._workers = [
+            mp_context.Process(
+                target=_run_worker,
+                args=(
+                    shard,
+                    self._inboxes[shard],
+                    self._outbox,
+                    callback,
+                    self.send_scheduler.coalesce,
+                    drain_timeout,
+                    factory_kwargs,
+                ),
+                name=f"chattermouth-shard-{shard}",
+            )
+            for shard in range(shards)
+        ]
+        for worker in self._workers:
+            worker.start()
+        atexit.register(self._terminate_workers)
+        self._reader: Optional[threading.Thread] = None
+
+    async def close(self) -> None:
+        """Drain every worker, wait for them to exit and stop serving their requests."""
+        for inbox in self._inboxes:
+            inbox.put(None)
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(loop.run_in_executor(None, worker.join) for worker in self._workers))
+        atexit.unregister(self._terminate_workers)
+        if self._reader is not None:
+            self._outbox.put(None)
+            await loop.run_in_executor(None, self._reader.join)
+            self._reader = None
+
+    async def _on_message(self, web_client: SlackWebClient, data: dict, **payload) -> None:
+        if self.web_client is None:
+            self.web_client = web_client
+        if self._reader is None:
+            self._reader = threading.Thread(
+                target=self._read_requests, args=(asyncio.get_running_loop(),), name="chattermouth-shards", daemon=True
+            )
+            self._reader.start()
+
+        conversation = _get_conversation(data)
+        if conversation is None:
+            return
+        self.dispatched_events += 1
+        self._inboxes[get_shard(*conversation, self.shards)].put(("event", data))
+
+    def _read_requests(self, loop: asyncio.AbstractEventLoop) -> None:
+        while True:
+            request = self._outbox.get()
+            if request is None:
+                return
+            loop.call_soon_threadsafe(lambda request=request: asyncio.ensure_future(self._serve_request(*request)))
+
+    async def _serve_request(self, shard: int, request_id: int, method: str, kwargs: Dict[str, Any]) -> None:
+        try:
+            if method == _POST_MESSAGE:
+                result = await self.send_scheduler.post_message(web_client=self.web_client, **kwargs)
+            else:
+                result = await getattr(self.web_client, method)(**kwargs)
+        except Exception as e:
+            self._inboxes[shard].put(("response", request_id, None, _encode_error(e)))
+        else:
+            # `slack.web.slack_response.SlackResponse`s can't be pickled, their data can.
+            self._inboxes[shard].put(("response", request_id, getattr(result, "data", result), None))
+
+    def _terminate_workers(self) -> None:
+        # Without the ingest process's event loop, workers which weren't closed can't make any requests.
+        for worker in self._workers:
+            if worker.is_alive():
+                worker.terminate()
+            worker.join()
+
+
+class _RemoteResponse:
+    """A picklable stand-in for the `slack.web.slack_response.SlackResponse` of a failed request."""
+
+    def __init__(self, data: Any, status_code: Optional[int], headers: Dict[str, str]) -> None:
+        self.data = data
+        self.status_code = status_code
+        self.headers = headers
+
+    def __getitem__(self, key: str) -> Any:
+        return self.data[key]
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self.data.get(key, default) if isinstance(self.data, dict) else default
+
+    def __str__(self) -> str:
+        return str(self.data)
+
+
+# An error sent to a worker, tagged with how it's rebuilt, see `_decode_error`.
+_RemoteError = Tuple[Any, ...]
+
+
+def _encode_error(error: Exception) -> _RemoteError:
+    if isinstance(error, slack.errors.SlackApiError):
+        response = error.response
+        remote = _RemoteResponse(
+            getattr(response, "data", None),
+            getattr(response, "status_code", None),
+            dict(getattr(response, "headers", None) or {}),
+        )
+        return ("api", str(error), remote)
+    try:
+        # Queues pickle in a background thread which drops what it can't pickle, so check first.
+        pickle.loads(pickle.dumps(error))
+    except Exception:
+        return ("client", f"{type(error).__name__}: {error}")
+    return ("raised", error)
+
+
+def _decode_error(error: _RemoteError) -> Exception:
+    kind, *args = error
+    if kind == "raised":
+        return args[0]
+    if kind == "api":
+        message, response = args
+        # `SlackApiError.__init__` would append the response to the message a second time.
+        api_error = slack.errors.SlackApiError.__new__(slack.errors.SlackApiError)
+        Exception.__init__(api_error, message)
+        api_error.response = response
+        return api_error
+    return slack.errors.SlackClientError(args[0])
+
+
+class _ParentConnection:
+    """The worker's side of the channel to the ingest process."""
+
+    def __init__(self, shard: int, outbox: multiprocessing.Queue) -> None:
+        self._shard = shard
+        self._outbox = outbox
+        self._ids = itertools.count()
+        self._pending: Dict[int, asyncio.Future] = {}
+
+    def call(self, method: str, **kwargs: Any) -> "asyncio.Future[dict]":
+        future = asyncio.get_running_loop().create_future()
+        request_id = next(self._ids)
+        self._pending[request_id] = future
+        self._outbox.put((self._shard, request_id, method, kwargs))
+        return future
+
+    def resolve(self, request_id: int, result: Optional[dict], error: Optional[_RemoteError]) -> None:
+        future = self._pending.pop(request_id, None)
+        if future is None or future.done():
+            return
+        if error is None:
+            future.set_result(result)
+        else:
+            future.set_exception(_decode_error(error))
+
+
+class _InboxRTMClient:
+    """A stand-in for the worker factory's `slack.RTMClient`, events arrive through the worker's inbox instead."""
+
+    def on(self, *, event: str, callback: Callable[..., Any]) -> None:
+        pass
+
+
+class _RemoteWebClient:
+    """A stand-in for `slack.WebClient` in a worker, which makes its calls through the ingest process."""
+
+    def __init__(self, connection: _ParentConnection) -> None:
+        self._connection = connection
+
+    def chat_postMessage(self, *, channel: str, **kwargs: Any) -> "asyncio.Future[dict]":
+        return self._connection.call("chat_postMessage", channel=channel, **kwargs)
+
+    def users_info(self, *, user: str, **kwargs: Any) -> "asyncio.Future[dict]":
+        return self._connection.call("users_info", user=user, **kwargs)
+
+    def users_list(self, **kwargs: Any) -> "asyncio.Future[dict]":
+        return self._connection.call("users_list", **kwargs)
+
+    def __getattr__(self, method: str) -> Callable[..., "asyncio.Future[dict]"]:
+        if method.startswith("_"):
+            raise AttributeError(method)
+        return lambda **kwargs: self._connection.call(method, **kwargs)
+
+
+class _RemoteSendScheduler(SlackSendScheduler):
+    """Hands messages to the ingest process's `SlackSendScheduler` instead of sending them from the worker."""
+
+    def __init__(self, connection: _ParentConnection, coalesce: bool) -> None:
+        super().__init__(coalesce=coalesce)
+        self._connection = connection
+
+    async def queue_message(
+        self,
+        channel: str,
+        text: str,
+        thread_ts: Optional[str] = None,
+        priority: int = 0,
+        web_client: Optional[SlackWebClient] = None,
+    ) -> "asyncio.Future[dict]":
+        return self._connection.call(_POST_MESSAGE, channel=channel, text=text, thread_ts=thread_ts, priority=priority)
+
+
+def _run_worker(
+    shard: int,
+    inbox: multiprocessing.Queue,
+    outbox: multiprocessing.Queue,
+    callback: Callable[[], Any],
+    coalesce: bool,
+    drain_timeout: Optional[float],
+    factory_kwargs: Dict[str, Any],
+) -> None:
+    asyncio.run(_serve_shard(shard, inbox, outbox, callback, coalesce, drain_timeout, factory_kwargs))
+
+
+async def _serve_shard(
+    shard: int,
+    inbox: multiprocessing.Queue,
+    outbox: multiprocessing.Queue,
+    callback: Callable[[], Any],
+    coalesce: bool,
+    drain_timeout: Optional[float],
+    factory_kwargs: Dict[str, Any],
+) -> None:
+    from . import SlackInteractionFactory
+
+    loop = asyncio.get_running_loop()
+    connection = _ParentConnection(shard, outbox)
+    web_client = _RemoteWebClient(connection)
+    factory = SlackInteractionFactory(
+        _InboxRTMClient(),  # type: ignore
+        callback,
+        send_scheduler=_RemoteSendScheduler(connection, coalesce),
+        **factory_kwargs,
+    )
+
+    drained: Optional[asyncio.Future] = None
+    while True:
+        item = await loop.run_in_executor(None, inbox.get)
+        if item is None:
+            if drained is not None:
+                return
+            # Keep serving responses while the interactions finish, then wake this loop up to exit.
+            drained = asyncio.ensure_future(factory.drain(drain_timeout))
+            drained.add_done_callback(lambda _: inbox.put(None))
+        elif item[0] == "event":
+            # Routing happens before the handler's first suspension point, so events are routed in order.
+            asyncio.ensure_future(factory._on_message(web_client=web_client, data=item[1]))
+        else:
+            connection.resolve(*item[1:])
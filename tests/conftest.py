@@ -0,0 +1,28 @@
+"""Skip the tests of the optional extras which aren't installed.
+
+The test modules import the extras at the top, so they're left out of collection instead of calling
+`pytest.importorskip` before their imports.
+"""
+
+import importlib.util
+from typing import Dict, List
+
+_EXTRA_TESTS: Dict[str, List[str]] = {
+    "spacy": [
+        "test_batch.py",
+        "test_classification.py",
+        "test_feedback.py",
+        "test_lexicon.py",
+        "test_model_cache.py",
+        "test_result_cache.py",
+        "test_service.py",
+        "test_similarity.py",
+        "test_training.py",
+        "test_workers.py",
+    ],
+    "slack": ["test_sending.py", "test_sharding.py", "test_slack.py"],
+}
+
+collect_ignore = [
+    path for module, paths in _EXTRA_TESTS.items() if importlib.util.find_spec(module) is None for path in paths
+]
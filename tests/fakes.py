@@ -0,0 +1,140 @@
+"""Small stand-ins for spaCy pipelines and the Slack clients, so tests don't need a model or a workspace."""
+
+import asyncio
+import itertools
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+SCORES = {
+    "yes": {"YES": 0.9, "NO": 0.1, "QUESTION": 0.0},
+    "no": {"YES": 0.1, "NO": 0.9, "QUESTION": 0.0},
+    "why?": {"YES": 0.0, "NO": 0.0, "QUESTION": 0.9},
+}
+
+
+def score(text: str) -> Dict[str, float]:
+    """Score a text the way every `FakePipeline` does."""
+    return dict(SCORES.get(text.strip().lower(), {"YES": 0.0, "NO": 0.0, "QUESTION": 0.0}))
+
+
+class FakeDoc:
+    def __init__(self, text: str) -> None:
+        self.text = text
+        self.cats: Dict[str, float] = {}
+
+
+class FakeTokenizer:
+    def __call__(self, text: str) -> FakeDoc:
+        return FakeDoc(text)
+
+    def pipe(self, texts: Iterable[str], batch_size: int = 128) -> Iterator[FakeDoc]:
+        return (FakeDoc(text) for text in texts)
+
+
+class FakeTextcat:
+    """A `textcat` stand-in which reads ahead `batch_size` documents like spaCy's components do."""
+
+    def __init__(self, pipeline: "FakePipeline") -> None:
+        self.pipeline = pipeline
+
+    def __call__(self, doc: FakeDoc) -> FakeDoc:
+        self.pipeline.scored.append(doc.text)
+        doc.cats = score(doc.text)
+        return doc
+
+    def pipe(self, docs: Iterable[FakeDoc], batch_size: int = 128) -> Iterator[FakeDoc]:
+        docs = iter(docs)
+        while True:
+            batch = list(itertools.islice(docs, batch_size))
+            if not batch:
+                return
+            yield from (self(doc) for doc in batch)
+
+
+class FakePipeline:
+    """A `spacy.language.Language` stand-in with a single `textcat` component."""
+
+    def __init__(self) -> None:
+        self.tokenizer = FakeTokenizer()
+        self.pipeline = [("textcat", FakeTextcat(self))]
+        self.scored: List[str] = []
+        """The text of every document scored, in order."""
+
+    @property
+    def pipe_names(self) -> List[str]:
+        return [name for name, _ in self.pipeline]
+
+    def make_doc(self, text: str) -> FakeDoc:
+        return self.tokenizer(text)
+
+    def __call__(self, text: str) -> FakeDoc:
+        doc = self.make_doc(text)
+        for _, proc in self.pipeline:
+            doc = proc(doc)
+        return doc
+
+    def pipe(self, texts: Iterable[str], batch_size: int = 128, n_process: int = 1) -> Iterator[FakeDoc]:
+        docs = self.tokenizer.pipe(texts, batch_size)
+        for _, proc in self.pipeline:
+            docs = proc.pipe(docs, batch_size)
+        return docs
+
+
+def load_fake_pipeline() -> FakePipeline:
+    """A picklable pipeline loader for worker processes."""
+    return FakePipeline()
+
+
+class FakeWebClient:
+    """A `slack.WebClient` stand-in which records posts.
+
+    Args:
+        on_post: Called with the arguments of every `chat_postMessage` call.
+    """
+
+    def __init__(self, on_post: Optional[Callable[[Dict[str, Any]], None]] = None) -> None:
+        self.on_post = on_post
+        self.posts: List[Dict[str, Any]] = []
+        self._ts = itertools.count(1)
+
+    def next_ts(self) -> str:
+        return f"1600000000.{next(self._ts):06d}"
+
+    async def chat_postMessage(self, **kwargs: Any) -> Dict[str, Any]:
+        ts = self.next_ts()
+        self.posts.append(kwargs)
+        if self.on_post is not None:
+            self.on_post(kwargs)
+        return {"ok": True, "ts": ts, "message": {"ts": ts, "text": kwargs["text"]}}
+
+    async def users_info(self, user: str) -> Dict[str, Any]:
+        return {"ok": True, "user": {"id": user, "profile": {"real_name": f"User {user}"}}}
+
+
+class FakeRTMClient:
+    """A `slack.RTMClient` stand-in which delivers events to the registered `message` handlers."""
+
+    def __init__(self, web_client: FakeWebClient) -> None:
+        self.web_client = web_client
+        self.handlers: List[Callable[..., Any]] = []
+
+    def on(self, *, event: str, callback: Callable[..., Any]) -> None:
+        assert event == "message"
+        self.handlers.append(callback)
+
+    def event(self, user: str, text: str, thread_ts: Optional[str] = None, channel: str = "C1") -> Dict[str, Any]:
+        data = {"type": "message", "user": user, "channel": channel, "text": text, "ts": self.web_client.next_ts()}
+        if thread_ts is not None:
+            data["thread_ts"] = thread_ts
+        return data
+
+    async def send(self, data: Dict[str, Any]) -> None:
+        for handler in self.handlers:
+            await handler(web_client=self.web_client, data=data)
+
+
+async def settle(seconds: float = 0.0) -> None:
+    """Let the tasks scheduled so far run."""
+    for _ in range(5):
+        await asyncio.sleep(0)
+    if seconds:
+        await asyncio.sleep(seconds)
@@ -0,0 +1,39 @@
+import io
+import json
+
+from chattermouth.nlp import Category
+from chattermouth.nlp.batch import classify_stream, run
+from chattermouth.nlp.lexicon import Lexicon
+from tests.fakes import FakePipeline
+
+
+def test_results_are_in_order():
+    lexicon = Lexicon([("sure", {Category.YES})])
+    records = [({"id": index}, text) for index, text in enumerate(["why?", "sure", "no", "sure", "yes"])]
+    results = list(classify_stream(FakePipeline(), records, lexicon, batch_size=2))
+    assert [record["id"] for record, _, _ in results] == [0, 1, 2, 3, 4]
+    assert [max(cats, key=cats.get) for _, _, cats in results] == ["QUESTION", "YES", "NO", "YES", "YES"]
+
+
+def test_runs_of_lexicon_hits_are_not_buffered():
+    lexicon = Lexicon([("sure", {Category.YES})])
+    read = 0
+
+    def records():
+        nonlocal read
+        for text in ["why?"] + ["sure"] * 10000 + ["no"]:
+            read += 1
+            yield {}, text
+
+    results = classify_stream(FakePipeline(), records(), lexicon, batch_size=2)
+    next(results)
+    assert read < 100
+    assert sum(1 for _ in results) == 10001
+
+
+def test_run_writes_one_line_per_record():
+    output = io.StringIO()
+    stats = run(FakePipeline(), io.StringIO('{"text": "yes"}\nnot json\n{"text": "why?"}\n'), output, jsonl=True)
+    lines = [json.loads(line) for line in output.getvalue().splitlines()]
+    assert [line["decision"] for line in lines] == ["YES", None]
+    assert (stats["classified"], stats["skipped"], stats["YES"], stats["none"]) == (2, 1, 1, 1)
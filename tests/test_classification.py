@@ -0,0 +1,77 @@
+import asyncio
+import os
+
+from chattermouth.cli import CliInteractionContext
+from chattermouth.core import enter_interaction_context
+from chattermouth.nlp import (
+    Category,
+    ask_and_classify,
+    classify,
+    classify_many,
+    classify_many_async,
+    enter_classification_cache,
+    enter_lexicon,
+    enter_spacy_pipeline,
+)
+from chattermouth.nlp.lexicon import Lexicon
+from tests.fakes import FakePipeline
+
+
+def test_classify_scores_the_requested_categories():
+    with enter_spacy_pipeline(FakePipeline()), enter_lexicon(None), enter_classification_cache(None):
+        classification = classify("why?", [Category.QUESTION, Category.YES])
+
+    assert set(classification.scores) == {Category.QUESTION, Category.YES}
+    assert classification.best is Category.QUESTION
+    assert Category.YES not in classification
+
+
+def test_classify_many_only_runs_texts_missing_from_the_lexicon():
+    nlp = FakePipeline()
+    lexicon = Lexicon([("sure", {Category.YES})])
+    with enter_spacy_pipeline(nlp), enter_lexicon(lexicon), enter_classification_cache(None):
+        classifications = classify_many(["why?", "sure", "no", "banana split"])
+
+    assert [classification.best for classification in classifications] == [
+        Category.QUESTION,
+        Category.YES,
+        Category.NO,
+        None,
+    ]
+    assert nlp.scored == ["why?", "no", "banana split"]
+
+
+def test_classify_many_async_keeps_the_order():
+    nlp = FakePipeline()
+
+    async def main():
+        with enter_spacy_pipeline(nlp), enter_lexicon(None), enter_classification_cache(None):
+            return await classify_many_async(["no", "yes", "why?"], threshold=0.5)
+
+    classifications = asyncio.run(main())
+    assert [classification.best for classification in classifications] == [Category.NO, Category.YES, Category.QUESTION]
+    assert nlp.scored == ["no", "yes", "why?"]
+
+
+def test_ask_and_classify_classifies_the_reply():
+    read_fd, write_fd = os.pipe()
+    stdin, script = open(read_fd, "r", encoding="utf-8"), open(write_fd, "w", encoding="utf-8")
+    read_fd, write_fd = os.pipe()
+    replies, stdout = open(read_fd, "r", encoding="utf-8"), open(write_fd, "w", encoding="utf-8")
+    script.write("why?\n")
+    script.close()
+
+    async def main():
+        with enter_interaction_context(CliInteractionContext(stdin, stdout)), enter_spacy_pipeline(FakePipeline()):
+            with enter_lexicon(None), enter_classification_cache(None):
+                return await ask_and_classify("Shall I apply the change? ")
+
+    try:
+        classification = asyncio.run(main())
+        stdout.close()
+        assert replies.read() == "Shall I apply the change? "
+    finally:
+        for stream in (stdin, replies, stdout):
+            stream.close()
+    assert classification.text == "why?"
+    assert classification.best is Category.QUESTION
@@ -0,0 +1,132 @@
+import asyncio
+import fcntl
+import io
+import os
+import subprocess
+import sys
+import textwrap
+
+import pytest
+
+from chattermouth.cli import CliInteractionContext, CliMessage
+from chattermouth.core import InteractionTimeoutError, Observer, enter_observer
+
+
+def _pipe():
+    read_fd, write_fd = os.pipe()
+    return open(read_fd, "r", encoding="utf-8"), open(write_fd, "w", encoding="utf-8")
+
+
+def _is_blocking(stream) -> bool:
+    return not fcntl.fcntl(stream.fileno(), fcntl.F_GETFL) & os.O_NONBLOCK
+
+
+def test_pipes_are_left_blocking():
+    stdin, script = _pipe()
+    replies, stdout = _pipe()
+    script.write("yes\nno\n")
+    script.close()
+
+    async def main():
+        context = CliInteractionContext(stdin, stdout)
+        first = await context.ask("Do you like apple pie? ")
+        await context.tell("Noted")
+        second = await context.listen()
+        return str(first), str(second)
+
+    try:
+        assert asyncio.run(main()) == ("yes", "no")
+        assert _is_blocking(stdin) and _is_blocking(stdout)
+        stdout.close()
+        assert replies.read() == "Do you like apple pie? Noted\n"
+    finally:
+        for stream in (stdin, replies, stdout):
+            stream.close()
+
+
+def test_input_arriving_after_a_timeout_is_discarded():
+    stdin, script = _pipe()
+    replies, stdout = _pipe()
+
+    async def main():
+        context = CliInteractionContext(stdin, stdout)
+        with pytest.raises(InteractionTimeoutError):
+            await context.listen(timeout=0.05)
+        script.write("too late\n")
+        script.flush()
+        await asyncio.sleep(0.05)
+
+        asking = asyncio.ensure_future(context.ask("Still there? ", timeout=1.0))
+        await asyncio.sleep(0.05)
+        script.write("yes\n")
+        script.flush()
+        return str(await asking)
+
+    try:
+        assert asyncio.run(main()) == "yes"
+    finally:
+        for stream in (stdin, script, replies, stdout):
+            stream.close()
+
+
+def test_process_exits_with_a_read_abandoned_by_a_timeout():
+    script = textwrap.dedent(
+        """
+        import asyncio
+
+        from chattermouth.cli import CliInteractionContext
+        from chattermouth.core import InteractionTimeoutError
+
+        async def main():
+            try:
+                await CliInteractionContext().listen(timeout=0.05)
+            except InteractionTimeoutError:
+                pass
+
+        asyncio.run(main())
+        """
+    )
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(path or os.curdir for path in sys.path))
+    # Nothing is ever written to the process's input, which stays open until it exits.
+    process = subprocess.Popen([sys.executable, "-c", script], stdin=subprocess.PIPE, env=env)
+    try:
+        assert process.wait(timeout=60) == 0
+    finally:
+        process.kill()
+        process.stdin.close()
+
+
+class _Recorder(Observer):
+    def __init__(self):
+        self.events = []
+
+    def observe(self, event):
+        self.events.append(event)
+
+
+def test_contexts_used_directly_are_measured():
+    stdin, script = _pipe()
+    replies, stdout = _pipe()
+    script.write("yes\n")
+    script.close()
+    recorder = _Recorder()
+
+    async def main():
+        context = CliInteractionContext(stdin, stdout)
+        with enter_observer(recorder):
+            await context.ask("Do you like apple pie? ")
+        return context
+
+    try:
+        context = asyncio.run(main())
+    finally:
+        for stream in (stdin, replies, stdout):
+            stream.close()
+    assert sorted(event.name for event in recorder.events) == ["ask", "listen"]
+    assert {(event.backend, event.interaction) for event in recorder.events} == {("cli", context.interaction_id)}
+
+
+def test_messages_users_and_contexts_have_no_instance_dict():
+    message = CliMessage("hi")
+    for slotted in (message, message.user, CliInteractionContext(io.StringIO(), io.StringIO())):
+        assert not hasattr(slotted, "__dict__"), type(slotted).__name__
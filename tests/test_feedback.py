@@ -0,0 +1,144 @@
+import asyncio
+import threading
+from typing import Any, Dict, List
+
+import pytest
+
+from chattermouth.nlp import (
+    Category,
+    FeedbackStore,
+    OnlineTrainer,
+    enter_feedback_store,
+    feedback,
+    record_feedback_async,
+)
+from chattermouth.nlp.training import TRAINING_DATA, get_model_generation
+from tests.fakes import FakePipeline
+
+
+def test_feedback_is_written_off_the_event_loop(tmp_path, monkeypatch):
+    store = FeedbackStore(tmp_path / "feedback.jsonl")
+    writers = []
+    record = store.record
+    monkeypatch.setattr(store, "record", lambda *args: writers.append(threading.current_thread()) or record(*args))
+
+    async def main():
+        with enter_feedback_store(store):
+            await record_feedback_async("yup", {Category.YES})
+        return threading.current_thread()
+
+    loop_thread = asyncio.run(main())
+    assert writers and writers[0] is not loop_thread
+    assert store.read() == ([("yup", frozenset({Category.YES}))], len('{"text": "yup", "categories": ["YES"]}\n'))
+
+
+class FakeFineTunedTextcat:
+    def __init__(self, weights: bytes = b"") -> None:
+        self.cfg: Dict[str, Any] = {"exclusive_classes": False}
+        self.weights = weights
+        self.trained_on: List[str] = []
+
+    def __call__(self, doc: Any) -> Any:
+        return doc
+
+    def to_bytes(self) -> bytes:
+        return self.weights
+
+    def from_bytes(self, data: bytes) -> "FakeFineTunedTextcat":
+        self.weights = data
+        return self
+
+    def create_optimizer(self) -> object:
+        return object()
+
+    def update(self, docs, golds, sgd, drop, losses) -> None:
+        self.trained_on.extend(doc.text for doc in docs)
+
+
+class FakeFineTuningPipeline(FakePipeline):
+    """A pipeline whose `textcat` records the texts it's fine-tuned on."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.pipeline = [("textcat", FakeFineTunedTextcat(b"initial"))]
+
+    def get_pipe(self, name: str) -> Any:
+        return dict(self.pipeline)[name]
+
+    def create_pipe(self, name: str, config: Dict[str, Any]) -> FakeFineTunedTextcat:
+        return FakeFineTunedTextcat()
+
+    def replace_pipe(self, name: str, component: Any) -> None:
+        self.pipeline = [(key, component if key == name else proc) for key, proc in self.pipeline]
+
+
+@pytest.fixture(autouse=True)
+def gold_parse(monkeypatch):
+    monkeypatch.setattr(feedback, "GoldParse", lambda doc, cats: (doc, cats))
+
+
+def test_updates_fine_tune_a_copy_and_swap_it_in(tmp_path):
+    nlp = FakeFineTuningPipeline()
+    original = nlp.get_pipe("textcat")
+    store = FeedbackStore(tmp_path / "feedback.jsonl")
+    trainer = OnlineTrainer(nlp, store, min_examples=2, epochs=1, rehearsal=0.0)
+    generation = get_model_generation(nlp)
+
+    async def main():
+        store.record("yup yup", {Category.YES})
+        assert not await trainer.update()
+        store.record("nope nope", {Category.NO})
+        return await trainer.update()
+
+    assert asyncio.run(main())
+    textcat = nlp.get_pipe("textcat")
+    assert textcat is not original and textcat.weights == b"initial"
+    assert sorted(textcat.trained_on) == ["nope nope", "yup yup"]
+    assert original.trained_on == []
+    assert (trainer.updates, trainer.examples_learnt) == (1, 2)
+    assert get_model_generation(nlp) != generation
+
+
+def test_updates_rehearse_the_training_data(tmp_path):
+    nlp = FakeFineTuningPipeline()
+    store = FeedbackStore(tmp_path / "feedback.jsonl")
+    store.record("yup yup", {Category.YES})
+    store.record("nope nope", {Category.NO})
+    trainer = OnlineTrainer(nlp, store, epochs=2, rehearsal=1.5)
+
+    assert asyncio.run(trainer.update())
+    trained_on = nlp.get_pipe("textcat").trained_on
+    training_texts = {text for text, _ in TRAINING_DATA}
+    assert len(trained_on) == 2 * (2 + 3)
+    assert trained_on.count("yup yup") == trained_on.count("nope nope") == 2
+    assert all(text in training_texts for text in trained_on if text not in ("yup yup", "nope nope"))
+
+
+def test_stop_waits_for_a_running_update(tmp_path):
+    nlp = FakeFineTuningPipeline()
+    store = FeedbackStore(tmp_path / "feedback.jsonl")
+    store.record("yup yup", {Category.YES})
+    trainer = OnlineTrainer(nlp, store, rehearsal=0.0)
+    started, release = threading.Event(), threading.Event()
+    fine_tune = trainer._fine_tune
+
+    def slow_fine_tune(examples):
+        started.set()
+        release.wait(5.0)
+        return fine_tune(examples)
+
+    trainer._fine_tune = slow_fine_tune  # type: ignore
+
+    async def main():
+        trainer.start()
+        await asyncio.get_running_loop().run_in_executor(None, started.wait, 5.0)
+        stopping = asyncio.ensure_future(trainer.stop())
+        await asyncio.sleep(0.05)
+        stopped_early = stopping.done()
+        release.set()
+        await stopping
+        return stopped_early
+
+    assert not asyncio.run(main())
+    assert trainer.updates == 1
+    assert nlp.get_pipe("textcat").trained_on
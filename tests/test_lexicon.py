@@ -0,0 +1,22 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import chattermouth.nlp
+from chattermouth.nlp.lexicon import create_default_lexicon
+
+
+def test_lexicon_is_opt_in():
+    assert chattermouth.nlp.get_lexicon() is None
+
+
+def test_default_lexicon_leaves_unaligned_answers_to_the_model():
+    lexicon = create_default_lexicon()
+    assert "maybe" not in lexicon
+    assert "I don't know" not in lexicon
+    assert lexicon.lookup("Absolutely!")["YES"] == 1.0
+
+
+def test_counters_are_thread_safe():
+    lexicon = create_default_lexicon()
+    with ThreadPoolExecutor(8) as executor:
+        list(executor.map(lexicon.lookup, ["yes", "banana split"] * 5000))
+    assert (lexicon.hits, lexicon.misses) == (5000, 5000)
@@ -0,0 +1,42 @@
+import json
+
+import spacy
+
+from chattermouth.nlp import _find_default_model_name, model_cache
+
+MODEL = "en_core_web_sm"
+
+
+def _create_entry(cache_dir):
+    key = model_cache.get_pipeline_cache_key(MODEL)
+    entry = model_cache._get_entry_path(cache_dir, MODEL, key)
+    entry.mkdir(parents=True)
+    (entry / model_cache._KEY_FILE).write_text(json.dumps({"key": key}))
+    return entry
+
+
+def test_missing_entry_is_a_miss(tmp_path, monkeypatch):
+    monkeypatch.setenv("CHATTERMOUTH_CACHE_DIR", str(tmp_path))
+    assert model_cache.load_cached_pipeline(MODEL) is None
+
+
+def test_unloadable_entry_is_removed(tmp_path, monkeypatch):
+    monkeypatch.setenv("CHATTERMOUTH_CACHE_DIR", str(tmp_path))
+    entry = _create_entry(tmp_path)
+
+    def load(*args, **kwargs):
+        raise RuntimeError("corrupt entry")
+
+    monkeypatch.setattr(spacy, "load", load)
+    assert model_cache.load_cached_pipeline(MODEL) is None
+    assert not entry.exists()
+
+
+def test_linked_models_are_found(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(spacy.util, "is_package", lambda name: False)
+    monkeypatch.setattr(spacy.util, "get_data_path", lambda: tmp_path)
+    assert _find_default_model_name() is None
+
+    (tmp_path / "en_core_web_md").mkdir()
+    assert _find_default_model_name() == "en_core_web_md"
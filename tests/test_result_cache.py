@@ -0,0 +1,29 @@
+import asyncio
+
+import chattermouth.nlp
+from chattermouth.nlp import BatchingClassifier, ClassificationCache
+from chattermouth.nlp.training import invalidate_model_generation
+from tests.fakes import FakePipeline
+
+
+def test_cache_is_opt_in():
+    assert chattermouth.nlp.get_classification_cache() is None
+
+
+def test_results_are_keyed_on_the_service_pipeline():
+    async def main():
+        nlp = FakePipeline()
+        service = BatchingClassifier(nlp, max_wait=0.0)
+        with chattermouth.nlp.enter_classifier_service(service), chattermouth.nlp.enter_spacy_pipeline(FakePipeline()):
+            with chattermouth.nlp.enter_classification_cache(ClassificationCache()):
+                await chattermouth.nlp.get_category_scores_async("yes")
+                await chattermouth.nlp.get_category_scores_async("yes")
+                assert nlp.scored == ["yes"]
+
+                # Retraining the pipeline the service scores with makes its cached results unreachable.
+                invalidate_model_generation(nlp)
+                await chattermouth.nlp.get_category_scores_async("yes")
+                assert nlp.scored == ["yes", "yes"]
+        await service.close()
+
+    asyncio.run(main())
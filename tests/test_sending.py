@@ -0,0 +1,203 @@
+import asyncio
+from typing import Any, Dict, List
+
+import pytest
+import slack.errors
+
+from chattermouth.slack.sending import SlackSendScheduler
+from tests.fakes import FakeWebClient, settle
+
+
+def _unlimited(**kwargs: Any) -> SlackSendScheduler:
+    return SlackSendScheduler(channel_rate=1e9, channel_burst=1e9, method_rate=1e9, method_burst=1e9, **kwargs)
+
+
+class GatedWebClient(FakeWebClient):
+    """A web client whose posts wait until the gate is opened."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.gate = asyncio.Event()
+        self.in_flight = 0
+        self.most_in_flight = 0
+
+    async def chat_postMessage(self, **kwargs: Any) -> Dict[str, Any]:
+        self.in_flight += 1
+        self.most_in_flight = max(self.most_in_flight, self.in_flight)
+        try:
+            await self.gate.wait()
+            return await super().chat_postMessage(**kwargs)
+        finally:
+            self.in_flight -= 1
+
+
+class RateLimitedResponse:
+    status_code = 429
+    headers = {"Retry-After": "0.01"}
+
+
+class RateLimitedWebClient(FakeWebClient):
+    """A web client which is rate limited the first `limited` times it's called."""
+
+    def __init__(self, limited: int) -> None:
+        super().__init__()
+        self.limited = limited
+
+    async def chat_postMessage(self, **kwargs: Any) -> Dict[str, Any]:
+        if self.limited:
+            self.limited -= 1
+            raise slack.errors.SlackApiError("ratelimited", RateLimitedResponse())
+        return await super().chat_postMessage(**kwargs)
+
+
+def _texts(posts: List[Dict[str, Any]]) -> List[str]:
+    return [post["text"] for post in posts]
+
+
+def test_a_channel_has_one_message_in_flight_and_keeps_order():
+    async def main():
+        web_client = GatedWebClient()
+        scheduler = _unlimited(web_client=web_client)
+        sends = [scheduler.post_message("C1", str(index), "1.0") for index in range(5)]
+        await settle()
+        assert web_client.in_flight == 1
+        web_client.gate.set()
+        await asyncio.gather(*sends)
+        await scheduler.close()
+        return web_client
+
+    web_client = asyncio.run(main())
+    assert web_client.most_in_flight == 1
+    assert _texts(web_client.posts) == ["0", "1", "2", "3", "4"]
+
+
+def test_channels_are_sent_to_concurrently():
+    async def main():
+        web_client = GatedWebClient()
+        scheduler = _unlimited(web_client=web_client)
+        sends = [scheduler.post_message(f"C{index}", "hi") for index in range(3)]
+        await settle()
+        in_flight = web_client.in_flight
+        web_client.gate.set()
+        await asyncio.gather(*sends)
+        await scheduler.close()
+        return in_flight
+
+    assert asyncio.run(main()) == 3
+
+
+def test_lower_priorities_are_sent_first():
+    async def main():
+        web_client = GatedWebClient()
+        scheduler = _unlimited(web_client=web_client)
+        sends = [scheduler.post_message("C1", "first")]
+        await settle()
+        sends.append(scheduler.post_message("C1", "later", priority=1))
+        sends.append(scheduler.post_message("C1", "urgent", priority=-1))
+        await settle()
+        web_client.gate.set()
+        await asyncio.gather(*sends)
+        await scheduler.close()
+        return web_client
+
+    assert _texts(asyncio.run(main()).posts) == ["first", "urgent", "later"]
+
+
+def test_queued_messages_in_a_thread_are_coalesced():
+    async def main():
+        web_client = GatedWebClient()
+        scheduler = _unlimited(web_client=web_client, coalesce=True)
+        sends = [scheduler.post_message("C1", "a", "1.0")]
+        await settle()
+        sends += [scheduler.post_message("C1", text, "1.0") for text in ["b", "c"]]
+        sends.append(scheduler.post_message("C1", "elsewhere", "2.0"))
+        await settle()
+        web_client.gate.set()
+        results = await asyncio.gather(*sends)
+        await scheduler.close()
+        return web_client, scheduler, results
+
+    web_client, scheduler, results = asyncio.run(main())
+    assert _texts(web_client.posts) == ["a", "b\nc", "elsewhere"]
+    assert (scheduler.sent, scheduler.coalesced) == (3, 1)
+    assert results[1] is results[2]
+
+
+def test_channel_rate_is_respected():
+    async def main():
+        scheduler = SlackSendScheduler(FakeWebClient(), channel_rate=20.0, channel_burst=1.0)
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        await asyncio.gather(*(scheduler.post_message("C1", str(index)) for index in range(3)))
+        await scheduler.close()
+        return loop.time() - started
+
+    # The first message uses the burst, the other two wait 0.05 seconds each.
+    assert asyncio.run(main()) >= 0.09
+
+
+def test_rate_limited_messages_are_retried():
+    async def main():
+        web_client = RateLimitedWebClient(limited=2)
+        scheduler = _unlimited(web_client=web_client)
+        result = await scheduler.post_message("C1", "hi")
+        await scheduler.close()
+        return web_client, scheduler, result
+
+    web_client, scheduler, result = asyncio.run(main())
+    assert result["message"]["text"] == "hi"
+    assert _texts(web_client.posts) == ["hi"]
+    assert (scheduler.rate_limited, scheduler.sent) == (2, 1)
+
+
+def test_rate_limited_messages_fail_after_max_retries():
+    async def main():
+        scheduler = _unlimited(web_client=RateLimitedWebClient(limited=3), max_retries=2)
+        try:
+            with pytest.raises(slack.errors.SlackApiError):
+                await scheduler.post_message("C1", "hi")
+            # The failed message's queue slot was released, so the channel still works.
+            return await scheduler.post_message("C1", "again")
+        finally:
+            await scheduler.close()
+
+    assert asyncio.run(main())["message"]["text"] == "again"
+
+
+def test_queueing_waits_while_the_queue_is_full():
+    async def main():
+        web_client = GatedWebClient()
+        scheduler = _unlimited(web_client=web_client, max_queue_size=1, coalesce=True)
+        sending = await scheduler.queue_message("C1", "first")
+        queueing = asyncio.ensure_future(scheduler.queue_message("C2", "second"))
+        await settle()
+        full = not queueing.done()
+        web_client.gate.set()
+        await asyncio.gather(sending, await queueing)
+        await scheduler.close()
+        return full, web_client
+
+    full, web_client = asyncio.run(main())
+    assert full
+    assert _texts(web_client.posts) == ["first", "second"]
+
+
+def test_close_cancels_queued_messages_and_waits_for_sends():
+    async def main():
+        web_client = GatedWebClient()
+        scheduler = _unlimited(web_client=web_client)
+        sending = scheduler.post_message("C1", "sending")
+        queued = scheduler.post_message("C1", "queued")
+        await settle()
+        closing = asyncio.ensure_future(scheduler.close())
+        await settle()
+        assert queued.cancelled()
+        assert scheduler.queue_depth == 0
+        assert not closing.done()
+
+        web_client.gate.set()
+        await closing
+        assert sending.done()
+        return web_client
+
+    assert _texts(asyncio.run(main()).posts) == ["sending"]
@@ -0,0 +1,81 @@
+import asyncio
+
+from chattermouth.nlp.service import BatchingClassifier, ClassifierClosedError
+from tests.fakes import FakePipeline, settle
+
+
+class _GatedClassifier(BatchingClassifier):
+    """Runs batches only once `release` is set."""
+
+    def __init__(self, **kwargs):
+        super().__init__(FakePipeline(), **kwargs)
+        self.release = asyncio.Event()
+        self.started = asyncio.Event()
+
+    async def _execute(self, batch):
+        self.started.set()
+        await self.release.wait()
+        return await super()._execute(batch)
+
+
+def test_requests_are_batched():
+    async def main():
+        service = BatchingClassifier(FakePipeline(), max_batch_size=8, max_wait=0.05)
+        scores = await asyncio.gather(*(service.score(text) for text in ["yes", "no", "why?"]))
+        await service.close()
+        return service, scores
+
+    service, scores = asyncio.run(main())
+    assert [max(cats, key=cats.get) for cats in scores] == ["YES", "NO", "QUESTION"]
+    assert service.metrics.batches == 1
+    assert service.metrics.mean_batch_size == 3.0
+
+
+def test_mean_batch_size_excludes_abandoned_requests():
+    async def main():
+        service = BatchingClassifier(FakePipeline(), max_batch_size=8, max_wait=0.05)
+        kept = [asyncio.ensure_future(service.score(text)) for text in ["yes", "no"]]
+        abandoned = asyncio.ensure_future(service.score("why?"))
+        await settle()
+        abandoned.cancel()
+        await asyncio.gather(*kept)
+        await service.close()
+        return service.metrics
+
+    metrics = asyncio.run(main())
+    assert (metrics.requests, metrics.batched, metrics.batches) == (3, 2, 1)
+    assert metrics.mean_batch_size == 2.0
+
+
+def test_close_waits_for_running_batches():
+    async def main():
+        service = _GatedClassifier(max_batch_size=1, max_wait=0.0)
+        request = asyncio.ensure_future(service.score("yes"))
+        await service.started.wait()
+        closing = asyncio.ensure_future(service.close())
+        await settle(0.01)
+        assert not closing.done()
+
+        service.release.set()
+        await asyncio.wait_for(closing, 1.0)
+        assert request.done()
+        return request.result()
+
+    assert asyncio.run(main())["YES"] == 0.9
+
+
+def test_close_fails_waiting_requests():
+    async def main():
+        service = _GatedClassifier(max_batch_size=1, max_wait=0.0)
+        requests = [asyncio.ensure_future(service.score(text)) for text in ["yes", "no", "why?"]]
+        await service.started.wait()
+        closing = asyncio.ensure_future(service.close())
+        await settle()
+        service.release.set()
+        await closing
+        return await asyncio.gather(*requests, return_exceptions=True)
+
+    running, held, queued = asyncio.run(main())
+    assert running["YES"] == 0.9
+    assert isinstance(held, ClassifierClosedError)
+    assert isinstance(queued, ClassifierClosedError)
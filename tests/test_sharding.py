@@ -0,0 +1,57 @@
+import asyncio
+import multiprocessing
+import pickle
+
+import slack.errors
+
+import chattermouth
+from chattermouth.slack.sharding import ShardedSlackInteractionFactory, _decode_error, _encode_error, _RemoteResponse
+from tests.fakes import FakeRTMClient, FakeWebClient
+
+
+async def echo() -> None:
+    await chattermouth.tell(f"You said {await chattermouth.listen()}")
+
+
+def test_conversations_are_served_by_workers():
+    async def main():
+        replied = asyncio.Event()
+        web_client = FakeWebClient(on_post=lambda post: replied.set())
+        rtm = FakeRTMClient(web_client)
+        factory = ShardedSlackInteractionFactory(rtm, echo, shards=2, mp_context=multiprocessing.get_context("fork"))
+        try:
+            await rtm.send(rtm.event("U1", "hi"))
+            await asyncio.wait_for(replied.wait(), 10.0)
+        finally:
+            await factory.close()
+        return web_client.posts
+
+    posts = asyncio.run(main())
+    assert [post["text"] for post in posts] == ["You said hi"]
+
+
+def _round_trip(error):
+    return _decode_error(pickle.loads(pickle.dumps(_encode_error(error))))
+
+
+def test_api_errors_keep_their_type_and_response():
+    response = _RemoteResponse({"ok": False, "error": "ratelimited"}, 429, {"Retry-After": "3"})
+    error = _round_trip(slack.errors.SlackApiError("The request to the Slack API failed.", response))
+    assert isinstance(error, slack.errors.SlackApiError)
+    assert error.response.status_code == 429
+    assert error.response.headers["Retry-After"] == "3"
+    assert error.response["error"] == "ratelimited"
+
+
+def test_other_errors_keep_their_type():
+    assert isinstance(_round_trip(asyncio.TimeoutError()), asyncio.TimeoutError)
+
+
+def test_workers_are_not_daemons():
+    factory = ShardedSlackInteractionFactory(
+        FakeRTMClient(FakeWebClient()), echo, shards=1, mp_context=multiprocessing.get_context("fork")
+    )
+    try:
+        assert not any(worker.daemon for worker in factory._workers)
+    finally:
+        asyncio.run(factory.close())
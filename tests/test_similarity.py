@@ -0,0 +1,111 @@
+from types import SimpleNamespace
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
+
+import numpy
+import pytest
+
+from chattermouth.nlp import Category, add_similarity_classifier, classify, enter_lexicon, enter_spacy_pipeline
+from chattermouth.nlp.similarity import SimilarityClassifier
+from chattermouth.nlp.training import get_model_generation
+
+VECTORS = {
+    "yes": [1.0, 0.0, 0.0],
+    "yeah": [0.9, 0.1, 0.0],
+    "yep": [0.95, 0.05, 0.0],
+    "no": [0.0, 1.0, 0.0],
+    "nope": [0.1, 0.9, 0.0],
+    "nah": [0.05, 0.95, 0.0],
+    "why": [0.0, 0.0, 1.0],
+}
+
+EXAMPLES = [
+    ("yes", {Category.YES}),
+    ("yeah", {Category.YES}),
+    ("no", {Category.NO}),
+    ("nope", {Category.NO}),
+    ("why", {Category.QUESTION}),
+]
+
+
+class FakeVectorDoc:
+    def __init__(self, text: str, width: int) -> None:
+        self.text = text
+        vectors = [VECTORS[word] for word in text.split() if word in VECTORS]
+        self.vector = numpy.mean(vectors, axis=0) if vectors else numpy.zeros(width)
+        self.cats: Dict[str, float] = {}
+
+
+class FakeVectorPipeline:
+    """A pipeline whose documents' vectors are the mean of a few known word vectors."""
+
+    def __init__(self, width: int = 3) -> None:
+        self.vocab = SimpleNamespace(vectors_length=width)
+        self.tokenizer = SimpleNamespace(pipe=self._pipe)
+        self.pipeline: List[Tuple[str, Any]] = []
+
+    @property
+    def pipe_names(self) -> List[str]:
+        return [name for name, _ in self.pipeline]
+
+    def make_doc(self, text: str) -> FakeVectorDoc:
+        return FakeVectorDoc(text, self.vocab.vectors_length)
+
+    def add_pipe(self, component: Any, last: bool = False) -> None:
+        self.pipeline.append((component.name, component))
+
+    def replace_pipe(self, name: str, component: Any) -> None:
+        self.pipeline = [(key, component if key == name else proc) for key, proc in self.pipeline]
+
+    def _pipe(self, texts: Iterable[str], batch_size: int = 128) -> Iterator[FakeVectorDoc]:
+        return (self.make_doc(text) for text in texts)
+
+
+def _scores(classifier: SimilarityClassifier, text: str) -> Dict[str, float]:
+    return classifier(FakeVectorDoc(text, 3)).cats
+
+
+def test_pipelines_without_vectors_are_rejected():
+    with pytest.raises(ValueError):
+        SimilarityClassifier(FakeVectorPipeline(width=0))
+
+
+@pytest.mark.parametrize("k", [2, None])
+def test_similar_examples_decide_the_scores(k):
+    classifier = SimilarityClassifier(FakeVectorPipeline(), k=k)
+    classifier.add_examples(EXAMPLES)
+
+    yep, nah = _scores(classifier, "yep"), _scores(classifier, "nah")
+    assert yep["YES"] > 0.8 and yep["NO"] < 0.2 and yep["QUESTION"] < 0.2
+    assert nah["NO"] > 0.8 and nah["YES"] < 0.2
+    assert all(0.0 <= score <= 1.0 for score in [*yep.values(), *nah.values()])
+
+
+def test_texts_without_vectors_match_nothing():
+    classifier = SimilarityClassifier(FakeVectorPipeline())
+    assert _scores(classifier, "yes") == {"YES": 0.0, "NO": 0.0, "QUESTION": 0.0}
+
+    classifier.add_examples(EXAMPLES)
+    assert _scores(classifier, "banana split") == {"YES": 0.0, "NO": 0.0, "QUESTION": 0.0}
+
+
+def test_the_classification_threshold_applies_to_similarity_scores():
+    nlp = FakeVectorPipeline()
+    add_similarity_classifier(nlp, k=4, examples=EXAMPLES)
+
+    with enter_spacy_pipeline(nlp), enter_lexicon(None):
+        assert classify("yep").best is Category.YES
+        # Halfway between yes and no, neither gets enough of the vote.
+        assert classify("yes no").best is None
+        assert classify("yes no", threshold=0.4).matches == {Category.YES, Category.NO}
+
+
+def test_adding_examples_changes_the_model_generation():
+    nlp = FakeVectorPipeline()
+    classifier = add_similarity_classifier(nlp, examples=EXAMPLES)
+    generation = get_model_generation(nlp)
+    classifier.add_example("nah", {Category.NO})
+    assert len(classifier) == len(EXAMPLES) + 1
+    assert get_model_generation(nlp) != generation
+
+    replacement = add_similarity_classifier(nlp, examples=EXAMPLES)
+    assert nlp.pipeline == [(classifier.name, replacement)]
@@ -0,0 +1,163 @@
+import asyncio
+
+import pytest
+
+import chattermouth
+from chattermouth.slack import SlackInteractionContext, SlackInteractionFactory, SlackMessage
+from chattermouth.slack.directory import SlackUserDirectory
+from chattermouth.slack.sending import SlackSendScheduler
+from tests.fakes import FakeRTMClient, FakeWebClient, settle
+
+
+async def _ignore() -> None:
+    pass
+
+
+def test_empty_shared_objects_are_kept():
+    # An empty directory is falsy, but it's still the one the caller wants shared.
+    directory = SlackUserDirectory()
+    scheduler = SlackSendScheduler()
+    assert len(directory) == 0
+
+    factory = SlackInteractionFactory(
+        FakeRTMClient(FakeWebClient()), _ignore, user_directory=directory, send_scheduler=scheduler
+    )
+    assert factory.user_directory is directory
+    assert factory.send_scheduler is scheduler
+
+
+def test_idle_interactions_are_evicted_without_new_messages():
+    async def listen_forever() -> None:
+        await chattermouth.listen()  # The message which started the thread
+        await chattermouth.listen()
+
+    async def main():
+        rtm = FakeRTMClient(FakeWebClient())
+        factory = SlackInteractionFactory(rtm, listen_forever, idle_timeout=0.05)
+        await rtm.send(rtm.event("U1", "hi"))
+        assert factory.active_interactions == 1
+
+        await settle(0.2)
+        await factory.drain()
+        return factory
+
+    factory = asyncio.run(main())
+    assert factory.live_interactions == 0
+    assert factory.evicted_interactions == 1
+    assert factory.completed_interactions == 0
+
+
+async def _listen_twice() -> None:
+    await chattermouth.listen()
+    await chattermouth.listen()
+
+
+def test_interactions_waiting_for_admission_are_not_evicted():
+    async def main():
+        rtm = FakeRTMClient(FakeWebClient())
+        factory = SlackInteractionFactory(rtm, _listen_twice, idle_timeout=0.1, max_interactions=1)
+        await rtm.send(rtm.event("U1", "hi"))
+        await rtm.send(rtm.event("U2", "hi"))
+        assert (factory.active_interactions, factory.waiting_interactions) == (1, 1)
+
+        # The first interaction is evicted and the waiting one takes its place, with a fresh idle timeout.
+        await settle(0.16)
+        counts = factory.evicted_interactions, factory.active_interactions, factory.waiting_interactions
+        await factory.drain(timeout=0)
+        return counts
+
+    assert asyncio.run(main()) == (1, 1, 0)
+
+
+def test_follow_ups_in_a_rejected_thread_are_ignored():
+    async def main():
+        rtm = FakeRTMClient(FakeWebClient())
+        factory = SlackInteractionFactory(rtm, _listen_twice, max_interactions=1, max_waiting=0)
+        await rtm.send(rtm.event("U1", "hi"))
+        rejected = rtm.event("U2", "hello")
+        await rtm.send(rejected)
+        await settle()
+        await rtm.send(rtm.event("U2", "anyone?", rejected["ts"]))
+        await settle()
+        await factory.drain(timeout=0)
+        return factory, rtm.web_client.posts
+
+    factory, posts = asyncio.run(main())
+    assert factory.rejected_interactions == 1
+    assert [post["text"] for post in posts] == [factory.rejection_message]
+
+
+def test_waiting_interactions_are_admitted_in_turn():
+    async def main():
+        rtm = FakeRTMClient(FakeWebClient())
+        factory = SlackInteractionFactory(rtm, _listen_twice, max_interactions=1)
+        first = rtm.event("U1", "hi")
+        await rtm.send(first)
+        await rtm.send(rtm.event("U2", "hello"))
+        assert (factory.active_interactions, factory.waiting_interactions) == (1, 1)
+
+        await rtm.send(rtm.event("U1", "bye", first["ts"]))
+        await settle()
+        assert (factory.active_interactions, factory.waiting_interactions) == (1, 0)
+        assert factory.completed_interactions == 1
+        await factory.drain(timeout=0)
+
+    asyncio.run(main())
+
+
+def test_drain_turns_waiting_interactions_away():
+    async def main():
+        rtm = FakeRTMClient(FakeWebClient())
+        factory = SlackInteractionFactory(rtm, _listen_twice, max_interactions=1)
+        await rtm.send(rtm.event("U1", "hi"))
+        await rtm.send(rtm.event("U2", "hello"))
+        await factory.drain(timeout=0)
+        return factory, rtm.web_client.posts
+
+    factory, posts = asyncio.run(main())
+    assert factory.waiting_interactions == 0
+    assert factory.rejected_interactions == 1
+    assert [post["text"] for post in posts] == [factory.rejection_message]
+
+
+def _debouncing_context(rtm: FakeRTMClient, text: str) -> SlackInteractionContext:
+    return SlackInteractionContext(rtm.web_client, rtm.event("U1", text), debounce=0.1, debounce_max_wait=0.5)
+
+
+def test_timeout_only_applies_to_the_first_debounced_message():
+    async def main():
+        rtm = FakeRTMClient(FakeWebClient())
+        context = _debouncing_context(rtm, "no")
+        listening = asyncio.ensure_future(context.listen(timeout=0.05))
+        await settle(0.03)
+        context.message_queue.put_nowait(rtm.event("U1", "not right now", context.thread_ts))
+        return await listening
+
+    assert asyncio.run(main()).content == "no\nnot right now"
+
+
+def test_cancelled_debounce_requeues_messages():
+    async def main():
+        rtm = FakeRTMClient(FakeWebClient())
+        context = _debouncing_context(rtm, "no")
+        listening = asyncio.ensure_future(context.listen())
+        await settle(0.03)
+        context.message_queue.put_nowait(rtm.event("U1", "not right now", context.thread_ts))
+        await settle(0.03)
+        listening.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await listening
+        assert context.message_queue.qsize() == 2
+        return await context.listen()
+
+    assert asyncio.run(main()).content == "no\nnot right now"
+
+
+def test_messages_users_and_contexts_have_no_instance_dict():
+    async def main():
+        web_client = FakeWebClient()
+        context = SlackInteractionContext(web_client, FakeRTMClient(web_client).event("U1", "hi"))
+        return [context, context.user, SlackMessage(context.user, "hi"), context.message_queue, context.deleted_message]
+
+    for slotted in asyncio.run(main()):
+        assert not hasattr(slotted, "__dict__"), type(slotted).__name__
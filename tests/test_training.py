@@ -0,0 +1,115 @@
+import contextlib
+import random
+from collections import Counter
+
+import numpy
+import pytest
+
+from chattermouth.nlp import training
+from chattermouth.nlp.training import TRAINING_DATA, train_pipeline
+
+TRAINING_DATA_TEXTS = [text for text, _ in TRAINING_DATA]
+
+
+class FakeTrainableTextcat:
+    def __init__(self) -> None:
+        self.weights = b"initial"
+        self.loaded = []
+
+    def add_label(self, label: str) -> None:
+        pass
+
+    def to_bytes(self) -> bytes:
+        return self.weights
+
+    def from_bytes(self, data: bytes) -> None:
+        self.loaded.append(data)
+        self.weights = data
+
+
+class FakeDoc:
+    cats = {"YES": 0.5, "NO": 0.5, "QUESTION": 0.5}
+
+
+class FakeTrainablePipeline:
+    """A pipeline whose validation loss never improves, which records the texts its `textcat` is trained on.
+
+    Updates are recorded in `trained_on` until training resumes, and in `retrained_on` after.
+    """
+
+    pipe_names = ["textcat"]
+
+    def __init__(self) -> None:
+        self.textcat = FakeTrainableTextcat()
+        self.trained_on = []
+        self.retrained_on = []
+        self._recording = self.trained_on
+        self.optimizers = 0
+
+    def get_pipe(self, name: str) -> FakeTrainableTextcat:
+        return self.textcat
+
+    def disable_pipes(self, *names: str) -> contextlib.AbstractContextManager:
+        return contextlib.nullcontext()
+
+    def begin_training(self) -> object:
+        self.optimizers += 1
+        return object()
+
+    def resume_training(self) -> object:
+        self._recording = self.retrained_on
+        return self.begin_training()
+
+    def update(self, texts, annotations, sgd, drop, losses) -> None:
+        self.textcat.weights = b"trained"
+        self._recording.extend(texts)
+
+    def pipe(self, texts):
+        return (FakeDoc() for _ in texts)
+
+
+@pytest.fixture(autouse=True)
+def seeding(monkeypatch):
+    monkeypatch.setattr(training, "fix_random_seed", lambda seed: (random.seed(seed), numpy.random.seed(seed)))
+
+
+def test_tiny_holdouts_train_on_everything():
+    nlp = FakeTrainablePipeline()
+    report = train_pipeline(nlp, max_epochs=4, validation_size=0.02)
+    assert report.validation_losses == [] and report.retraining_times == []
+    assert Counter(nlp.trained_on) == Counter(TRAINING_DATA_TEXTS * 4)
+
+
+def test_default_holdout_is_validated_on():
+    nlp = FakeTrainablePipeline()
+    report = train_pipeline(nlp, max_epochs=2, patience=None)
+    assert len(report.validation_losses) == len(report.validation_accuracies) == 2
+    assert report.validation_loss is not None and report.best_epoch == 0
+    assert Counter(nlp.retrained_on) == Counter(TRAINING_DATA_TEXTS)
+
+
+def test_holdout_is_stratified_and_retrained_on():
+    nlp = FakeTrainablePipeline()
+    report = train_pipeline(nlp, max_epochs=10, patience=2, validation_size=0.5)
+
+    assert (report.best_epoch, report.epochs, report.stopped_early) == (0, 3, True)
+    # Three epochs on the training data, then one more epoch, from the initial weights with a new optimizer, on all
+    # the data.
+    epoch = Counter(nlp.trained_on[: len(nlp.trained_on) // 3])
+    assert Counter(nlp.trained_on) == Counter({text: 3 * count for text, count in epoch.items()})
+    held_out = Counter(TRAINING_DATA_TEXTS) - epoch
+    assert sum(held_out.values()) >= training.MIN_VALIDATION_EXAMPLES
+    assert "Yes but how?" not in held_out
+    assert Counter(nlp.retrained_on) == Counter(TRAINING_DATA_TEXTS)
+    assert nlp.textcat.loaded == [b"initial"] and nlp.optimizers == 2
+    assert len(report.retraining_times) == 1
+
+
+def test_global_random_state_is_restored():
+    random.seed(1234)
+    numpy.random.seed(1234)
+    expected = random.random(), numpy.random.random()
+    random.seed(1234)
+    numpy.random.seed(1234)
+    train_pipeline(FakeTrainablePipeline(), max_epochs=1)
+    assert (random.random(), numpy.random.random()) == expected
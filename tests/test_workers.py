@@ -0,0 +1,134 @@
+import asyncio
+import gc
+import os
+import subprocess
+import sys
+import textwrap
+
+import pytest
+
+from chattermouth.nlp import (
+    ClassifierClosedError,
+    WorkerPoolClassifier,
+    create_nlp_process_executor,
+    enter_classification_cache,
+    enter_lexicon,
+    enter_nlp_executor,
+    enter_spacy_pipeline,
+    enter_worker_pool,
+    get_category_scores_async,
+    workers,
+)
+from tests.fakes import FakePipeline, load_fake_pipeline
+
+
+def test_process_executor_scores_with_the_worker_pipeline():
+    executor = create_nlp_process_executor(1, load_pipeline=load_fake_pipeline)
+    caller_nlp = FakePipeline()
+
+    async def main():
+        with enter_spacy_pipeline(caller_nlp), enter_nlp_executor(executor):
+            with enter_lexicon(None), enter_classification_cache(None):
+                return await get_category_scores_async("why?")
+
+    try:
+        scores = asyncio.run(main())
+    finally:
+        executor.shutdown()
+    assert scores["QUESTION"] == 0.9
+    assert caller_nlp.scored == []
+
+
+def test_worker_pool_scores_in_its_workers():
+    async def main():
+        pool = WorkerPoolClassifier(2, load_pipeline=load_fake_pipeline, max_wait=0.0)
+        try:
+            return await asyncio.gather(*(pool.score(text) for text in ["yes", "no", "why?"]))
+        finally:
+            await pool.close()
+
+    scores = asyncio.run(main())
+    assert [cats["YES"] for cats in scores] == [0.9, 0.1, 0.0]
+
+
+def test_worker_pool_processes_with_the_current_pipeline():
+    nlp = FakePipeline()
+
+    async def main():
+        with enter_spacy_pipeline(nlp), enter_worker_pool(1, load_pipeline=load_fake_pipeline) as pool:
+            return await pool.process("yes")
+
+    assert asyncio.run(main()).cats["YES"] == 0.9
+    assert nlp.scored == ["yes"]
+
+
+def test_shutdown_fails_waiting_requests():
+    async def main():
+        pool = WorkerPoolClassifier(1, load_pipeline=load_fake_pipeline, max_batch_size=1, max_wait=0.0)
+        await pool.warm_up()
+        requests = [asyncio.ensure_future(pool.score(text)) for text in ["yes", "no", "why?"]]
+        await asyncio.sleep(0)
+        pool.shutdown()
+        return await asyncio.wait_for(asyncio.gather(*requests, return_exceptions=True), 5.0)
+
+    results = asyncio.run(main())
+    assert any(isinstance(result, ClassifierClosedError) for result in results)
+    assert all(isinstance(result, (dict, ClassifierClosedError)) for result in results)
+
+
+@pytest.mark.parametrize("preload", [False, True])
+def test_process_exits_after_shutting_down_with_a_running_batch(preload):
+    script = textwrap.dedent(
+        f"""
+        import asyncio
+
+        from chattermouth.nlp import WorkerPoolClassifier
+        from tests.fakes import load_fake_pipeline, settle
+
+        async def main():
+            pool = WorkerPoolClassifier(
+                1, load_pipeline=load_fake_pipeline, max_batch_size=1, max_wait=0.0, preload={preload}
+            )
+            await pool.warm_up()
+            requests = [asyncio.ensure_future(pool.score(text)) for text in ["yes", "no", "why?"]]
+            await settle()
+            pool.shutdown()
+            await asyncio.gather(*requests, return_exceptions=True)
+
+        asyncio.run(main())
+        """
+    )
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(path or os.curdir for path in sys.path))
+    subprocess.run([sys.executable, "-c", script], env=env, check=True, timeout=60)
+
+
+freezing = pytest.mark.skipif(not hasattr(gc, "freeze"), reason="gc.freeze isn't available")
+
+
+@freezing
+def test_preloading_outside_the_loop_forks_straight_away(monkeypatch):
+    monkeypatch.setattr(workers, "_worker_nlp", None)
+    pool = WorkerPoolClassifier(1, load_pipeline=load_fake_pipeline, preload=True)
+    try:
+        assert gc.get_freeze_count() == 0
+        scores = asyncio.run(pool.score("no"))
+    finally:
+        pool.shutdown()
+    assert scores["NO"] == 0.9
+
+
+@freezing
+def test_preloading_inside_the_loop_forks_without_blocking(monkeypatch):
+    monkeypatch.setattr(workers, "_worker_nlp", None)
+
+    async def main():
+        pool = WorkerPoolClassifier(1, load_pipeline=load_fake_pipeline, preload=True)
+        try:
+            assert gc.get_freeze_count() > 0
+            await pool.warm_up()
+            assert gc.get_freeze_count() == 0
+            return await pool.score("no")
+        finally:
+            await pool.close()
+
+    assert asyncio.run(main())["NO"] == 0.9